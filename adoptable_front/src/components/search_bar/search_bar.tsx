@@ -59,7 +59,7 @@ const SearchBar: React.FC = () => {
         `/api/animals/?search=${encodeURIComponent(val)}`
       );
       const uRes = await axios.get<{ id: number; username: string }[]>(
-        `/users/?search=${encodeURIComponent(val)}`
+        `/users/autocomplete/?q=${encodeURIComponent(val)}&limit=${MAX_PER_TAB}`
       );
 
       const animals: Suggestion[] = aRes.data.slice(0, MAX_PER_TAB).map(a => ({
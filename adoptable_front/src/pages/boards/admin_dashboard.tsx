@@ -38,6 +38,11 @@ interface ContactMessage {
   created_at: string;
 }
 
+interface ContactPage {
+  next: string | null;
+  results: ContactMessage[];
+}
+
 interface BlockedUser {
   id: number;
   username: string;
@@ -53,6 +58,7 @@ const AdminDashboard: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [pendingList, setPendingList] = useState<ProtectoraPending[]>([]);
   const [contactList, setContactList] = useState<ContactMessage[]>([]);
+  const [contactCursor, setContactCursor] = useState<string | null>(null);
   const [blockedList, setBlockedList] = useState<BlockedUser[]>([]);
 
   const csrfToken = getCSRFToken();
@@ -104,16 +110,27 @@ const AdminDashboard: React.FC = () => {
     }
   };
 
-  const fetchContacts = async () => {
+  // La bandeja viene paginada por cursor: `next` trae el cursor de la página siguiente.
+  const fetchContacts = async (cursor: string | null = null) => {
     try {
-      const response = await axios.get<ContactMessage[]>(
+      const response = await axios.get<ContactPage>(
         '/api/contact/admin/messages/',
         {
+          params: cursor ? { cursor } : {},
           headers: { 'X-CSRFToken': csrfToken },
           withCredentials: true,
         }
       );
-      setContactList(response.data);
+      setContactList(prev =>
+        cursor ? [...prev, ...response.data.results] : response.data.results
+      );
+      setContactCursor(
+        response.data.next
+          ? new URL(response.data.next, window.location.origin).searchParams.get(
+              'cursor'
+            )
+          : null
+      );
     } catch {
       toast({
         title:
@@ -296,6 +313,13 @@ const AdminDashboard: React.FC = () => {
               </Tbody>
             </Table>
           )}
+          {contactCursor && (
+            <Flex justify="center" mt={4}>
+              <Button size="sm" onClick={() => fetchContacts(contactCursor)}>
+                {t('cargar_mas') || 'Cargar más'}
+              </Button>
+            </Flex>
+          )}
         </Box>
 
         {/* Usuarios bloqueados */}
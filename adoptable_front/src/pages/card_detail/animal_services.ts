@@ -98,6 +98,31 @@ export const getAnimalById = async (id: number): Promise<Dog> => {
   }
 };
 
+export interface AnimalBatch {
+  results: Dog[];
+  missing: number[];
+}
+
+// Varios animales en una sola petición, en el orden pedido.
+export const getAnimalsByIds = async (ids: number[]): Promise<AnimalBatch> => {
+  try {
+    const response =
+      ids.length > 50
+        ? await api.post<AnimalBatch>(
+            'api/animals/batch/',
+            { ids },
+            { headers: { 'X-CSRFToken': getCSRFToken() } }
+          )
+        : await api.get<AnimalBatch>('api/animals/', {
+            params: { ids: ids.join(',') },
+          });
+    return response.data;
+  } catch (error: unknown) {
+    console.error('Error al obtener los animales:', error);
+    throw error;
+  }
+};
+
 export const addAnimal = async (data: FormData): Promise<Dog> => {
   try {
     const response = await api.post<Dog>('api/animals/', data, {
@@ -166,18 +191,24 @@ export const unadoptAnimal = async (id: number): Promise<Dog> => {
   return resp.data;
 };
 
-export const addFavorite = async (animalId: number): Promise<void> => {
-  await api.post(
-    `users/favorites/${animalId}/`,
-    {},
+export const syncFavorites = async (changes: {
+  add?: number[];
+  remove?: number[];
+}): Promise<number[]> => {
+  const resp = await api.post<{ favorites: number[] }>(
+    'users/favorites/',
+    changes,
     { headers: { 'X-CSRFToken': getCSRFToken() } }
   );
+  return resp.data.favorites;
+};
+
+export const addFavorite = async (animalId: number): Promise<void> => {
+  await syncFavorites({ add: [animalId] });
 };
 
 export const removeFavorite = async (animalId: number): Promise<void> => {
-  await api.delete(`users/favorites/${animalId}/`, {
-    headers: { 'X-CSRFToken': getCSRFToken() },
-  });
+  await syncFavorites({ remove: [animalId] });
 };
 
 export const getMyAdoptionRequests = async (): Promise<AdoptionRequest[]> => {
@@ -45,7 +45,7 @@ import {
   getMyAdoptionRequests,
   listAdoptionRequestsForAnimal,
 } from './animal_services';
-import { getProfile, getAdoptionForm } from '../profile/user_services';
+import { getAdoptionForm } from '../profile/user_services';
 import type { AdoptionFormAPI } from '../profile/user_services';
 import { logoutSuccess } from '../../features/auth/authSlice';
 import { logout } from '../../features/auth/authService';
@@ -73,6 +73,8 @@ interface Animal {
   owner?: number | null;
   adopter?: number | null;
   adopter_username?: string;
+  is_favorited?: boolean;
+  favorite_count?: number;
 }
 
 interface Adopter {
@@ -121,16 +123,9 @@ const AnimalDetail: React.FC = () => {
     }
   }, [id, navigate, toast, t]);
 
-  const loadFavorites = useCallback(async () => {
+  const loadFavorites = useCallback(() => {
     if (role !== 'adoptante' || !animal) return;
-    try {
-      const prof = (await getProfile()) as { favorites?: { id: number }[] };
-      if (Array.isArray(prof.favorites)) {
-        setIsFavorite(prof.favorites.some(f => f.id === animal.id));
-      }
-    } catch (error) {
-      console.error(error);
-    }
+    setIsFavorite(Boolean(animal.is_favorited));
   }, [animal, role]);
 
   const loadRequestStatus = useCallback(async () => {
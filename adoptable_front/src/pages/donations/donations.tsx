@@ -43,7 +43,7 @@ const Donations: React.FC = () => {
       const data = await fetchDonations();
       setDonations(data);
       if (user) {
-        setUserDonations(data.filter(d => d.usuario === user.username));
+        setUserDonations(await fetchDonations(true));
       }
       setLoading(false);
     };
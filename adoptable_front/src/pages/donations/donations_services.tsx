@@ -14,9 +14,17 @@ const api = axios.create({
   withCredentials: true,
 });
 
-export const fetchDonations = async (): Promise<Donation[]> => {
-  const resp = await api.get<Donation[]>('donations/');
-  return resp.data;
+interface DonationPage {
+  next: string | null;
+  results: Donation[];
+}
+
+// El listado viene paginado por cursor; con `mine` solo las del usuario actual.
+export const fetchDonations = async (mine = false): Promise<Donation[]> => {
+  const resp = await api.get<DonationPage>('donations/', {
+    params: mine ? { mine: 1 } : {},
+  });
+  return resp.data.results;
 };
 
 export const donate = async (
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from app.db_router import primary_reads
+from users.models import AdopterProfile
+
+from .models import Animal
+from .serializers import AnimalSerializer
+
+Favorite = AdopterProfile.favorites.through
+
+
+def animal_cache_key(animal_id):
+    return f"animals:animal:{animal_id}"
+
+
+def invalidate_animals(animal_ids):
+    """
+    Descarta la ficha cacheada de estos animales, ya y al confirmar la transacción.
+    Solo llega a los demás procesos si la caché es compartida (REDIS_URL).
+    """
+    keys = [animal_cache_key(animal_id) for animal_id in set(animal_ids)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def with_favorite_flag(queryset, user):
+    """Anota is_favorited (si `user` lo tiene en favoritos) con un EXISTS en la misma consulta."""
+    return queryset.annotate(
+        is_favorited=Exists(Favorite.objects.filter(animal_id=OuterRef("pk"), adopterprofile__user_id=user.pk))
+    )
+
+
+def get_animals(ids, user):
+    """
+    Fichas serializadas de los animales `ids` visibles (protectora activa), en el
+    orden pedido, más la lista de ids que no existen o no son visibles.
+
+    Una consulta resuelve visibilidad e is_favorited (que depende de `user` y no se
+    cachea); el resto de la ficha sale de la caché por objeto y solo los que faltan
+    se leen de la base de datos, todos en una segunda consulta. Esa segunda consulta
+    va al primario: lo que entra en la caché no debe venir de una réplica retrasada.
+    """
+    visible = dict(
+        with_favorite_flag(Animal.objects.filter(pk__in=ids, owner__is_active=True), user).values_list(
+            "pk", "is_favorited"
+        )
+    )
+
+    cached = cache.get_many([animal_cache_key(animal_id) for animal_id in visible])
+    documents = {animal_id: cached.get(animal_cache_key(animal_id)) for animal_id in visible}
+    misses = [animal_id for animal_id, document in documents.items() if document is None]
+    if misses:
+        with primary_reads():
+            fresh = {
+                animal.pk: AnimalSerializer(animal).data
+                for animal in Animal.objects.filter(pk__in=misses).select_related("adopter")
+            }
+        cache.set_many(
+            {animal_cache_key(animal_id): document for animal_id, document in fresh.items()},
+            settings.ANIMAL_CACHE_SECONDS,
+        )
+        documents.update(fresh)
+
+    results, missing = [], []
+    for animal_id in ids:
+        if documents.get(animal_id) is None:
+            missing.append(animal_id)
+        else:
+            results.append({**documents[animal_id], "is_favorited": visible[animal_id]})
+    return results, missing
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from animals.models import Animal
+from app.images import build_extra_placeholders, build_placeholder, build_variants, placeholder, read_stored_bytes
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula los placeholders (LQIP) que faltan: el de la imagen principal de cada animal "
+        "(regenerando también sus derivadas si estaban desfasadas) y los de sus imágenes extra."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Recalcula también los que ya existen")
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        storage = Animal._meta.get_field("image").storage
+        # Muchas fichas comparten imagen (la de por defecto, fotos de stock): se calcula una sola vez.
+        rebuilt = {}
+        started = time.perf_counter()
+        stats = {"animals": 0, "updated": 0, "failed": 0}
+
+        animals = Animal.objects.only("id", "image", "image_variants", "extra_images", "extra_image_placeholders")
+        for animal in animals.iterator(chunk_size=500):
+            stats["animals"] += 1
+            updates = {}
+            name = animal.image.name if animal.image else None
+
+            if name and (force or placeholder(animal.image, animal.image_variants) is None):
+                try:
+                    if name not in rebuilt:
+                        data = read_stored_bytes(name, storage)
+                        variants = animal.image_variants or {}
+                        if not force and variants.get("source") == name:
+                            rebuilt[name] = {**variants, "placeholder": build_placeholder(data)}
+                        else:
+                            rebuilt[name] = build_variants(data, name, storage)
+                    updates["image_variants"] = rebuilt[name]
+                except Exception as e:
+                    stats["failed"] += 1
+                    self.stderr.write(f"Animal {animal.pk}: no se pudo procesar {name}: {e}")
+
+            existing = {} if force else (animal.extra_image_placeholders or {})
+            extra = build_extra_placeholders(animal.extra_images, existing, storage)
+            if extra != (animal.extra_image_placeholders or {}):
+                updates["extra_image_placeholders"] = extra
+
+            if updates:
+                # update() en lugar de save(): sin señales ni geocodificación. updated_at a mano
+                # para que gc_orphan_media vea las derivadas nuevas.
+                Animal.objects.filter(pk=animal.pk).update(**updates, updated_at=timezone.now())
+                stats["updated"] += 1
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{stats['animals']} animales revisados en {elapsed:.1f}s: "
+            f"{stats['updated']} actualizados, {stats['failed']} con errores"
+        )
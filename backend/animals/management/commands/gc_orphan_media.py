@@ -0,0 +1,163 @@
+import hashlib
+import time
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from animals.models import Animal
+from app.s3 import get_s3_client
+from app.storages import candidate_keys, referenced_strings
+from users.models import AdopterProfile
+
+DELETE_BATCH_SIZE = 1000  # máximo de claves por llamada a DeleteObjects
+# Margen al releer las filas modificadas: una transacción puede confirmar después
+# de la lectura anterior con un updated_at anterior a ella.
+RESCAN_OVERLAP = timedelta(minutes=5)
+
+
+def fingerprint(key):
+    """
+    Huella de 64 bits de una clave. El conjunto de referencias guarda huellas en
+    lugar de cadenas; una colisión solo haría conservar un huérfano, nunca borrar
+    un fichero en uso.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def referenced_fingerprints(since=None):
+    """
+    Huellas de las claves referenciadas por animales y perfiles. Con `since`, solo
+    las de las filas modificadas desde entonces (updated_at indexado); las escrituras
+    con .update() que cambian imágenes o derivadas fijan updated_at a mano.
+    """
+    image_field = Animal._meta.get_field("image")
+    references = {fingerprint(image_field.default)}
+
+    animals = Animal.objects.all()
+    profiles = AdopterProfile.objects.all()
+    if since is not None:
+        animals = animals.filter(updated_at__gte=since)
+        profiles = profiles.filter(updated_at__gte=since)
+    rows = chain(
+        animals.values_list("image", "extra_images", "image_variants").iterator(chunk_size=2000),
+        profiles.values_list("avatar", "avatar_variants").iterator(chunk_size=2000),
+    )
+    for row in rows:
+        for reference in referenced_strings(row):
+            references.update(fingerprint(key) for key in candidate_keys(reference))
+    return references
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra del bucket las imágenes de animales y avatares que ya no referencia ninguna fila "
+        "(animales o usuarios eliminados, imágenes sustituidas) y aborta multipart uploads abandonados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa, no borra nada")
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="No toca objetos más recientes (subidas en curso o pendientes de confirmar)",
+        )
+        parser.add_argument("--prefix", action="append", help="Prefijo a revisar (por defecto los upload_to)")
+
+    def handle(self, *args, **options):
+        self.client = get_s3_client()
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.dry_run = options["dry_run"]
+        self.cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        prefixes = options["prefix"] or [
+            Animal._meta.get_field("image").upload_to,
+            AdopterProfile._meta.get_field("avatar").upload_to,
+        ]
+
+        started = time.perf_counter()
+        # Las referencias se leen antes de listar. Una subida posterior no basta con el
+        # periodo de gracia: con la deduplicación por contenido puede reutilizar una
+        # clave huérfana antigua sin cambiar su LastModified. Por eso delete() añade,
+        # justo antes de borrar cada lote, las referencias de las filas modificadas
+        # desde la última lectura (nunca quita ninguna: ante la duda, se conserva).
+        self.read_at = timezone.now()
+        self.references = references = referenced_fingerprints()
+        self.stats = {
+            "scanned": 0,
+            "orphans": 0,
+            "orphan_bytes": 0,
+            "deleted": 0,
+            "reused": 0,
+            "errors": 0,
+            "aborted": 0,
+        }
+
+        batch = []
+        for prefix in prefixes:
+            for obj in self.list_objects(prefix):
+                self.stats["scanned"] += 1
+                if obj["LastModified"] > self.cutoff or fingerprint(obj["Key"]) in references:
+                    continue
+                self.stats["orphans"] += 1
+                self.stats["orphan_bytes"] += obj.get("Size", 0)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  huérfano: {obj['Key']}")
+                batch.append(obj["Key"])
+                if len(batch) == DELETE_BATCH_SIZE:
+                    self.delete(batch)
+                    batch = []
+            self.abort_stale_uploads(prefix)
+        if batch:
+            self.delete(batch)
+
+        elapsed = time.perf_counter() - started
+        stats = self.stats
+        action = "se borrarían" if self.dry_run else "borrados"
+        self.stdout.write(
+            f"{stats['scanned']} objetos revisados en {elapsed:.1f}s ({stats['scanned'] / max(elapsed, 1e-6):.0f} obj/s); "
+            f"{stats['orphans']} huérfanos ({stats['orphan_bytes'] / 1024 / 1024:.1f} MB), "
+            f"{action}: {stats['orphans'] if self.dry_run else stats['deleted']}, "
+            f"reutilizados durante la pasada: {stats['reused']}, errores: {stats['errors']}, "
+            f"multipart abortados: {stats['aborted']}"
+        )
+
+    def list_objects(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={"PageSize": 1000}):
+            yield from page.get("Contents", [])
+
+    def delete(self, keys):
+        if self.dry_run:
+            return
+        read_at = timezone.now()
+        self.references |= referenced_fingerprints(since=self.read_at - RESCAN_OVERLAP)
+        self.read_at = read_at
+        candidates = len(keys)
+        keys = [key for key in keys if fingerprint(key) not in self.references]
+        self.stats["reused"] += candidates - len(keys)
+        if not keys:
+            return
+        response = self.client.delete_objects(
+            Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+        errors = response.get("Errors", [])
+        for error in errors:
+            self.stderr.write(f"No se pudo borrar {error.get('Key')}: {error.get('Message')}")
+        self.stats["errors"] += len(errors)
+        self.stats["deleted"] += len(keys) - len(errors)
+
+    def abort_stale_uploads(self, prefix):
+        """Multipart uploads de subidas en streaming que nunca llegaron a completarse."""
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for upload in page.get("Uploads", []):
+                if upload["Initiated"] > self.cutoff:
+                    continue
+                self.stats["aborted"] += 1
+                if not self.dry_run:
+                    self.client.abort_multipart_upload(
+                        Bucket=self.bucket, Key=upload["Key"], UploadId=upload["UploadId"]
+                    )
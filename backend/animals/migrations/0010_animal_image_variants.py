@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0009_adoptionrequest_form_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="animal",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="Derivadas redimensionadas (WebP/JPEG) de la imagen principal"
+            ),
+        ),
+    ]
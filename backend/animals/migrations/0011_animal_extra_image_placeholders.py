@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0010_animal_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="animal",
+            name="extra_image_placeholders",
+            field=models.JSONField(blank=True, default=dict, help_text="Placeholder (data URI) de cada imagen extra"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def contar_favoritos(apps, schema_editor):
+    Animal = apps.get_model("animals", "Animal")
+    Favorite = apps.get_model("users", "AdopterProfile").favorites.through
+    counts = Favorite.objects.filter(animal_id=OuterRef("pk")).order_by().values("animal_id").annotate(n=Count("*"))
+    Animal.objects.update(favorite_count=Coalesce(Subquery(counts.values("n")), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0011_animal_extra_image_placeholders"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("users", "0006_adopterprofile_avatar_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="animal",
+            name="favorite_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Usuarios que lo tienen en favoritos (lo mantiene animals.signals)"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(fields=["-favorite_count", "-id"], name="animal_popularity_idx"),
+        ),
+        migrations.RunPython(contar_favoritos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:33
+
+import app.storages
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0012_animal_favorite_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="animal",
+            name="image",
+            field=models.ImageField(
+                default="animal_images/default_image.jpg",
+                storage=app.storages.PublicMediaStorage(),
+                upload_to="animal_images/",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0013_animal_image_storage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="animal",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from app.storages import PublicMediaStorage
+
 
 class Animal(models.Model):
     GENDER_CHOICES = [
@@ -60,14 +62,29 @@ class Animal(models.Model):
     microchipped = models.BooleanField(default=False)
     dewormed = models.BooleanField(default=False)
 
-    image = models.ImageField(upload_to="animal_images/", default="animal_images/default_image.jpg")
+    image = models.ImageField(
+        storage=PublicMediaStorage(), upload_to="animal_images/", default="animal_images/default_image.jpg"
+    )
     extra_images = models.JSONField(blank=True, null=True, default=dict)
+    image_variants = models.JSONField(
+        blank=True, default=dict, help_text="Derivadas redimensionadas (WebP/JPEG) de la imagen principal"
+    )
+    extra_image_placeholders = models.JSONField(
+        blank=True, default=dict, help_text="Placeholder (data URI) de cada imagen extra"
+    )
 
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
 
+    favorite_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text="Usuarios que lo tienen en favoritos (lo mantiene animals.signals)"
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-favorite_count", "-id"], name="animal_popularity_idx")]
 
     def __str__(self):
         return self.name
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from app.images import placeholder, srcset
 from users.serializers import AdopterListSerializer
 
 from .models import AdoptionRequest, Animal
@@ -13,15 +14,25 @@ class AnimalSerializer(serializers.ModelSerializer):
         required=False,
     )
     adopter_username = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    image_placeholder = serializers.SerializerMethodField()
+    # Anotación de with_favorite_flag; si el queryset no la trae, el campo no aparece.
+    is_favorited = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Animal
-        fields = "__all__"
-        read_only_fields = ["owner", "created_at", "updated_at"]
+        exclude = ["image_variants"]
+        read_only_fields = ["owner", "extra_image_placeholders", "created_at", "updated_at"]
 
     def get_adopter_username(self, obj):
         return obj.adopter.username if obj.adopter else None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, obj.image_variants)
+
+    def get_image_placeholder(self, obj):
+        return placeholder(obj.image, obj.image_variants)
+
     def create(self, validated_data):
         validated_data["owner"] = self.context["request"].user
         return super().create(validated_data)
@@ -1,31 +1,104 @@
+import logging
 import math
 
-from django.db.models.signals import pre_save
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from geopy.geocoders import Nominatim
+from app.storages import referenced_strings
 
+from .cache import Favorite, invalidate_animals
 from .models import Animal
+from .tasks import build_animal_extra_placeholders, build_animal_image_variants, geocode_animal
 
-geolocator = Nominatim(user_agent="my_app")
+logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=Animal)
 def geocode_city(sender, instance, **kwargs):
     """
-    Antes de guardar un Animal, si su ciudad cambia o no tiene lat/lng,
-    intentamos geocodificar la ciudad y guardar las coordenadas.
+    Antes de guardar un Animal, si su ciudad cambia o no tiene lat/lng, lo marca
+    para geocodificar la ciudad en segundo plano (ver geocode_animal) en lugar de
+    llamar a Nominatim dentro de la petición.
     """
-    if instance.city:
+    instance._geocode_pending = False
+    if not instance.city:
+        return
+    if instance.latitude is None or instance.longitude is None or instance.pk is None:
+        instance._geocode_pending = True
+        return
+    previous = Animal.objects.filter(pk=instance.pk).values_list("city", flat=True).first()
+    instance._geocode_pending = previous != instance.city
 
-        location = geolocator.geocode(instance.city)
-        if location:
-            instance.latitude = location.latitude
-            instance.longitude = location.longitude
-        else:
 
-            instance.latitude = None
-            instance.longitude = None
+@receiver(post_save, sender=Animal)
+def enqueue_geocoding(sender, instance, **kwargs):
+    if getattr(instance, "_geocode_pending", False):
+        instance._geocode_pending = False
+        geocode_animal.enqueue((instance.pk, instance.city), unique=True)
+
+
+@receiver(pre_save, sender=Animal)
+def capture_uploaded_image(sender, instance, **kwargs):
+    """
+    Marca si la imagen es una subida nueva (todavía no guardada en el storage)
+    para generar sus derivadas cuando ya tenga nombre definitivo.
+    """
+    instance._uploaded_image = bool(instance.image) and not getattr(instance.image, "_committed", True)
+
+
+@receiver(post_save, sender=Animal)
+def generate_image_variants(sender, instance, **kwargs):
+    """
+    Tras guardar una imagen nueva, encola la generación de sus derivadas (varias
+    anchuras, WebP y JPEG). Hasta que terminan se sirve solo el original.
+    """
+    if not getattr(instance, "_uploaded_image", False):
+        return
+    instance._uploaded_image = False
+    build_animal_image_variants.enqueue((instance.pk, instance.image.name), unique=True)
+
+
+@receiver(post_save, sender=Animal)
+def generate_extra_image_placeholders(sender, instance, **kwargs):
+    """
+    Encola el cálculo del placeholder de las imágenes extra nuevas (y el descarte
+    de los de las que ya no están). Si la lista no ha cambiado no hace nada.
+    """
+    existing = instance.extra_image_placeholders or {}
+    if set(referenced_strings(instance.extra_images)) != set(existing):
+        build_animal_extra_placeholders.enqueue((instance.pk,), unique=True)
+
+
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+def invalidate_cached_animal(sender, instance, **kwargs):
+    invalidate_animals([instance.pk])
+
+
+def refresh_favorite_counts(animal_ids):
+    """
+    Recalcula Animal.favorite_count de estos animales con un único UPDATE sobre la
+    tabla intermedia: sirve igual para altas, bajas repetidas o un clear().
+    """
+    counts = Favorite.objects.filter(animal_id=OuterRef("pk")).order_by().values("animal_id").annotate(n=Count("*"))
+    Animal.objects.filter(pk__in=animal_ids).update(favorite_count=Coalesce(Subquery(counts.values("n")), 0))
+    invalidate_animals(animal_ids)
+
+
+@receiver(m2m_changed, sender=Favorite)
+def update_favorite_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # animal.favorited_by.add(...): solo cambia este animal.
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_favorite_counts([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_favorites = list(instance.favorites.values_list("pk", flat=True))
+    elif action == "post_clear":
+        refresh_favorite_counts(getattr(instance, "_cleared_favorites", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        refresh_favorite_counts(pk_set)
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -0,0 +1,69 @@
+import logging
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from geopy.geocoders import Nominatim
+
+from app.images import build_extra_placeholders, build_variants_from_storage
+from app.storages import PublicMediaStorage
+from taskqueue.queue import periodic_task, task
+from users.profile import invalidate_animal
+
+from .cache import invalidate_animals
+from .models import Animal
+
+logger = logging.getLogger(__name__)
+
+geolocator = Nominatim(user_agent="my_app")
+
+
+@task(max_attempts=5, retry_delay=60)
+def geocode_animal(animal_id, city):
+    """
+    Geocodifica la ciudad del animal y guarda sus coordenadas. Si la ciudad ha
+    vuelto a cambiar desde que se encoló, no hace nada: ya hay otra tarea en cola.
+    Un error de red lanza excepción y la cola lo reintenta con espera.
+    """
+    if not Animal.objects.filter(pk=animal_id, city=city).exists():
+        return
+    location = geolocator.geocode(city)
+    coordinates = (location.latitude, location.longitude) if location else (None, None)
+    # update() en lugar de save(): no debe volver a disparar las señales.
+    Animal.objects.filter(pk=animal_id, city=city).update(latitude=coordinates[0], longitude=coordinates[1])
+    invalidate_animals([animal_id])
+    invalidate_animal(animal_id)
+
+
+@task()
+def build_animal_image_variants(animal_id, name):
+    """
+    Genera las derivadas (varias anchuras, WebP y JPEG, placeholder) de una imagen
+    ya guardada en el bucket. Si el animal ya tiene otra imagen no hace nada.
+    """
+    if not Animal.objects.filter(pk=animal_id, image=name).exists():
+        return
+    variants = build_variants_from_storage(name, PublicMediaStorage())
+    Animal.objects.filter(pk=animal_id, image=name).update(image_variants=variants, updated_at=timezone.now())
+    invalidate_animals([animal_id])
+    invalidate_animal(animal_id)
+
+
+@task()
+def build_animal_extra_placeholders(animal_id):
+    """Placeholders de las imágenes extra nuevas; descarta los de las que ya no están."""
+    animal = Animal.objects.filter(pk=animal_id).only("extra_images", "extra_image_placeholders").first()
+    if animal is None:
+        return
+    placeholders = build_extra_placeholders(
+        animal.extra_images, animal.extra_image_placeholders or {}, PublicMediaStorage()
+    )
+    Animal.objects.filter(pk=animal_id).update(extra_image_placeholders=placeholders)
+    invalidate_animals([animal_id])
+    invalidate_animal(animal_id)
+
+
+@periodic_task(every=timedelta(days=1), max_attempts=1)
+def gc_orphan_media():
+    call_command("gc_orphan_media")
@@ -1,16 +1,49 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, PropertyMock, patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from animals.management.commands.gc_orphan_media import referenced_fingerprints
 from animals.models import AdoptionRequest, Animal
+from app.image_cache import DiskLRUCache
+from app.images import (
+    build_extra_placeholders,
+    build_variants,
+    placeholder,
+    render_derivatives,
+    render_placeholder,
+    srcset,
+)
+from app.storages import PublicMediaStorage
+from app.upload_handlers import S3MultipartUploadHandler
+from taskqueue.worker import run_pending
 
 User = get_user_model()
 
 
 class AnimalViewsTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.protectora = User.objects.create_user(username="prot", password="pw")
         self.other_user = User.objects.create_user(username="other", password="pw2")
         self.adopter = User.objects.create_user(username="adopt", password="pw3")
@@ -73,6 +106,60 @@ class AnimalViewsTest(APITestCase):
         self.assertIn(self.animal_available.id, ids2)
         self.assertNotIn(animal_far.id, ids2)
 
+    def test_favorites_flag_and_popularity(self):
+        popular = Animal.objects.create(name="Popular", owner=self.protectora, city="")
+        self.other_user.profile.favorites.add(popular, self.animal_available)
+        self.adopter.profile.favorites.add(popular)
+        self.adopter.profile.favorites.add(popular)  # repetido: no cuenta dos veces
+        popular.refresh_from_db()
+        self.assertEqual(popular.favorite_count, 2)
+
+        self.client.login(username="other", password="pw2")
+        resp = self.client.get(self.list_url, {"ordering": "popular"})
+        self.assertEqual(
+            [(a["id"], a["is_favorited"]) for a in resp.data][:2],
+            [(popular.id, True), (self.animal_available.id, True)],
+        )
+        self.assertEqual(resp.data[0]["favorite_count"], 2)
+        self.assertFalse(
+            self.client.get(reverse("animal-detail", kwargs={"pk": self.animal_adopted.pk})).data["is_favorited"]
+        )
+
+        popular.favorited_by.remove(self.adopter.profile)
+        self.other_user.profile.favorites.clear()
+        popular.refresh_from_db()
+        self.animal_available.refresh_from_db()
+        self.assertEqual((popular.favorite_count, self.animal_available.favorite_count), (0, 0))
+
+    def test_batch_get_preserves_order_and_reports_missing(self):
+        self.client.login(username="adopt", password="pw3")
+        self.adopter.profile.favorites.add(self.animal_adopted)
+        blocked = User.objects.create_user(username="blocked", password="pw", is_active=False)
+        hidden = Animal.objects.create(name="Hidden", owner=blocked, city="")
+        ids = [self.animal_adopted.id, 9999, self.animal_available.id, hidden.id]
+
+        resp = self.client.get(self.list_url, {"ids": ",".join(map(str, ids))})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([a["id"] for a in resp.data["results"]], [self.animal_adopted.id, self.animal_available.id])
+        self.assertEqual([a["is_favorited"] for a in resp.data["results"]], [True, False])
+        self.assertEqual(resp.data["missing"], [9999, hidden.id])
+
+        # Segunda vez: las fichas salen de la caché, solo se consulta visibilidad y favoritos.
+        with self.assertNumQueries(2):  # usuario y la consulta de visibilidad
+            resp = self.client.post(reverse("animal-batch"), {"ids": ids}, format="json")
+        self.assertEqual(resp.data["missing"], [9999, hidden.id])
+
+        self.animal_adopted.name = "Renamed"
+        self.animal_adopted.save()
+        resp = self.client.post(reverse("animal-batch"), {"ids": [self.animal_adopted.id]}, format="json")
+        self.assertEqual(resp.data["results"][0]["name"], "Renamed")
+
+        self.assertEqual(self.client.get(self.list_url, {"ids": "1,x"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(reverse("animal-batch"), {"ids": "nope"}, format="json").status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
     def test_create_animal_sets_owner(self):
         self.client.login(username="prot", password="pw")
         resp = self.client.post(self.list_url, {"name": "NewDog"}, format="json")
@@ -150,3 +237,480 @@ class AnimalViewsTest(APITestCase):
         self.client.login(username="other", password="pw2")
         resp2 = self.client.delete(self.reject_request_url)
         self.assertEqual(resp2.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_animals_ndjson_only_own(self):
+        shelter = User.objects.create_user(username="shelter", password="pw4", is_staff=True)
+        own = Animal.objects.create(name="Own", owner=shelter, city="")
+        self.client.login(username="shelter", password="pw4")
+
+        resp = self.client.get(reverse("protectora-export-animals"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([r["id"] for r in rows], [own.id])
+        self.assertEqual(rows[0]["owner_username"], "shelter")
+
+    def test_export_requests_csv_includes_form_data(self):
+        admin = User.objects.create_superuser(username="root", password="pw5")
+        self.client.force_authenticate(admin)
+
+        resp = self.client.get(reverse("protectora-export-requests"), {"export_format": "csv"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["username"], "adopt")
+        self.assertEqual(json.loads(rows[0]["form_data"]), {"foo": "bar"})
+
+    def test_export_forbidden_for_adopters_and_bad_format(self):
+        self.client.login(username="adopt", password="pw3")
+        resp = self.client.get(reverse("protectora-export-animals"))
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.create_user(username="shelter", password="pw4", is_staff=True)
+        self.client.login(username="shelter", password="pw4")
+        resp2 = self.client.get(reverse("protectora-export-animals"), {"export_format": "xml"})
+        self.assertEqual(resp2.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch.object(PublicMediaStorage, "exists", return_value=True)
+    @patch.object(PublicMediaStorage, "presigned_post")
+    def test_direct_image_upload_flow(self, presigned_post, exists):
+        presigned_post.return_value = {"url": "http://minio/public", "fields": {"key": "k", "policy": "p"}}
+        self.client.login(username="prot", password="pw")
+        upload_url = reverse("animal-image-upload", kwargs={"pk": self.animal_available.pk})
+        confirm_url = reverse("animal-image-confirm", kwargs={"pk": self.animal_available.pk})
+
+        resp = self.client.post(upload_url, {"filename": "Foto.JPG"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        key = resp.data["key"]
+        self.assertTrue(key.startswith("animal_images/uploads/") and key.endswith(".jpg"))
+        self.assertEqual(presigned_post.call_args.args[0], key)
+
+        resp2 = self.client.post(confirm_url, {"upload_token": resp.data["upload_token"]}, format="json")
+        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        with patch("animals.tasks.build_variants_from_storage", return_value={"source": key, "sizes": {}}):
+            self.assertEqual(run_pending()["done"], 1)
+        self.animal_available.refresh_from_db()
+        self.assertEqual(self.animal_available.image.name, key)
+        self.assertEqual(self.animal_available.image_variants, {"source": key, "sizes": {}})
+
+        other_url = reverse("animal-image-confirm", kwargs={"pk": self.animal_adopted.pk})
+        resp3 = self.client.post(other_url, {"upload_token": resp.data["upload_token"]}, format="json")
+        self.assertEqual(resp3.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_image_upload_forbidden_for_others(self):
+        self.client.login(username="other", password="pw2")
+        resp = self.client.post(reverse("animal-image-upload", kwargs={"pk": self.animal_available.pk}))
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+    @patch("animals.tasks.geolocator.geocode", return_value=None)
+    @patch("animals.tasks.build_variants_from_storage", return_value={})
+    def test_create_animal_streams_image_to_s3(self, build_variants_from_storage, geocode):
+        self.client.login(username="prot", password="pw")
+        client = MagicMock()
+        png = _png_bytes()
+        key = f"animal_images/{hashlib.sha256(png).hexdigest()}.png"
+
+        with (
+            patch.object(PublicMediaStorage, "connection", new_callable=PropertyMock) as connection,
+            patch.object(PublicMediaStorage, "exists", side_effect=[False, True]),
+        ):
+            connection.return_value.meta.client = client
+            first = self.client.post(
+                self.list_url, {"name": "Streamed", "image": SimpleUploadedFile("dog.png", png, "image/png")}
+            )
+            # La misma foto subida otra vez reutiliza el objeto existente.
+            second = self.client.post(
+                self.list_url, {"name": "Again", "image": SimpleUploadedFile("DOG.PNG", png, "image/png")}
+            )
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        client.put_object.assert_called_once()
+        self.assertEqual(client.put_object.call_args.kwargs["Key"], key)
+        self.assertEqual(client.put_object.call_args.kwargs["Body"], png)
+        client.create_multipart_upload.assert_not_called()
+        self.assertEqual(Animal.objects.get(pk=first.data["id"]).image.name, key)
+        self.assertEqual(Animal.objects.get(pk=second.data["id"]).image.name, key)
+        run_pending()
+        self.assertEqual(build_variants_from_storage.call_count, 2)
+
+        with patch.object(PublicMediaStorage, "connection", new_callable=PropertyMock) as connection:
+            connection.return_value.meta.client = client
+            fake = SimpleUploadedFile("dog.png", b"not an image at all", content_type="image/png")
+            rejected = self.client.post(self.list_url, {"name": "Fake", "image": fake})
+        self.assertEqual(rejected.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", rejected.data)
+        client.put_object.assert_called_once()
+
+    @override_settings(DIRECT_UPLOAD_MAX_BYTES=1024)
+    def test_create_animal_with_oversized_image_is_rejected(self):
+        self.client.login(username="prot", password="pw")
+        count = Animal.objects.count()
+        with patch.object(PublicMediaStorage, "connection", new_callable=PropertyMock) as connection:
+            connection.return_value.meta.client = MagicMock()
+            big = SimpleUploadedFile("dog.png", _png_bytes((2000, 2000)), "image/png")
+            resp = self.client.post(self.list_url, {"name": "Enorme", "image": big})
+        self.assertEqual(resp.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("image", resp.data)
+        self.assertEqual(Animal.objects.count(), count)
+        connection.return_value.meta.client.put_object.assert_not_called()
+
+
+def _png_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class S3MultipartUploadHandlerTest(SimpleTestCase):
+    def _handler(self):
+        storage = MagicMock()
+        storage.bucket_name = "media"
+        storage._normalize_name.side_effect = lambda name: name
+        storage._get_write_parameters.return_value = {"ACL": "public-read"}
+        storage.exists.return_value = False
+        client = storage.connection.meta.client
+        client.create_multipart_upload.return_value = {"UploadId": "up-1"}
+        client.upload_part.side_effect = lambda **kwargs: {"ETag": f'"{kwargs["PartNumber"]}"'}
+        return S3MultipartUploadHandler(None, storage, "animal_images/", ("image",)), client
+
+    def _stream(self, handler, payload, chunk_size=64 * 1024):
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("image", "dog.jpg", "image/jpeg", None)
+        for start in range(0, len(payload), chunk_size):
+            self.assertIsNone(handler.receive_data_chunk(payload[start : start + chunk_size], start))
+        return handler.file_complete(len(payload))
+
+    @override_settings(DIRECT_UPLOAD_MAX_BYTES=20 * 1024 * 1024)
+    def test_large_file_is_uploaded_in_parts(self):
+        handler, client = self._handler()
+        payload = b"\xff\xd8\xff" + b"x" * (6 * 1024 * 1024)
+        uploaded = self._stream(handler, payload)
+
+        self.assertEqual(client.upload_part.call_count, 2)
+        parts = client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+        self.assertEqual([part["PartNumber"] for part in parts], [1, 2])
+        temp_key = client.create_multipart_upload.call_args.kwargs["Key"]
+        self.assertTrue(temp_key.startswith("animal_images/uploads/"))
+
+        self.assertEqual(uploaded.size, len(payload))
+        self.assertEqual(uploaded.key, f"animal_images/{hashlib.sha256(payload).hexdigest()}.jpg")
+        client.copy_object.assert_called_once_with(
+            Bucket="media", Key=uploaded.key, CopySource={"Bucket": "media", "Key": temp_key}, ACL="public-read"
+        )
+        client.delete_object.assert_called_once_with(Bucket="media", Key=temp_key)
+
+    @override_settings(DIRECT_UPLOAD_MAX_BYTES=20 * 1024 * 1024)
+    def test_existing_content_is_not_uploaded_again(self):
+        handler, client = self._handler()
+        handler.storage.exists.return_value = True
+        small = self._stream(handler, b"\xff\xd8\xff" + b"x" * 1024)
+        client.put_object.assert_not_called()
+        client.create_multipart_upload.assert_not_called()
+
+        large = self._stream(handler, b"\xff\xd8\xff" + b"y" * (6 * 1024 * 1024))
+        client.abort_multipart_upload.assert_called_once()
+        client.complete_multipart_upload.assert_not_called()
+        self.assertTrue(small.key.endswith(".jpg"))
+        self.assertTrue(large.key.endswith(".jpg"))
+
+    def test_storage_save_deduplicates_by_content(self):
+        storage = PublicMediaStorage()
+        with (
+            patch.object(PublicMediaStorage, "exists", side_effect=[False, True]),
+            patch.object(PublicMediaStorage, "_save", side_effect=lambda name, content: name) as save,
+        ):
+            first = storage.save("animal_images/a.JPG", ContentFile(b"same bytes"))
+            second = storage.save("animal_images/b.jpg", ContentFile(b"same bytes"))
+        self.assertEqual(first, f"animal_images/{hashlib.sha256(b'same bytes').hexdigest()}.jpg")
+        self.assertEqual(second, first)
+        save.assert_called_once()
+
+    def test_other_fields_are_left_to_default_handlers(self):
+        handler, client = self._handler()
+        handler.new_file("document", "cv.pdf", "application/pdf", None)
+        self.assertEqual(handler.receive_data_chunk(b"%PDF", 0), b"%PDF")
+        self.assertIsNone(handler.file_complete(4))
+        client.create_multipart_upload.assert_not_called()
+
+
+class ImageVariantsTest(SimpleTestCase):
+    def _png(self, size=(800, 600)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def test_render_derivatives_never_upscales(self):
+        rendered = render_derivatives(self._png((500, 250)), (320, 640))
+        self.assertEqual(sorted(rendered), [320, 500])
+        with Image.open(io.BytesIO(rendered[320]["webp"])) as img:
+            self.assertEqual(img.format, "WEBP")
+            self.assertEqual(img.size, (320, 160))
+
+    def test_build_variants_and_srcset(self):
+        storage = MagicMock()
+        storage.save.side_effect = lambda name, content: name
+        storage.url.side_effect = lambda name: f"http://media/{name}"
+
+        variants = build_variants(self._png(), "animal_images/dog.png", storage, widths=(320, 640))
+        self.assertEqual(
+            variants["sizes"]["webp"],
+            {"320": "animal_images/dog_320w.webp", "640": "animal_images/dog_640w.webp"},
+        )
+
+        field_file = MagicMock()
+        field_file.name = "animal_images/dog.png"
+        field_file.storage = storage
+        self.assertEqual(
+            srcset(field_file, variants)["webp"],
+            "http://media/animal_images/dog_320w.webp 320w, http://media/animal_images/dog_640w.webp 640w",
+        )
+
+        field_file.name = "animal_images/other.png"
+        self.assertEqual(srcset(field_file, variants), {})
+        self.assertIsNone(placeholder(field_file, variants))
+        field_file.name = "animal_images/dog.png"
+        self.assertEqual(placeholder(field_file, variants), variants["placeholder"])
+
+    def test_placeholder_is_a_tiny_inline_webp(self):
+        uri = render_placeholder(self._png((800, 400)), size=16)
+        self.assertTrue(uri.startswith("data:image/webp;base64,"))
+        self.assertLess(len(uri), 600)
+        with Image.open(io.BytesIO(base64.b64decode(uri.split(",", 1)[1]))) as img:
+            self.assertEqual(img.size, (16, 8))
+
+    def test_extra_placeholders_only_fetch_new_references(self):
+        storage = MagicMock()
+        storage.exists.side_effect = lambda key: key == "animal_images/new.png"
+        storage.open.return_value.__enter__.return_value.read.return_value = self._png()
+        placeholders = build_extra_placeholders(
+            ["animal_images/old.png", "http://minio:9000/public/animal_images/new.png", "animal_images/missing.png"],
+            {"animal_images/old.png": "data:cached", "animal_images/gone.png": "data:gone"},
+            storage,
+        )
+        self.assertEqual(placeholders["animal_images/old.png"], "data:cached")
+        self.assertTrue(placeholders["http://minio:9000/public/animal_images/new.png"].startswith("data:image/webp"))
+        self.assertIsNone(placeholders["animal_images/missing.png"])
+        self.assertNotIn("animal_images/gone.png", placeholders)
+
+
+class ResizedImageTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 600), "blue").save(buffer, "JPEG")
+        self.original = buffer.getvalue()
+
+    def test_cache_evicts_least_recently_used_by_bytes(self):
+        cache = DiskLRUCache(self.tmp.name, max_bytes=10, scan_interval=0)
+        cache.set("a", b"aaaa")
+        cache.set("b", b"bbbb")
+        cache.get("a")
+        cache.set("c", b"cccc")
+        self.assertEqual(cache.get("a"), b"aaaa")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.size, 8)
+
+        reloaded = DiskLRUCache(self.tmp.name, max_bytes=10)
+        self.assertEqual(reloaded.get("c"), b"cccc")
+
+    def test_prune_without_fcntl_uses_msvcrt(self):
+        cache = DiskLRUCache(self.tmp.name, max_bytes=4, scan_interval=3600)
+        cache.set("a", b"aaaa")
+        cache.set("b", b"bbbb")
+        msvcrt = MagicMock(LK_NBLCK=2)
+        with patch("app.image_cache.fcntl", None), patch("app.image_cache.msvcrt", msvcrt, create=True):
+            self.assertEqual(cache.prune(), 4)
+            msvcrt.locking.assert_called_once()
+            msvcrt.locking.side_effect = OSError
+            self.assertIsNone(cache.prune())
+
+    def test_size_limit_holds_across_processes_sharing_the_directory(self):
+        first = DiskLRUCache(self.tmp.name, max_bytes=10, scan_interval=0)
+        second = DiskLRUCache(self.tmp.name, max_bytes=10, scan_interval=0)
+        for i in range(4):
+            first.set(f"first-{i}", b"xxxx")
+            second.set(f"second-{i}", b"yyyy")
+        self.assertLessEqual(first.size, 10)
+        self.assertEqual(second.get("second-3"), b"yyyy")
+
+        # Entre recorridos se acepta pasarse; el siguiente lo corrige.
+        lazy = DiskLRUCache(self.tmp.name, max_bytes=10, scan_interval=3600)
+        lazy.set("lazy-1", b"zzzz")
+        lazy.set("lazy-2", b"zzzz")
+        self.assertGreater(lazy.size, 10)
+        self.assertLessEqual(lazy.prune(), 10)
+
+    def test_concurrent_requests_are_coalesced(self):
+        cache = DiskLRUCache(self.tmp.name, max_bytes=1024)
+        calls = []
+
+        def produce():
+            calls.append(1)
+            time.sleep(0.2)
+            return b"variant"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("k", produce))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"variant"] * 4)
+
+    def test_resized_image_view(self):
+        cache = DiskLRUCache(self.tmp.name, max_bytes=1024 * 1024)
+        url = reverse("animal-image-resized", kwargs={"key": "animal_images/dog.jpg"})
+        with (
+            patch("animals.views.get_image_cache", return_value=cache),
+            patch("animals.views._read_stored_image", return_value=self.original) as read,
+        ):
+            resp = self.client.get(url, {"w": "200", "format": "webp"})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp["Content-Type"], "image/webp")
+            self.assertIn("immutable", resp["Cache-Control"])
+            with Image.open(io.BytesIO(resp.content)) as img:
+                self.assertEqual(img.size, (200, 150))
+
+            again = self.client.get(url, {"w": "200", "format": "webp"})
+            self.assertEqual(again.content, resp.content)
+            self.assertEqual(read.call_count, 1)
+
+            not_modified = self.client.get(url, {"w": "200", "format": "webp"}, HTTP_IF_NONE_MATCH=resp["ETag"])
+            self.assertEqual(not_modified.status_code, 304)
+
+            # Las medidas se redondean al siguiente tamaño permitido: misma variante.
+            snapped = self.client.get(url, {"w": "190", "format": "webp"})
+            self.assertEqual(snapped["ETag"], resp["ETag"])
+            self.assertEqual(read.call_count, 1)
+
+            self.assertEqual(self.client.get(url).status_code, 400)
+            self.assertEqual(self.client.get(url, {"w": "4096"}).status_code, 400)
+            private = reverse("animal-image-resized", kwargs={"key": "profile_images/me.jpg"})
+            self.assertEqual(self.client.get(private, {"w": "200"}).status_code, 404)
+
+    def test_resized_image_view_accepts_extra_prefixes_and_throttles_new_variants(self):
+        cache_dir = DiskLRUCache(self.tmp.name, max_bytes=1024 * 1024)
+        extra = reverse("animal-image-resized", kwargs={"key": "galeria/luna.jpg"})
+        unknown = reverse("animal-image-resized", kwargs={"key": "otros/luna.jpg"})
+        with (
+            patch("animals.views.get_image_cache", return_value=cache_dir),
+            patch("animals.views._read_stored_image", return_value=self.original),
+            self.settings(RATE_LIMITS={"image_resize": "2/m"}, IMAGE_RESIZE_PREFIXES=("animal_images/", "galeria/")),
+        ):
+            # Una clave fuera de los prefijos se rechaza sin consultar nada ni contar.
+            with self.assertNumQueries(0):
+                for _ in range(3):
+                    self.assertEqual(self.client.get(unknown, {"w": "200"}).status_code, 404)
+            self.assertEqual(self.client.get(extra, {"w": "200"}).status_code, 200)
+            self.assertEqual(self.client.get(extra, {"w": "320"}).status_code, 200)
+            throttled = self.client.get(extra, {"w": "640"})
+            self.assertEqual(throttled.status_code, 429)
+            self.assertIn("Retry-After", throttled)
+            # Las variantes ya generadas no cuentan.
+            self.assertEqual(self.client.get(extra, {"w": "200"}).status_code, 200)
+
+
+class GcOrphanMediaTest(APITestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username="prot", password="pw")
+        Animal.objects.create(
+            name="Dog",
+            owner=owner,
+            city="",
+            image="animal_images/kept.jpg",
+            extra_images={"gallery": ["http://minio:9000/public/animal_images/extra.jpg"]},
+            image_variants={
+                "source": "animal_images/kept.jpg",
+                "sizes": {"webp": {"320": "animal_images/kept_320w.webp"}},
+            },
+        )
+        old = timezone.now() - timedelta(days=3)
+        listing = [
+            {"Key": key, "LastModified": old, "Size": 100}
+            for key in ("animal_images/kept.jpg", "animal_images/extra.jpg", "animal_images/kept_320w.webp")
+        ]
+        listing += [
+            {"Key": "animal_images/orphan.jpg", "LastModified": old, "Size": 100},
+            {"Key": "animal_images/uploads/pending.jpg", "LastModified": timezone.now(), "Size": 100},
+        ]
+
+        self.client_s3 = MagicMock()
+        self.client_s3.delete_objects.return_value = {}
+
+        def paginator(operation):
+            pages = [{"Contents": listing}] if operation == "list_objects_v2" else [{}]
+            return MagicMock(paginate=MagicMock(return_value=pages))
+
+        self.client_s3.get_paginator.side_effect = paginator
+        patcher = patch("animals.management.commands.gc_orphan_media.get_s3_client", return_value=self.client_s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dry_run_reports_without_deleting(self):
+        out = io.StringIO()
+        call_command("gc_orphan_media", "--dry-run", "--prefix", "animal_images/", stdout=out)
+        self.client_s3.delete_objects.assert_not_called()
+        self.assertIn("1 huérfanos", out.getvalue())
+
+    def test_deletes_only_old_unreferenced_objects(self):
+        call_command("gc_orphan_media", "--prefix", "animal_images/", stdout=io.StringIO())
+        self.client_s3.delete_objects.assert_called_once()
+        deleted = self.client_s3.delete_objects.call_args.kwargs["Delete"]["Objects"]
+        self.assertEqual(deleted, [{"Key": "animal_images/orphan.jpg"}])
+
+    def test_keys_reused_during_the_pass_are_not_deleted(self):
+        # Una subida deduplicada reutiliza la clave huérfana mientras se lista el bucket.
+        owner = User.objects.get(username="prot")
+        paginator = self.client_s3.get_paginator.side_effect
+
+        def reuse_while_listing(operation):
+            if operation == "list_objects_v2":
+                Animal.objects.create(name="Nuevo", owner=owner, city="", image="animal_images/orphan.jpg")
+            return paginator(operation)
+
+        self.client_s3.get_paginator.side_effect = reuse_while_listing
+        out = io.StringIO()
+        call_command("gc_orphan_media", "--prefix", "animal_images/", stdout=out)
+        self.client_s3.delete_objects.assert_not_called()
+        self.assertIn("reutilizados durante la pasada: 1", out.getvalue())
+
+    def test_recheck_before_deleting_reads_only_changed_rows(self):
+        Animal.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        with patch(
+            "animals.management.commands.gc_orphan_media.referenced_fingerprints", wraps=referenced_fingerprints
+        ) as read:
+            call_command("gc_orphan_media", "--prefix", "animal_images/", stdout=io.StringIO())
+        self.assertEqual(read.call_args_list[0].kwargs, {})
+        since = read.call_args_list[1].kwargs["since"]
+        self.assertFalse(Animal.objects.filter(updated_at__gte=since).exists())
+        deleted = self.client_s3.delete_objects.call_args.kwargs["Delete"]["Objects"]
+        self.assertEqual(deleted, [{"Key": "animal_images/orphan.jpg"}])
+
+
+class BackfillImagePlaceholdersTest(APITestCase):
+    def test_backfill_adds_placeholder_and_list_returns_it(self):
+        owner = User.objects.create_user(username="prot", password="pw")
+        variants = {"source": "animal_images/dog.png", "sizes": {"webp": {"320": "animal_images/dog_320w.webp"}}}
+        animal = Animal.objects.create(
+            name="Dog", owner=owner, city="", image="animal_images/dog.png", image_variants=variants
+        )
+        Animal.objects.create(name="Dog2", owner=owner, city="", image="animal_images/dog.png", image_variants=variants)
+
+        with patch(
+            "animals.management.commands.backfill_image_placeholders.read_stored_bytes", return_value=_png_bytes()
+        ) as read:
+            call_command("backfill_image_placeholders", stdout=io.StringIO())
+        self.assertEqual(read.call_count, 1)
+
+        animal.refresh_from_db()
+        self.assertEqual(animal.image_variants["sizes"], variants["sizes"])
+        self.assertTrue(animal.image_variants["placeholder"].startswith("data:image/webp;base64,"))
+
+        self.client.login(username="prot", password="pw")
+        resp = self.client.get(reverse("animal-list-create"))
+        self.assertEqual(resp.data[0]["image_placeholder"], animal.image_variants["placeholder"])
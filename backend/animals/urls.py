@@ -4,7 +4,11 @@ from . import views
 
 urlpatterns = [
     path("animals/", views.AnimalListCreateView.as_view(), name="animal-list-create"),
+    path("animals/batch/", views.animals_batch_view, name="animal-batch"),
     path("animals/<int:pk>/", views.AnimalDetailView.as_view(), name="animal-detail"),
+    path("animals/<int:pk>/image/upload/", views.animal_image_upload_view, name="animal-image-upload"),
+    path("animals/<int:pk>/image/confirm/", views.animal_image_confirm_view, name="animal-image-confirm"),
+    path("animals/images/<path:key>", views.resized_image_view, name="animal-image-resized"),
     path("animals/<int:pk>/request/", views.request_adoption, name="request-adoption"),
     path(
         "animals/<int:animal_id>/request/",
@@ -51,4 +55,14 @@ urlpatterns = [
         views.protectora_adopted_animals,
         name="protectora-animals-adopted",
     ),
+    path(
+        "animals/protectora/export/animals/",
+        views.export_animals_view,
+        name="protectora-export-animals",
+    ),
+    path(
+        "animals/protectora/export/requests/",
+        views.export_adoption_requests_view,
+        name="protectora-export-requests",
+    ),
 ]
@@ -1,36 +1,143 @@
 import logging
 import sys
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db.models import Count, F
 from django.db.models.functions import TruncMonth
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_GET
 
+from PIL import UnidentifiedImageError
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from app.exports import EXPORT_CONTENT_TYPES, streaming_export
+from app.image_cache import DiskLRUCache, get_image_cache
+from app.images import IMAGE_FORMATS, get_image_pool, resize_image
+from app.ratelimit import client_ip, hit
+from app.storages import PublicMediaStorage, confirm_direct_upload, issue_direct_upload
+from app.upload_handlers import install_s3_upload_handler, pop_streamed_files
+from users.models import AdopterProfile
+from users.profile import invalidate_animal
+
+from .cache import get_animals, invalidate_animals, with_favorite_flag
 from .models import AdoptionRequest, Animal
 from .permissions import IsOwnerOrAdmin
 from .serializers import AdoptionRequestSerializer, AnimalSerializer, ProtectoraAnimalSerializer
 from .signals import haversine_distance
+from .tasks import build_animal_image_variants
 
 User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+ANIMAL_EXPORT_FIELDS = (
+    "id",
+    "name",
+    "species",
+    "breed",
+    "age",
+    "gender",
+    "size",
+    "activity",
+    "weight",
+    "city",
+    "since",
+    "vaccinated",
+    "sterilized",
+    "microchipped",
+    "dewormed",
+    "characteristics",
+    "image",
+    "extra_images",
+    "latitude",
+    "longitude",
+    "owner_id",
+    "adopter_id",
+    "created_at",
+    "updated_at",
+)
+
+ADOPTION_REQUEST_EXPORT_FIELDS = (
+    "id",
+    "animal_id",
+    "user_id",
+    "created_at",
+    "form_data",
+)
+
+
+def _parse_ids(value):
+    """'3,1,2' o [3, 1, 2] -> [3, 1, 2] sin repetidos y en el mismo orden; ValueError si no son ids."""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        raise ValueError
+    ids = list(dict.fromkeys(int(v) for v in value))
+    if len(ids) > settings.ANIMALS_BATCH_MAX_IDS:
+        raise ValueError
+    return ids
+
+
+def _batch_response(request, value):
+    try:
+        ids = _parse_ids(value)
+    except (TypeError, ValueError):
+        return Response(
+            {"error": f"Se esperaba una lista de hasta {settings.ANIMALS_BATCH_MAX_IDS} ids de animales."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    results, missing = get_animals(ids, request.user)
+    return Response({"results": results, "missing": missing}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def animals_batch_view(request):
+    """
+    POST /api/animals/batch/  { "ids": [3, 1, 2] }
+    Igual que GET /api/animals/?ids=3,1,2 pero para listas que no caben en la URL.
+    """
+    return _batch_response(request, request.data.get("ids"))
+
 
 class AnimalListCreateView(generics.ListCreateAPIView):
     """
     GET: lista solo los animales sin adoptante (disponibles),
          opcionalmente filtrados por distancia y por nombre (?search=).
+         ?ordering=popular los ordena por número de favoritos.
+         Cada animal indica si el usuario lo tiene en favoritos (is_favorited).
+         Con ?ids=3,1,2 devuelve esos animales (adoptados o no) en ese orden:
+         {"results": [...], "missing": [ids inexistentes]}.
     POST: permite crear un nuevo animal; se asigna automáticamente la protectora creadora.
     """
 
     serializer_class = AnimalSerializer
     permission_classes = [IsAuthenticated]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # La imagen se sube a S3 en streaming mientras llega el cuerpo multipart.
+        if request.method == "POST":
+            install_s3_upload_handler(
+                request, PublicMediaStorage(), Animal._meta.get_field("image").upload_to, ("image",)
+            )
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        if "data" in kwargs:
+            kwargs["data"], self.streamed_files = pop_streamed_files(self.request, kwargs["data"])
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if "ids" in request.query_params:
+            return _batch_response(request, request.query_params["ids"])
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = Animal.objects.filter(adopter__isnull=True, owner__is_active=True)
 
@@ -59,15 +166,18 @@ class AnimalListCreateView(generics.ListCreateAPIView):
             except ValueError:
                 pass
 
-        return queryset
+        if self.request.query_params.get("ordering") == "popular":
+            queryset = queryset.order_by("-favorite_count", "-id")
+        return with_favorite_flag(queryset.select_related("adopter"), self.request.user)
 
     def perform_create(self, serializer):
         # DEBUG: imprimir datos entrantes para creación
         logger.debug(f"DEBUG Animal creation payload keys: {list(self.request.data.keys())}")
         logger.debug(f"DEBUG Animal creation full data: {self.request.data}")
 
+        streamed_files = getattr(self, "streamed_files", {})
         try:
-            serializer.save(owner=self.request.user)
+            animal = serializer.save(owner=self.request.user, **streamed_files)
         except Exception as e:
             # DEBUG: loguear y visualizar stacktrace completo
             logger.exception("DEBUG Error al guardar animal en perform_create")
@@ -76,6 +186,9 @@ class AnimalListCreateView(generics.ListCreateAPIView):
             # vuelvo a lanzar para que Django/DRF lo registre también
             raise
 
+        if "image" in streamed_files:
+            build_animal_image_variants.enqueue((animal.pk, animal.image.name), unique=True)
+
 
 class AnimalDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -89,6 +202,9 @@ class AnimalDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AnimalSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
 
+    def get_queryset(self):
+        return with_favorite_flag(super().get_queryset().select_related("adopter"), self.request.user)
+
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
 
@@ -110,6 +226,50 @@ class AnimalDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().partial_update(request, *args, **kwargs)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def animal_image_upload_view(request, pk):
+    """
+    POST /api/animals/{pk}/image/upload/  { "filename": "foto.jpg" }
+    Devuelve un destino prefirmado para que el navegador suba la imagen directamente
+    al bucket (POST multipart con `fields` + el fichero). Después hay que llamar a
+    /api/animals/{pk}/image/confirm/ con el upload_token recibido.
+    """
+    animal = get_object_or_404(Animal, pk=pk)
+    if not IsOwnerOrAdmin().has_object_permission(request, None, animal):
+        return Response(status=status.HTTP_403_FORBIDDEN)
+
+    upload_to = Animal._meta.get_field("image").upload_to
+    target = issue_direct_upload(PublicMediaStorage(), upload_to, request.data.get("filename", ""), f"animal:{pk}")
+    return Response(target, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def animal_image_confirm_view(request, pk):
+    """
+    POST /api/animals/{pk}/image/confirm/  { "upload_token": "..." }
+    Asocia al animal la imagen subida directamente al bucket y encola la generación de sus derivadas.
+    """
+    animal = get_object_or_404(Animal, pk=pk)
+    if not IsOwnerOrAdmin().has_object_permission(request, None, animal):
+        return Response(status=status.HTTP_403_FORBIDDEN)
+
+    storage = PublicMediaStorage()
+    try:
+        key = confirm_direct_upload(storage, request.data.get("upload_token"), f"animal:{pk}")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # update() en lugar de save(): no hace falta volver a geocodificar la ciudad.
+    Animal.objects.filter(pk=pk).update(image=key, updated_at=timezone.now())
+    invalidate_animals([pk])
+    invalidate_animal(pk)
+    build_animal_image_variants.enqueue((pk, key), unique=True)
+    animal.refresh_from_db()
+    return Response(AnimalSerializer(animal, context={"request": request}).data, status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def request_adoption(request, pk):
@@ -314,3 +474,162 @@ def top_requested_animals_view(request):
     )
     data = [{"name": a.name, "count": a.req_count} for a in qs]
     return Response(data)
+
+
+def _export_format(request):
+    export_format = request.query_params.get("export_format", "ndjson").lower()
+    return export_format if export_format in EXPORT_CONTENT_TYPES else None
+
+
+def _export_denied(request):
+    """
+    Solo protectoras (is_staff) y administradores pueden exportar.
+    Devuelve la respuesta de error correspondiente o None si se puede continuar.
+    """
+    user = request.user
+    if not (user.is_staff or user.is_superuser):
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+    if _export_format(request) is None:
+        return Response(
+            {"error": "Formato no soportado. Usa 'ndjson' o 'csv'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return None
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_animals_view(request):
+    """
+    GET /api/animals/protectora/export/animals/?export_format=ndjson|csv
+    Exporta en streaming todos los animales de la protectora autenticada
+    (o de todas las protectoras si es superusuario), adoptados o no.
+    """
+    denied = _export_denied(request)
+    if denied:
+        return denied
+
+    qs = Animal.objects.order_by("pk")
+    if not request.user.is_superuser:
+        qs = qs.filter(owner=request.user)
+
+    return streaming_export(
+        qs,
+        ANIMAL_EXPORT_FIELDS,
+        _export_format(request),
+        "animales",
+        owner_username=F("owner__username"),
+        adopter_username=F("adopter__username"),
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_adoption_requests_view(request):
+    """
+    GET /api/animals/protectora/export/requests/?export_format=ndjson|csv
+    Exporta en streaming las solicitudes de adopción (con su form_data)
+    de los animales de la protectora autenticada, o todas si es superusuario.
+    """
+    denied = _export_denied(request)
+    if denied:
+        return denied
+
+    qs = AdoptionRequest.objects.order_by("pk")
+    if not request.user.is_superuser:
+        qs = qs.filter(animal__owner=request.user)
+
+    return streaming_export(
+        qs,
+        ADOPTION_REQUEST_EXPORT_FIELDS,
+        _export_format(request),
+        "solicitudes",
+        animal_name=F("animal__name"),
+        username=F("user__username"),
+        email=F("user__email"),
+    )
+
+
+def _read_stored_image(key):
+    storage = Animal._meta.get_field("image").storage
+    with storage.open(key) as stored:
+        return stored.read()
+
+
+def _dimension(value):
+    """Redondea al siguiente tamaño de IMAGE_RESIZE_SIZES, para que cada imagen tenga pocas variantes."""
+    if value in (None, ""):
+        return None
+    value = int(value)
+    if value <= 0:
+        raise ValueError(value)
+    return next(size for size in sorted(settings.IMAGE_RESIZE_SIZES) if size >= value)
+
+
+def _resizable(key):
+    """
+    Solo claves bajo IMAGE_RESIZE_PREFIXES (las de Animal.image, con sus derivadas
+    y subidas directas, y los prefijos que se añadan para extra_images). Se decide
+    sin consultar nada: la vista es pública. Nunca avatares, que van en el storage privado.
+    """
+    if ".." in key.split("/") or key.startswith(AdopterProfile._meta.get_field("avatar").upload_to):
+        return False
+    return key.startswith(tuple(settings.IMAGE_RESIZE_PREFIXES))
+
+
+@require_GET
+def resized_image_view(request, key):
+    """
+    GET /api/animals/images/<key>?w=<ancho>&h=<alto>&format=webp|jpeg|png
+    Devuelve una imagen de animal redimensionada al vuelo (sin ampliar). Las medidas
+    se redondean a IMAGE_RESIZE_SIZES y generar una variante nueva cuenta para el
+    límite "image_resize" por IP; las que ya están en la caché en disco no.
+    Se sirven con cabeceras de caché de larga duración, ya que las claves del
+    storage no se reutilizan.
+    """
+    if not _resizable(key):
+        raise Http404
+
+    fmt = request.GET.get("format", "webp").lower()
+    try:
+        width = _dimension(request.GET.get("w"))
+        height = _dimension(request.GET.get("h"))
+    except (ValueError, StopIteration):
+        width = height = None
+    if (width is None and height is None) or fmt not in IMAGE_FORMATS:
+        return JsonResponse(
+            {"error": f"Indica w y/o h (máximo {max(settings.IMAGE_RESIZE_SIZES)}) y un formato válido."},
+            status=400,
+        )
+
+    variant = f"{key}|{width or ''}x{height or ''}|{fmt}"
+    etag = f'"{DiskLRUCache.digest(variant)[:32]}"'
+    cache_control = "public, max-age=31536000, immutable"
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    image_cache = get_image_cache()
+    payload = image_cache.get(variant)
+    if payload is None:
+        allowed, retry_after = hit("image_resize", client_ip(request))
+        if not allowed:
+            response = JsonResponse({"error": "Demasiadas peticiones. Inténtalo más tarde."}, status=429)
+            response["Retry-After"] = str(retry_after)
+            return response
+
+        def produce():
+            data = _read_stored_image(key)
+            return get_image_pool().submit(resize_image, data, width, height, fmt).result()
+
+        try:
+            payload = image_cache.get_or_create(variant, produce)
+        except (FileNotFoundError, UnidentifiedImageError):
+            raise Http404
+
+    response = HttpResponse(payload, content_type=IMAGE_FORMATS[fmt][2])
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,19 @@
+"""
+Cachés que todos los procesos (workers de gunicorn y de la cola de tareas) deben
+ver igual: límites de peticiones, invalidación de sesiones y tokens, y las fichas
+y perfiles que las tareas invalidan. Con LocMemCache cada proceso tiene la suya.
+"""
+
+from django.conf import settings
+
+SHARED_CACHE_SETTINGS = ("RATE_LIMIT_CACHE", "AUTH_TOKEN_CACHE", "SESSION_INVALIDATION_CACHE")
+
+
+def is_process_local(alias):
+    return settings.CACHES[alias]["BACKEND"].endswith(".LocMemCache")
+
+
+def process_local_caches():
+    """Alias de esas cachés que solo ve el propio proceso."""
+    aliases = {"default", *(getattr(settings, name) for name in SHARED_CACHE_SETTINGS)}
+    return sorted(alias for alias in aliases if is_process_local(alias))
@@ -0,0 +1,4 @@
+"""
+Backend de PostgreSQL (psycopg2) con pool de conexiones: ENGINE = "app.db_pool" y
+los tamaños en DATABASES[alias]["POOL"] (ver app.settings).
+"""
@@ -0,0 +1,96 @@
+import functools
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.db.utils import NO_DB_ALIAS
+from django.utils.asyncio import async_unsafe
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from .pool import ConnectionPool, PoolTimeout, get_pool
+
+
+def _connect(conn_params):
+    connection = psycopg2.connect(**conn_params)
+    # Igual que el backend de Django: los JSONField se decodifican una sola vez.
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def _check(connection):
+    """SELECT 1 antes de entregar una conexión que llevaba un rato parada."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def _reset(connection):
+    """Deja la conexión fuera de cualquier transacción; False si ya no sirve."""
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    El backend de PostgreSQL de Django, pero las conexiones salen de un pool por
+    proceso (app.db_pool.pool) y vuelven a él al cerrarse: CONN_MAX_AGE debe ser 0
+    y cada petición toma una conexión ya abierta en vez de abrir otra.
+    """
+
+    def _connection_pool(self, conn_params):
+        options = self.settings_dict["POOL"]
+        factory = functools.partial(
+            ConnectionPool,
+            functools.partial(_connect, conn_params),
+            _check,
+            _reset,
+            min_size=options.get("MIN_SIZE", 0),
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 5),
+            max_idle=options.get("MAX_IDLE", 300),
+            max_lifetime=options.get("MAX_LIFETIME", 3600),
+        )
+        return get_pool(self.alias, conn_params, factory)
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+        pool = self._connection_pool(conn_params)
+        try:
+            connection = pool.getconn()
+        except PoolTimeout as e:
+            raise psycopg2.OperationalError(str(e)) from e
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = IsolationLevel(options.get("isolation_level", IsolationLevel.READ_COMMITTED))
+        if "isolation_level" in options:
+            connection.isolation_level = self.isolation_level
+        self._checked_out_from = pool
+        return connection
+
+    def _close(self):
+        pool, self._checked_out_from = getattr(self, "_checked_out_from", None), None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+            self.connection = None
+
+    def close_if_health_check_failed(self):
+        # El pool comprueba las conexiones al entregarlas.
+        if self.alias != NO_DB_ALIAS:
+            return
+        return super().close_if_health_check_failed()
@@ -0,0 +1,224 @@
+"""
+Pool de conexiones por alias y proceso, independiente del driver: el backend
+(app.db_pool.base) le da las funciones para abrir, comprobar y limpiar conexiones.
+"""
+
+import os
+import threading
+import time
+
+# Una conexión que lleva más de esto sin usarse se comprueba antes de entregarla.
+PING_AFTER = 10
+
+
+class PoolTimeout(Exception):
+    """No quedó ninguna conexión libre en TIMEOUT segundos (pool agotado)."""
+
+
+class ConnectionPool:
+    """
+    Entre MIN_SIZE y MAX_SIZE conexiones abiertas. getconn() da la última devuelta
+    (la más caliente) o abre otra si no se ha llegado a MAX_SIZE; si no, espera hasta
+    TIMEOUT segundos a que alguien devuelva una. Las libres más de MAX_IDLE segundos
+    (por encima de MIN_SIZE) y las abiertas hace más de MAX_LIFETIME se cierran.
+    """
+
+    def __init__(self, connect, check, reset, min_size=0, max_size=10, timeout=5.0, max_idle=300, max_lifetime=3600):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._cond = threading.Condition()
+        self._idle = []  # (conexión, devuelta en), la más reciente al final
+        self._opened_at = {}  # id(conexión) -> abierta en
+        self._size = 0  # abiertas o abriéndose, en uso o libres
+        self._in_use = 0
+        self._filled = False
+        self._counters = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "failed_checks": 0,
+            "peak_in_use": 0,
+        }
+        self._wait_seconds = 0.0
+
+    def getconn(self):
+        if not self._filled:
+            self._fill()
+        started = time.monotonic()
+        with self._cond:
+            self._counters["checkouts"] += 1
+        while True:
+            conn, returned_at = self._take(started)
+            if conn is None:
+                return self._open()
+            if self._usable(conn, returned_at):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn):
+        now = time.monotonic()
+        if now - self._opened_at.get(id(conn), now) >= self.max_lifetime or not self.reset(conn):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, now))
+            self._cond.notify()
+
+    def close(self):
+        """Cierra las conexiones libres (las que están en uso se cierran al devolverse)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def snapshot(self):
+        with self._cond:
+            counters = dict(self._counters)
+            waited = self._wait_seconds
+            size, idle, in_use = self._size, len(self._idle), self._in_use
+        return {
+            **counters,
+            "size": size,
+            "idle": idle,
+            "in_use": in_use,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "wait_ms_avg": round(waited / counters["waits"] * 1000, 3) if counters["waits"] else None,
+        }
+
+    def _take(self, started):
+        """Una conexión libre, o (None, None) con un hueco reservado para abrir otra."""
+        waited = False
+        with self._cond:
+            try:
+                while True:
+                    self._expire_idle()
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn = returned_at = None
+                        break
+                    remaining = started + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s ({self.max_size} en uso).")
+                    waited = True
+                    self._cond.wait(remaining)
+            finally:
+                if waited:
+                    self._counters["waits"] += 1
+                    self._wait_seconds += time.monotonic() - started
+            self._in_use += 1
+            self._counters["peak_in_use"] = max(self._counters["peak_in_use"], self._in_use)
+        return conn, returned_at
+
+    def _expire_idle(self):
+        now = time.monotonic()
+        keep = []
+        for conn, returned_at in self._idle:
+            idle_too_long = now - returned_at >= self.max_idle and self._size > self.min_size
+            if idle_too_long or now - self._opened_at[id(conn)] >= self.max_lifetime:
+                self._size -= 1
+                self._close(conn)
+            else:
+                keep.append((conn, returned_at))
+        self._idle = keep
+
+    def _usable(self, conn, returned_at):
+        if time.monotonic() - returned_at < PING_AFTER or self.check(conn):
+            return True
+        with self._cond:
+            self._counters["failed_checks"] += 1
+        return False
+
+    def _open(self):
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opened_at[id(conn)] = time.monotonic()
+            self._counters["connections_opened"] += 1
+        return conn
+
+    def _fill(self):
+        """Abre MIN_SIZE conexiones la primera vez que se usa el pool."""
+        self._filled = True
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+                self._in_use += 1
+            self.putconn(self._open())
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _close(self, conn):
+        with self._cond:
+            self._opened_at.pop(id(conn), None)
+            self._counters["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, params, factory):
+    """
+    El pool de `alias` en este proceso (tras un fork se crea otro: las conexiones no
+    se comparten entre procesos). Si cambian los parámetros de conexión (p. ej. la
+    base de datos de tests) se sustituye por uno nuevo creado con factory().
+    """
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        current = _pools.get(key)
+        if current is not None and current[0] == params:
+            return current[1]
+        pool = factory()
+        _pools[key] = (params, pool)
+    if current is not None:
+        current[1].close()
+    return pool
+
+
+def pool_metrics():
+    """Estado de los pools de este proceso por alias."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {alias: pool for (owner, alias), (_, pool) in _pools.items() if owner == pid}
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """Cierra las conexiones libres de todos los pools de este proceso (al parar un worker)."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (owner, _), (_, pool) in _pools.items() if owner == pid]
+    for pool in pools:
+        pool.close()
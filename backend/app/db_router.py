@@ -0,0 +1,119 @@
+"""
+Lecturas en réplicas (DATABASE_ROUTERS = ["app.db_router.ReplicaRouter"]).
+
+Las escrituras van siempre a "default". Las lecturas solo van a una réplica dentro
+de una petición GET/HEAD/OPTIONS a la que app.middleware.ReplicaRoutingMiddleware
+ha asignado una; fuera de las peticiones (tareas, comandos, shell) y en el resto de
+métodos se lee del primario. Una réplica con más retraso que REPLICA_MAX_LAG_SECONDS
+(o que no responde) se deja de usar hasta la siguiente comprobación.
+"""
+
+import contextvars
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+# Segundos desde la última transacción aplicada; 0 si la réplica está al día (o no es réplica).
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@contextmanager
+def read_from(alias):
+    """Lecturas del bloque en `alias` (None: el primario)."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def primary_reads():
+    """Lecturas del bloque en el primario, p. ej. al rellenar una caché compartida."""
+    return read_from(None)
+
+
+def use_primary(view):
+    """Decorador para vistas que deben leer del primario aunque la petición sea GET."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with primary_reads():
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+def measure_lag(alias):
+    """Retraso de la réplica en segundos, o None si no se puede consultar."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            (lag,) = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return float(lag or 0)
+
+
+class ReplicaHealth:
+    """Estado de cada réplica, comprobado como mucho cada REPLICA_LAG_CHECK_SECONDS por proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks = {}
+
+    def healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._checks.get(alias, (None, None))
+        if checked_at is None or now - checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+            lag = measure_lag(alias)
+            with self._lock:
+                self._checks[alias] = (now, lag)
+        return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def snapshot(self):
+        with self._lock:
+            return {alias: lag for alias, (_, lag) in self._checks.items()}
+
+    def clear(self):
+        with self._lock:
+            self._checks.clear()
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """Una réplica sana al azar, o None si no hay ninguna (se lee del primario)."""
+    candidates = [alias for alias in settings.DATABASE_REPLICAS if health.healthy(alias)]
+    return random.choice(candidates) if candidates else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas tienen los mismos datos.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in settings.DATABASE_REPLICAS else None
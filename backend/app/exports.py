@@ -0,0 +1,66 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+class _Echo:
+    """
+    Pseudo-buffer para csv.writer: devuelve la línea en lugar de guardarla,
+    así cada fila se puede emitir en cuanto se genera.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return value
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[column]) for column in columns])
+
+
+def streaming_export(queryset, fields, export_format, filename, chunk_size=EXPORT_CHUNK_SIZE, **aliases):
+    """
+    Devuelve un StreamingHttpResponse que recorre el queryset con
+    .values().iterator(), de modo que nunca se materializa entero en memoria
+    y el cliente empieza a recibir datos desde la primera fila.
+
+    `fields` son nombres de campo (se admiten lookups con "__") y `aliases`
+    expresiones adicionales (p.ej. owner_username=F("owner__username")).
+    """
+    columns = list(fields) + list(aliases)
+    rows = queryset.values(*fields, **aliases).iterator(chunk_size=chunk_size)
+
+    if export_format == "csv":
+        content = csv_lines(rows, columns)
+    else:
+        content = ndjson_lines(rows)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    response["Cache-Control"] = "no-store"
+    response["X-Accel-Buffering"] = "no"
+    return response
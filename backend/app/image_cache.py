@@ -0,0 +1,182 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Un .tmp más antiguo que esto es de una escritura que no terminó.
+STALE_TMP_SECONDS = 3600
+
+
+class _Flight:
+    """Generación en curso de una variante; el resto de peticiones espera su resultado."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DiskLRUCache:
+    """
+    Caché en disco local acotada por el total de bytes, con expulsión LRU.
+
+    Todo el estado está en el disco, así que el límite vale para el directorio
+    aunque lo compartan varios procesos: cada acierto actualiza la fecha de
+    modificación del fichero y, como mucho cada scan_interval segundos, un proceso
+    (con un bloqueo sobre un fichero) recorre el directorio y borra los menos usados hasta caber en
+    max_bytes. Entre dos recorridos el total puede pasarse en lo escrito mientras.
+    Las peticiones concurrentes de la misma clave en un proceso se agrupan: solo
+    la primera genera la variante.
+    """
+
+    def __init__(self, directory, max_bytes, scan_interval=60):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scanned_marker = self.directory / ".scanned"
+        self._scan_lock = self.directory / ".lock"
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, digest):
+        return self.directory / digest[:2] / digest
+
+    def _entries(self):
+        """(mtime, tamaño, ruta) de cada entrada; borra los temporales abandonados."""
+        now = time.time()
+        for path in self.directory.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not path.name.endswith(".tmp"):
+                yield stat.st_mtime, stat.st_size, path
+            elif now - stat.st_mtime > STALE_TMP_SECONDS:
+                path.unlink(missing_ok=True)
+
+    @property
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def _try_lock(lock):
+        """Bloqueo exclusivo sin esperar del fichero abierto `lock`; False si lo tiene otro proceso."""
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def prune(self):
+        """
+        Borra las entradas con la fecha de modificación más antigua hasta caber en
+        max_bytes. Devuelve el total que queda, o None si otro proceso ya lo está haciendo.
+        """
+        with open(self._scan_lock, "a") as lock:
+            if not self._try_lock(lock):
+                return None
+            self._scanned_marker.touch()
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+            return total
+
+    def _prune_if_due(self):
+        try:
+            scanned_at = self._scanned_marker.stat().st_mtime
+        except FileNotFoundError:
+            scanned_at = 0
+        if time.time() - scanned_at >= self.scan_interval:
+            self.prune()
+
+    def get(self, key):
+        path = self._path(self.digest(key))
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # No existe o la ha expulsado otro proceso que comparte el directorio.
+            return None
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(self.digest(key))
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        self._prune_if_due()
+
+    def get_or_create(self, key, producer):
+        """
+        Devuelve la entrada `key`, generándola con producer() si no existe.
+        Si otra petición ya la está generando, espera a su resultado en lugar de repetir el trabajo.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = producer()
+            self.set(key, flight.result)
+            return flight.result
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    global _image_cache
+    if _image_cache is None:
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = DiskLRUCache(
+                    settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES, settings.IMAGE_CACHE_SCAN_SECONDS
+                )
+    return _image_cache
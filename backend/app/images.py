@@ -0,0 +1,185 @@
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from PIL import Image, ImageOps
+
+from app.storages import candidate_keys, referenced_strings
+
+logger = logging.getLogger(__name__)
+
+# formato -> (formato de Pillow, extensión, content type, opciones de guardado)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": ("PNG", "png", "image/png", {"optimize": True}),
+}
+DERIVATIVE_FORMATS = ("webp", "jpeg")
+
+_pool = None
+
+
+def get_image_pool():
+    """
+    Pool de procesos compartido para el trabajo de Pillow (CPU puro),
+    así redimensionar no compite por el GIL con los hilos que atienden peticiones.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _pool
+
+
+def read_uploaded_bytes(field_file):
+    """
+    Si el FieldFile contiene un fichero recién subido (todavía no guardado en el storage),
+    devuelve su contenido; si no, None. Pensado para usarse en pre_save.
+    """
+    if not field_file or getattr(field_file, "_committed", True):
+        return None
+    upload = field_file.file
+    upload.seek(0)
+    data = upload.read()
+    upload.seek(0)
+    return data
+
+
+def _open_image(data):
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    return image
+
+
+def _encode(image, fmt):
+    pil_format, _, _, options = IMAGE_FORMATS[fmt]
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    mode = "RGBA" if has_alpha and fmt != "jpeg" else "RGB"
+    buffer = io.BytesIO()
+    image.convert(mode).save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def render_derivatives(data, widths):
+    """
+    Genera las derivadas de una imagen: {anchura: {formato: bytes}}.
+    Nunca amplía: las anchuras mayores que el original se recortan a la anchura original.
+    Se ejecuta dentro del pool de procesos.
+    """
+    image = _open_image(data)
+    targets = sorted({min(width, image.width) for width in widths})
+
+    rendered = {}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+        rendered[width] = {fmt: _encode(resized, fmt) for fmt in DERIVATIVE_FORMATS}
+    return rendered
+
+
+def resize_image(data, width, height, fmt):
+    """
+    Ajusta la imagen dentro de la caja width x height (cualquiera de los dos puede ser None),
+    manteniendo la proporción y sin ampliar. Se ejecuta dentro del pool de procesos.
+    """
+    image = _open_image(data)
+    box = (width or image.width, height or image.height)
+    if box[0] < image.width or box[1] < image.height:
+        image = ImageOps.contain(image, box, Image.Resampling.LANCZOS)
+    return _encode(image, fmt)
+
+
+def render_placeholder(data, size=None):
+    """
+    Placeholder de baja calidad (LQIP): la imagen reducida a unos pocos píxeles,
+    en WebP y como data URI, para pintarla difuminada mientras llega la real.
+    Ocupa unos cientos de bytes. Se ejecuta dentro del pool de procesos.
+    """
+    size = size or settings.IMAGE_PLACEHOLDER_SIZE
+    image = ImageOps.contain(_open_image(data), (size, size), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "WEBP", quality=30, method=6)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def build_placeholder(data):
+    return get_image_pool().submit(render_placeholder, data, settings.IMAGE_PLACEHOLDER_SIZE).result()
+
+
+def build_variants(data, name, storage, widths=None):
+    """
+    Genera las derivadas y el placeholder de `data` en el pool de procesos y guarda
+    las derivadas junto al original (`name`) en `storage`. Devuelve el mapa que se
+    persiste en el modelo:
+        {"source": name, "sizes": {"webp": {"320": key, ...}, "jpeg": {...}}, "placeholder": "data:..."}
+    """
+    widths = widths or settings.IMAGE_DERIVATIVE_WIDTHS
+    pool = get_image_pool()
+    placeholder_future = pool.submit(render_placeholder, data, settings.IMAGE_PLACEHOLDER_SIZE)
+    rendered = pool.submit(render_derivatives, data, widths).result()
+
+    stem, _ = os.path.splitext(name)
+    sizes = {}
+    for width, formats in rendered.items():
+        for fmt, payload in formats.items():
+            extension = IMAGE_FORMATS[fmt][1]
+            key = storage.save(f"{stem}_{width}w.{extension}", ContentFile(payload))
+            sizes.setdefault(fmt, {})[str(width)] = key
+    return {"source": name, "sizes": sizes, "placeholder": placeholder_future.result()}
+
+
+def read_stored_bytes(name, storage):
+    with storage.open(name) as stored:
+        return stored.read()
+
+
+def build_variants_from_storage(name, storage, widths=None):
+    """Como build_variants, pero leyendo el original ya guardado en `storage`."""
+    return build_variants(read_stored_bytes(name, storage), name, storage, widths)
+
+
+def srcset(field_file, variants):
+    """
+    Devuelve {formato: "url 320w, url 640w, ..."} a partir del mapa de derivadas.
+    Si la imagen ha cambiado desde que se generaron, devuelve {}.
+    """
+    if not field_file or not variants or variants.get("source") != field_file.name:
+        return {}
+    storage = field_file.storage
+    return {
+        fmt: ", ".join(f"{storage.url(key)} {width}w" for width, key in sorted(keys.items(), key=lambda i: int(i[0])))
+        for fmt, keys in variants.get("sizes", {}).items()
+    }
+
+
+def placeholder(field_file, variants):
+    """Placeholder guardado en el mapa de derivadas, o None si la imagen ha cambiado desde entonces."""
+    if not field_file or not variants or variants.get("source") != field_file.name:
+        return None
+    return variants.get("placeholder")
+
+
+def build_extra_placeholders(extra_images, existing, storage):
+    """
+    Placeholders de las imágenes extra: {referencia: data URI}. Reutiliza los de
+    `existing` y solo descarga las referencias nuevas. Las que no están en el storage
+    (o no se pueden leer) quedan a None para no reintentarlas en cada guardado.
+    """
+    placeholders = {}
+    for reference in referenced_strings(extra_images):
+        if reference in existing:
+            placeholders[reference] = existing[reference]
+            continue
+        placeholders[reference] = None
+        try:
+            key = next((key for key in candidate_keys(reference) if storage.exists(key)), None)
+            if key:
+                placeholders[reference] = build_placeholder(read_stored_bytes(key, storage))
+        except Exception:
+            logger.exception("Error generando el placeholder de %s", reference)
+    return placeholders
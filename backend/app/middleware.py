@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.urls import reverse
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+from users.tokens import verify_access
+
+from .db_router import choose_replica, read_from
+
+
+def csrf_token_response(request):
+    return JsonResponse({"csrfToken": get_token(request)})
+
+
+def check_session_response(request):
+    """
+    Lo mismo que users.views.check_session: sesión válida o, si no, token de acceso
+    (ver users.tokens). 200 si hay usuario, 401 si no, 403 si el token no es válido.
+    """
+    if get_user(request).is_authenticated:
+        return JsonResponse({"message": "Session is valid!"})
+    auth = request.headers.get("Authorization", "").split()
+    if len(auth) == 2 and auth[0].lower() == "bearer":
+        try:
+            verify_access(auth[1])
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=403)
+        return JsonResponse({"message": "Session is valid!"})
+    return JsonResponse({"message": "Session is invalid, please log in."}, status=401)
+
+
+class FastPathMiddleware:
+    """
+    Responde a /csrf-token/ y /users/check_session/ (GET) sin resolver la URL ni
+    pasar por DRF ni por el resto de middlewares. La SPA llama a ambos en cada
+    navegación. Va justo después de CsrfViewMiddleware, que sigue leyendo y poniendo
+    la cookie csrftoken; sesión, CORS y cabeceras de seguridad se aplican igual.
+    Se desactiva con FAST_PATH_ENABLED=False (las vistas normales dan lo mismo).
+    """
+
+    def __init__(self, get_response):
+        if not settings.FAST_PATH_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.routes = None
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD"):
+            if self.routes is None:
+                self.routes = {
+                    reverse("csrf-token"): csrf_token_response,
+                    reverse("check_session"): check_session_response,
+                }
+            handler = self.routes.get(request.path_info)
+            if handler is not None:
+                return handler(request)
+        return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Asigna una réplica (app.db_router) a las lecturas de las peticiones GET, HEAD y
+    OPTIONS. Tras una escritura correcta, el navegador recibe la cookie
+    REPLICA_PIN_COOKIE y sus peticiones leen del primario durante
+    REPLICA_STICKY_SECONDS, para que vea enseguida lo que acaba de cambiar aunque
+    las réplicas vayan con retraso. Sin DATABASE_REPLICAS no se instala.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        alias = choose_replica() if safe and not self._pinned(request) else None
+        with read_from(alias):
+            response = self.get_response(request)
+        if not safe and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def _pinned(self, request):
+        try:
+            return float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre created_at, de más reciente a más antiguo.
+    Cada página es un rango del índice en lugar de un OFFSET, así que cuesta lo
+    mismo la primera que la página mil, y no se repiten ni saltan filas si entran
+    registros nuevos mientras se pagina. Respuesta: {"next", "previous", "results"}.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "limit"
+    max_page_size = 200
+
+
+class UsernameCursorPagination(CursorPagination):
+    """Paginación por cursor en orden alfabético de username (único, así que estable)."""
+
+    ordering = ("username",)
+    page_size = 50
+    page_size_query_param = "limit"
+    max_page_size = 200
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .caches import is_process_local
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """'3/d' -> (3, 86400). Acepta s, m, h y d (segundo, minuto, hora, día)."""
+    limit, period = rate.split("/")
+    return int(limit), PERIODS[period[0]]
+
+
+def _cache():
+    return caches[settings.RATE_LIMIT_CACHE]
+
+
+if settings.RATE_LIMIT_ENABLED and is_process_local(settings.RATE_LIMIT_CACHE):
+    logger.warning(
+        "RATE_LIMIT_CACHE (%s) es local a cada proceso: los límites se cuentan por proceso, "
+        "no en total. Define REDIS_URL si hay más de uno.",
+        settings.RATE_LIMIT_CACHE,
+    )
+
+
+def _retry_after(limit, period, previous, current, elapsed):
+    """Segundos hasta que la estimación de la ventana deslizante deje pasar una petición más."""
+    if current + 1 <= limit:
+        # Basta con que el peso de la ventana anterior baje lo suficiente.
+        wait = period * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        # Hay que esperar a la ventana siguiente, donde la actual pasa a ser la anterior.
+        wait = period - elapsed + (period * (1 - (limit - 1) / current) if limit > 0 else period)
+    return max(1, math.ceil(wait))
+
+
+def hit(scope, ident, rate=None, now=None):
+    """
+    Cuenta una petición de `ident` (IP, usuario, email...) en `scope` y devuelve
+    (permitida, segundos hasta poder reintentar).
+
+    Ventana deslizante aproximada con dos contadores de ventana fija: el de la
+    ventana actual más el de la anterior ponderado por la parte que aún solapa.
+    Solo usa add/incr/get_many de la caché, que son atómicos en Redis y Memcached,
+    y ninguna consulta a la base de datos. Una petición rechazada no cuenta.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return True, 0
+    limit, period = parse_rate(rate or settings.RATE_LIMITS[scope])
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = now - window * period
+
+    digest = hashlib.sha1(str(ident).encode()).hexdigest()[:20]
+    current_key = f"rl:{scope}:{digest}:{window}"
+    previous_key = f"rl:{scope}:{digest}:{window - 1}"
+
+    cache = _cache()
+    cache.add(current_key, 0, timeout=2 * period)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # El contador expiró entre add e incr.
+        cache.set(current_key, 1, timeout=2 * period)
+        current = 1
+    previous = cache.get(previous_key, 0)
+
+    if previous * (1 - elapsed / period) + current <= limit:
+        return True, 0
+    try:
+        cache.decr(current_key)
+    except ValueError:
+        pass
+    return False, _retry_after(limit, period, previous, current - 1, elapsed)
+
+
+def client_ip(request):
+    """IP del cliente; respeta REST_FRAMEWORK["NUM_PROXIES"] igual que los throttles de DRF."""
+    return BaseThrottle().get_ident(request)
+
+
+def _ident(request, key):
+    if key == "ip":
+        return client_ip(request)
+    if key == "user":
+        return f"user:{request.user.pk}" if request.user.is_authenticated else f"ip:{client_ip(request)}"
+    if key.startswith("data:"):
+        value = request.data.get(key[5:], "")
+        return str(value).strip().lower() or None
+    return key(request)
+
+
+def too_many_requests(retry_after, message=None):
+    response = Response(
+        {"error": message or "Demasiadas peticiones. Inténtalo más tarde.", "retry_after": retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, key="ip", rate=None, methods=("POST",), message=None):
+    """
+    Decorador para vistas de función de DRF (debajo de @api_view). `key` puede ser
+    "ip", "user" (o la IP si es anónimo), "data:<campo>" (p. ej. el email enviado)
+    o una función request -> identificador. Responde 429 con Retry-After al superar el límite.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                ident = _ident(request, key)
+                if ident is not None:
+                    allowed, retry_after = hit(scope, ident, rate)
+                    if not allowed:
+                        return too_many_requests(retry_after, message)
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Throttle de DRF sobre `hit`: mismo almacenamiento y mismas ventanas que el
+    decorador. Las subclases fijan `scope` (clave de RATE_LIMITS) y `key`.
+    """
+
+    scope = None
+    key = "ip"
+
+    def allow_request(self, request, view):
+        ident = _ident(request, self.key)
+        if ident is None:
+            return True
+        allowed, self.retry_after = hit(self.scope, ident)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    scope = "login"
+
+
+class LoginUsernameThrottle(SlidingWindowThrottle):
+    scope = "login_username"
+    key = "data:username"
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+
+import boto3
+from botocore.config import Config
+
+
+class S3Metrics:
+    """
+    Contadores por operación de S3 (llamadas, errores y latencia) del proceso actual.
+    Se alimentan con los eventos de botocore del cliente compartido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, seconds, error=False):
+        with self._lock:
+            stats = self._operations.setdefault(
+                operation, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                operation: {**stats, "avg_ms": round(stats["total_seconds"] * 1000 / stats["calls"], 2)}
+                for operation, stats in self._operations.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+s3_metrics = S3Metrics()
+
+
+def _before_call(model, context, **kwargs):
+    context["s3_operation"] = model.name
+    context["s3_started_at"] = time.perf_counter()
+
+
+def _after_call(http_response, context, **kwargs):
+    if "s3_started_at" in context:
+        s3_metrics.record(
+            context["s3_operation"],
+            time.perf_counter() - context.pop("s3_started_at"),
+            error=http_response.status_code >= 300,
+        )
+
+
+def _after_call_error(context, **kwargs):
+    # Fallo de red (timeout, conexión rechazada...) tras agotar los reintentos.
+    if "s3_started_at" in context:
+        s3_metrics.record(context["s3_operation"], time.perf_counter() - context.pop("s3_started_at"), error=True)
+
+
+def client_config():
+    """
+    Pool de conexiones HTTP, keep-alive y política de reintentos del cliente compartido.
+    Todas las peticiones del proceso reutilizan las mismas conexiones a MinIO/S3.
+    """
+    return Config(
+        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=settings.S3_CONNECT_TIMEOUT,
+        read_timeout=settings.S3_READ_TIMEOUT,
+        retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+        s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+    )
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_local = threading.local()
+
+
+def _session():
+    return boto3.session.Session(
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    )
+
+
+def _create_client():
+    client = _session().client(
+        "s3",
+        region_name=getattr(settings, "AWS_S3_REGION_NAME", None),
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+        use_ssl=settings.AWS_S3_USE_SSL,
+        verify=settings.AWS_S3_VERIFY,
+        config=client_config(),
+    )
+    client.meta.events.register("before-call.s3", _before_call)
+    client.meta.events.register("after-call.s3", _after_call)
+    client.meta.events.register("after-call-error.s3", _after_call_error)
+    return client
+
+
+def get_s3_client():
+    """
+    Cliente de S3 único por proceso. Los clientes de botocore son thread-safe,
+    así que todos los hilos y todos los storages comparten su pool de conexiones.
+    Se vuelve a crear tras un fork para no compartir sockets con el proceso padre.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = _create_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_s3_resource():
+    """
+    Los resources de boto3 no son thread-safe, así que hay uno por hilo;
+    pero todos delegan en el cliente compartido (y en su pool de conexiones).
+    """
+    client = get_s3_client()
+    resource = getattr(_local, "resource", None)
+    if resource is None or resource.meta.client is not client:
+        resource = _session().resource("s3", region_name=client.meta.region_name, endpoint_url=client.meta.endpoint_url)
+        resource.meta.client = client
+        _local.resource = resource
+    return resource
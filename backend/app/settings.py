@@ -40,14 +40,18 @@ INSTALLED_APPS = [
     "animals",
     "donacions",
     "contact",
+    "outbox",
+    "taskqueue",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "app.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
+    "app.middleware.FastPathMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -73,17 +77,61 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "app.wsgi.application"
 
+# Conexiones a PostgreSQL. Con DB_POOL_MAX_SIZE > 0 (por defecto) cada proceso tiene un
+# pool (app.db_pool) del que las peticiones toman conexiones ya abiertas; el máximo por
+# proceso debe cubrir sus hilos y, sumado entre procesos, quedar por debajo de
+# max_connections. Con DB_POOL_MAX_SIZE=0, conexiones persistentes por hilo
+# (DB_CONN_MAX_AGE) que se comprueban antes de reutilizarse.
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "app.db_pool" if DB_POOL_MAX_SIZE else "django.db.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB_NAME", "adoptable_db"),
         "USER": os.getenv("POSTGRES_USER", "marc"),
         "PASSWORD": read_secret("postgres_password"),
         "HOST": os.getenv("POSTGRES_HOST", "db"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": 0 if DB_POOL_MAX_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "MAX_SIZE": DB_POOL_MAX_SIZE,
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "5")),  # espera máxima por una conexión libre
+            "MAX_IDLE": 300,
+            "MAX_LIFETIME": 3600,
+        },
     }
 }
 
+# Réplicas de lectura (app.db_router): POSTGRES_REPLICA_HOSTS="host1,host2" con las
+# mismas credenciales que el primario. "replica" existe siempre: sin réplicas
+# configuradas apunta al primario, no se usa y en los tests es un espejo de default.
+REPLICA_HOSTS = [host for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",") if host]
+for number, host in enumerate(REPLICA_HOSTS or [DATABASES["default"]["HOST"]]):
+    DATABASES["replica" if number == 0 else f"replica{number + 1}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"] if REPLICA_HOSTS else []
+DATABASE_ROUTERS = ["app.db_router.ReplicaRouter"]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_SECONDS = 5
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))  # más que el retraso máximo
+REPLICA_PIN_COOKIE = "primary_reads_until"
+
+# Caché. Con REDIS_URL (el servicio redis de docker-compose) la comparten todos los
+# procesos; sin ella es una caché en memoria de cada proceso, válida solo con uno:
+# límites de peticiones, revocaciones e invalidaciones no se verían entre procesos
+# (ver app.caches; gunicorn no arranca varios workers así). El Redis de docker-compose
+# no expulsa claves (noeviction): toda escritura debe llevar timeout, nunca None.
+if os.getenv("REDIS_URL"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.getenv("REDIS_URL")}}
+else:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "OPTIONS": {"MAX_ENTRIES": 10000}}
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -109,7 +157,6 @@ AWS_S3_CUSTOM_DOMAIN = os.getenv("AWS_S3_CUSTOM_DOMAIN", "")
 AWS_S3_USE_SSL = os.getenv("AWS_S3_USE_SSL", "True") == "True"
 AWS_S3_VERIFY = os.getenv("AWS_S3_VERIFY", "True") == "True"
 
-DEFAULT_FILE_STORAGE = "app.storages.PublicMediaStorage"
 STORAGES = {
     "default": {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"},
     "staticfiles": {"BACKEND": "app.storages.PublicS3Boto3Storage"},
@@ -119,6 +166,50 @@ AWS_S3_USE_SSL = False
 AWS_S3_VERIFY = False
 AWS_S3_URL_PROTOCOL = "http:"
 
+# Cliente de S3 compartido por todos los storages (app.s3)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", "5"))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", "30"))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "3"))
+
+# URLs firmadas (avatares): se cachean hasta SIGNED_URL_SAFETY_MARGIN segundos antes de caducar
+AWS_QUERYSTRING_EXPIRE = int(os.getenv("AWS_QUERYSTRING_EXPIRE", "3600"))
+SIGNED_URL_SAFETY_MARGIN = 300
+SIGNED_URL_CACHE_MAX_ENTRIES = 10000
+
+# Fichas de animales cacheadas por objeto (animals.cache) y tamaño máximo de ?ids=.
+# Las tareas (geocodificación, contadores de favoritos) invalidan fichas desde otro
+# proceso: sin Redis esa invalidación no llega a los workers web y solo la caducidad
+# acota cuánto tiempo sirven una ficha vieja.
+ANIMAL_CACHE_SECONDS = 300 if os.getenv("REDIS_URL") else 30
+ANIMALS_BATCH_MAX_IDS = 200
+
+# Autocompletado de usuarios (users.search): máximo de resultados y caché por consulta
+USER_AUTOCOMPLETE_LIMIT = 10
+USER_AUTOCOMPLETE_CACHE_SECONDS = 30
+
+# Documento de perfil cacheado por usuario (users.profile): menos que el margen de
+# las URLs firmadas, para no servir nunca un avatar con la firma caducada.
+PROFILE_CACHE_SECONDS = SIGNED_URL_SAFETY_MARGIN - 60
+
+DIRECT_UPLOAD_MAX_BYTES = int(os.getenv("DIRECT_UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+DIRECT_UPLOAD_EXPIRES = 600
+S3_STREAMING_UPLOADS = os.getenv("S3_STREAMING_UPLOADS", "True").lower() in ("1", "true", "yes")
+
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+IMAGE_PLACEHOLDER_SIZE = 16
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+# Tamaños que sirve /api/animals/images/: cada w/h pedido se redondea al siguiente.
+IMAGE_RESIZE_SIZES = (64, 128, 200, 320, 480, 640, 800, 1024, 1280, 1600, 2048)
+# Prefijos de las claves que redimensiona (el upload_to de Animal.image y, separados
+# por comas, los de las imágenes extra que estén en el bucket bajo otro prefijo).
+IMAGE_RESIZE_PREFIXES = tuple(
+    prefix for prefix in os.getenv("IMAGE_RESIZE_PREFIXES", "animal_images/").split(",") if prefix.strip()
+)
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "/tmp/adoptable-image-cache")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+IMAGE_CACHE_SCAN_SECONDS = 60
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
@@ -127,8 +218,68 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = read_secret("email_host_password")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Outbox de correo (outbox.mail): reintentos con espera exponencial
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+
+# Los mensajes de contacto más antiguos pasan a la tabla de archivo (tarea diaria)
+CONTACT_ARCHIVE_AFTER_DAYS = int(os.getenv("CONTACT_ARCHIVE_AFTER_DAYS", "180"))
+
+# Totales de donaciones (donacions.stats)
+DONATIONS_TOP_DONORS = 10
+DONATIONS_MONTHS = 12
+DONATIONS_TOTALS_CACHE_SECONDS = 300
+
+# Cola de tareas en segundo plano (taskqueue): la ejecuta `manage.py run_tasks`
+TASKS_BATCH_SIZE = int(os.getenv("TASKS_BATCH_SIZE", "10"))
+TASKS_POLL_INTERVAL = float(os.getenv("TASKS_POLL_INTERVAL", "1"))
+TASKS_LOCK_TIMEOUT = 600  # una tarea en ejecución más tiempo que esto se da por abandonada
+TASKS_RETRY_MAX_SECONDS = 3600
+TASKS_RETENTION_DAYS = 7
+
+# Límites de peticiones (app.ratelimit): "peticiones/periodo" con periodo s, m, h o d
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("1", "true", "yes")
+RATE_LIMIT_CACHE = "default"
+RATE_LIMITS = {
+    "login": "10/m",  # por IP
+    "login_username": "5/m",
+    "register": "5/h",  # por IP
+    "password_reset": "5/h",  # por IP
+    "password_reset_email": "3/h",
+    "contact": "3/d",  # por email
+    "contact_ip": "20/h",
+    "image_resize": "60/m",  # por IP, solo variantes que no están en caché
+}
+
+# Sesiones en dos niveles (users.sessions): LRU en memoria del proceso sobre la base de
+# datos. Los cambios se avisan al resto de procesos por SESSION_INVALIDATION_CACHE.
+SESSION_ENGINE = "users.sessions"
+SESSION_MEMORY_MAX_ENTRIES = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "10000"))
+# Segundos que una sesión se sirve de memoria sin releerla: cota de lo que tarda en
+# notarse un logout o bloqueo en otro proceso si se pierde su marca de invalidación.
+SESSION_MEMORY_TTL = int(os.getenv("SESSION_MEMORY_TTL", "30"))
+SESSION_INVALIDATION_CACHE = "default"
+
+# /csrf-token/ y /users/check_session/ sin pasar por DRF (app.middleware.FastPathMiddleware)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "True").lower() in ("1", "true", "yes")
+
+# Tokens firmados (users.tokens): el de acceso se verifica sin base de datos. Las
+# revocaciones (logout, bloqueo, borrado, pérdida de permisos) se guardan en la base
+# de datos; AUTH_TOKEN_CACHE solo recuerda cada comprobación AUTH_REVOCATION_CACHE_SECONDS,
+# así que una revocación tarda como mucho eso en llegar a un proceso con caché propia.
+ACCESS_TOKEN_SECONDS = int(os.getenv("ACCESS_TOKEN_SECONDS", "300"))
+REFRESH_TOKEN_SECONDS = int(os.getenv("REFRESH_TOKEN_SECONDS", str(7 * 24 * 3600)))
+AUTH_TOKEN_CACHE = "default"
+AUTH_REVOCATION_CACHE_SECONDS = int(os.getenv("AUTH_REVOCATION_CACHE_SECONDS", "60"))
+
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.SessionAuthentication"],
+    # La sesión va primero para que las peticiones sin credenciales sigan recibiendo 403.
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "users.tokens.SignedTokenAuthentication",
+    ],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
 }
 
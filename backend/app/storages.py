@@ -1,11 +1,234 @@
+import hashlib
+import logging
+import os
+import posixpath
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import cached_property, partial
+from urllib.parse import unquote, urlparse
+
 from django.conf import settings
+from django.core import signing
+from django.core.files.base import File
+from django.core.files.utils import validate_file_name
+from django.utils.encoding import filepath_to_uri
 
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from app.s3 import get_s3_resource
+
+logger = logging.getLogger(__name__)
+
+
+class SharedConnectionMixin:
+    """
+    Sustituye la conexión propia de cada storage por el resource del hilo,
+    que usa el cliente de S3 compartido por todo el proceso (ver app.s3).
+    """
+
+    @property
+    def connection(self):
+        return get_s3_resource()
+
+
+class SignedURLCache:
+    """
+    Caché LRU en memoria de URLs firmadas. Cada entrada caduca antes que su
+    firma (ver SIGNED_URL_SAFETY_MARGIN), así nunca se entrega una URL a punto de expirar.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_or_sign(self, key, ttl, sign):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        url = sign()
+        with self._lock:
+            self._entries[key] = (url, now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+signed_urls = SignedURLCache(settings.SIGNED_URL_CACHE_MAX_ENTRIES)
+
+
+class CachedURLMixin:
+    """
+    Resolución de URLs sin coste por fila al serializar: las URLs públicas se
+    componen con formato de cadenas y las firmadas se reutilizan desde signed_urls.
+    """
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if parameters or http_method:
+            return super().url(name, parameters, expire, http_method)
+        if not self.querystring_auth:
+            return self._public_url_prefix + filepath_to_uri(self._normalize_name(clean_name(name)))
+
+        expire = expire or self.querystring_expire
+        ttl = expire - settings.SIGNED_URL_SAFETY_MARGIN
+        if ttl <= 0:
+            return super().url(name, expire=expire)
+        sign = partial(super().url, name, expire=expire)
+        return signed_urls.get_or_sign((type(self).__name__, self.bucket_name, name, expire), ttl, sign)
+
+    @cached_property
+    def _public_url_prefix(self):
+        if self.custom_domain:
+            return f"{self.url_protocol}//{self.custom_domain}/"
+        # URL sin firmar de una clave ficticia: respeta el endpoint y el addressing style.
+        url = self.unsigned_connection.meta.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket_name, "Key": "__key__"}
+        )
+        return url.split("__key__")[0]
+
+
+def content_addressed_name(name, digest):
+    """`animal_images/perro.JPG` + sha256 -> `animal_images/<sha256>.jpg`."""
+    directory, filename = posixpath.split(name)
+    _, extension = os.path.splitext(filename)
+    return posixpath.join(directory, f"{digest}{extension.lower()[:10]}")
+
+
+def referenced_strings(value):
+    """Recorre un valor JSON (extra_images, *_variants...) y devuelve todas las cadenas que contiene."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from referenced_strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from referenced_strings(item)
+
+
+def candidate_keys(reference):
+    """Claves del bucket a las que puede apuntar una referencia (clave tal cual o URL completa)."""
+    reference = reference.strip()
+    if reference.startswith(("http://", "https://")):
+        path = unquote(urlparse(reference).path).lstrip("/")
+        yield path
+        # URL path-style: /<bucket>/<clave>
+        if "/" in path:
+            yield path.split("/", 1)[1]
+    elif reference:
+        yield reference.lstrip("/")
+
+
+class ContentAddressedMixin:
+    """
+    Guarda cada fichero bajo una clave derivada del sha256 de su contenido.
+    Si ya existe un objeto con esa clave (la misma foto subida por otra protectora,
+    o la misma derivada) no se vuelve a subir: se reutiliza el existente.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = content_addressed_name(name, digest.hexdigest())
+
+        if self.exists(name):
+            logger.info("Contenido duplicado, se reutiliza %s", name)
+            return name
+        return self._save(name, content)
+
+
+class DirectUploadMixin:
+    """
+    Permite que el navegador suba ficheros directamente al bucket mediante
+    un POST prefirmado, sin pasar el contenido por un worker de Django.
+    """
+
+    def presigned_post(self, name, max_size=None, expires=None):
+        """
+        Devuelve {"url": ..., "fields": {...}} para un POST multipart al bucket.
+        La política solo admite imágenes (Content-Type image/*) de hasta `max_size` bytes.
+        """
+        max_size = max_size or settings.DIRECT_UPLOAD_MAX_BYTES
+        expires = expires or settings.DIRECT_UPLOAD_EXPIRES
+        key = self._normalize_name(clean_name(name))
+
+        fields = {}
+        conditions = [["content-length-range", 1, max_size], ["starts-with", "$Content-Type", "image/"]]
+        if self.default_acl:
+            fields["acl"] = self.default_acl
+            conditions.append({"acl": self.default_acl})
+
+        return self.connection.meta.client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=expires,
+        )
+
+
+DIRECT_UPLOAD_SALT = "app.storages.direct-upload"
+
+
+def new_upload_key(upload_to, filename):
+    """Clave única para una subida directa, conservando la extensión original."""
+    _, extension = os.path.splitext(filename or "")
+    return f"{upload_to}uploads/{uuid.uuid4().hex}{extension.lower()[:10]}"
+
+
+def issue_direct_upload(storage, upload_to, filename, target):
+    """
+    Prepara una subida directa al bucket para `target` (p.ej. "animal:12").
+    Devuelve el POST prefirmado, la clave y un upload_token firmado que
+    liga esa clave al destino y que hay que presentar al confirmar.
+    """
+    key = new_upload_key(upload_to, filename)
+    post = storage.presigned_post(key)
+    token = signing.dumps({"key": key, "target": target}, salt=DIRECT_UPLOAD_SALT)
+    return {"url": post["url"], "fields": post["fields"], "key": key, "upload_token": token}
+
+
+def confirm_direct_upload(storage, token, target):
+    """
+    Valida el upload_token emitido por issue_direct_upload y comprueba que el
+    objeto ya está en el bucket. Devuelve la clave o lanza ValueError.
+    """
+    try:
+        payload = signing.loads(token or "", salt=DIRECT_UPLOAD_SALT, max_age=settings.DIRECT_UPLOAD_EXPIRES * 2)
+    except signing.BadSignature:
+        raise ValueError("Token de subida inválido o caducado.")
+    if payload.get("target") != target:
+        raise ValueError("Token de subida inválido o caducado.")
+    if not storage.exists(payload["key"]):
+        raise ValueError("El fichero todavía no se ha subido al almacenamiento.")
+    return payload["key"]
 
 
-class PublicMediaStorage(S3Boto3Storage):
+class PublicMediaStorage(
+    SharedConnectionMixin, CachedURLMixin, ContentAddressedMixin, DirectUploadMixin, S3Boto3Storage
+):
     location = ""
     default_acl = "public-read"
+    querystring_auth = False
     file_overwrite = False
 
     bucket_name = settings.AWS_STORAGE_BUCKET_NAME
@@ -17,7 +240,9 @@ class PublicMediaStorage(S3Boto3Storage):
         super().__init__(**kwargs)
 
 
-class PrivateMediaStorage(S3Boto3Storage):
+class PrivateMediaStorage(
+    SharedConnectionMixin, CachedURLMixin, ContentAddressedMixin, DirectUploadMixin, S3Boto3Storage
+):
     location = ""
     default_acl = "public-read"
     file_overwrite = False
@@ -30,9 +255,10 @@ class PrivateMediaStorage(S3Boto3Storage):
         super().__init__(**kwargs)
 
 
-class PublicStaticStorage(S3Boto3Storage):
+class PublicStaticStorage(SharedConnectionMixin, CachedURLMixin, S3Boto3Storage):
     bucket_acl = "download"
     default_acl = "download"
+    querystring_auth = False
     bucket_name = settings.AWS_STORAGE_BUCKET_NAME
     auto_create_bucket = True
 
@@ -0,0 +1,33 @@
+import runpy
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from app.caches import process_local_caches
+
+REDIS = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost:6379/0"}
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+GUNICORN_CONF = Path(settings.BASE_DIR) / "gunicorn.conf.py"
+
+
+class SharedCachesTest(SimpleTestCase):
+    def test_locmem_caches_are_reported(self):
+        self.assertEqual(process_local_caches(), ["default"])
+        with override_settings(CACHES={"default": REDIS, "tokens": LOCMEM}, AUTH_TOKEN_CACHE="tokens"):
+            self.assertEqual(process_local_caches(), ["tokens"])
+
+    def gunicorn_on_starting(self, workers):
+        with patch.dict("os.environ", {"WEB_CONCURRENCY": str(workers)}):
+            config = runpy.run_path(str(GUNICORN_CONF))
+        server = MagicMock()
+        config["on_starting"](server)
+        return server
+
+    def test_gunicorn_refuses_several_workers_with_local_caches(self):
+        with self.assertRaises(SystemExit):
+            self.gunicorn_on_starting(workers=3)
+        self.gunicorn_on_starting(workers=1)
+        with override_settings(CACHES={"default": REDIS}):
+            self.gunicorn_on_starting(workers=3)
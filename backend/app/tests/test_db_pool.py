@@ -0,0 +1,76 @@
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from app.db_pool.pool import ConnectionPool, PoolTimeout, get_pool, pool_metrics
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        options = {"min_size": 1, "max_size": 2, "timeout": 0.05, **kwargs}
+        return ConnectionPool(FakeConnection, lambda conn: conn.alive, lambda conn: not conn.closed, **options)
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool()
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot["connections_opened"], snapshot["checkouts"], snapshot["in_use"]), (1, 2, 1))
+
+    def test_exhaustion_waits_then_times_out(self):
+        pool = self.make_pool(timeout=1)
+        held = [pool.getconn(), pool.getconn()]
+        threading.Timer(0.05, pool.putconn, [held[0]]).start()
+        self.assertIs(pool.getconn(), held[0])
+
+        pool.timeout = 0.05
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot["waits"], snapshot["timeouts"], snapshot["peak_in_use"]), (2, 1, 2))
+        self.assertEqual((snapshot["size"], snapshot["in_use"]), (2, 2))
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.make_pool()
+        conn = pool.getconn()
+        conn.alive = False
+        pool.putconn(conn)
+        with patch("app.db_pool.pool.PING_AFTER", 0):
+            fresh = pool.getconn()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.snapshot()["failed_checks"], 1)
+
+        fresh.close()  # p. ej. el servidor cortó la conexión durante la petición
+        pool.putconn(fresh)
+        self.assertEqual(pool.snapshot()["size"], 0)
+
+    def test_idle_connections_above_min_size_are_closed(self):
+        pool = self.make_pool(max_idle=0)
+        conns = [pool.getconn(), pool.getconn()]
+        for conn in conns:
+            pool.putconn(conn)
+        self.assertIs(pool.getconn(), conns[1])  # la otra se cerró: solo se conservan MIN_SIZE
+        self.assertTrue(conns[0].closed)
+        self.assertEqual(pool.snapshot()["size"], 1)
+
+    def test_pool_is_replaced_when_parameters_change(self):
+        first = get_pool("test-pool", {"dbname": "a"}, self.make_pool)
+        self.assertIs(get_pool("test-pool", {"dbname": "a"}, self.make_pool), first)
+        idle = first.getconn()
+        first.putconn(idle)
+        second = get_pool("test-pool", {"dbname": "test_a"}, self.make_pool)
+        self.assertIsNot(second, first)
+        self.assertTrue(idle.closed)
+        self.assertIn("test-pool", pool_metrics())
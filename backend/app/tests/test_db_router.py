@@ -0,0 +1,84 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from animals.models import Animal
+from app.db_router import ReplicaRouter, health
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(APITransactionTestCase):
+    """
+    "replica" es un espejo de default en los tests (TEST MIRROR) pero con su propia
+    conexión, así que se ve qué consultas van a cada una. Transaccional para que la
+    réplica vea los datos creados por el test.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        health.clear()
+        self.protectora = User.objects.create_user(username="prot", password="pw")
+        self.adopter = User.objects.create_user(username="adopt", password="pw3")
+        self.animal = Animal.objects.create(name="Dog1", owner=self.protectora, city="")
+        self.client.force_login(self.adopter)
+
+    def get_list(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            resp = self.client.get(reverse("animal-list-create"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [q["sql"] for q in replica.captured_queries]
+
+    def test_reads_of_get_requests_go_to_the_replica(self):
+        self.assertTrue(any("animals_animal" in sql for sql in self.get_list()))
+
+    def test_own_write_pins_reads_to_the_primary(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            resp = self.client.post(reverse("favorites-sync"), {"add": [self.animal.pk]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(replica.captured_queries, [])
+        self.assertIn("primary_reads_until", resp.cookies)
+        self.assertEqual(self.get_list(), [])
+
+        self.client.cookies["primary_reads_until"] = str(int(time.time()) - 1)
+        self.assertNotEqual(self.get_list(), [])
+
+    @patch("app.db_router.measure_lag", return_value=30.0)
+    def test_lagging_replica_is_skipped(self, measure_lag):
+        self.assertEqual(self.get_list(), [])
+        self.assertEqual(self.get_list(), [])
+        measure_lag.assert_called_once_with("replica")  # se recuerda hasta REPLICA_LAG_CHECK_SECONDS
+
+    def test_use_primary_views_and_cache_fills_read_the_primary(self):
+        User.objects.filter(pk=self.adopter.pk).update(is_superuser=True)
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.client.get(reverse("task-metrics")).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(reverse("get_own_profile")).status_code, status.HTTP_200_OK)
+        self.assertFalse(any("taskqueue" in q["sql"] or "animals_animal" in q["sql"] for q in replica.captured_queries))
+
+    def test_db_metrics_view(self):
+        self.assertEqual(self.client.get(reverse("db-metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        User.objects.filter(pk=self.adopter.pk).update(is_superuser=True)
+        self.get_list()
+        resp = self.client.get(reverse("db-metrics"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["replica_lag"], {"replica": 0.0})
+
+    def test_router_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Animal), "default")
+        self.assertEqual(router.db_for_write(Animal), "default")
+        self.assertFalse(router.allow_migrate("replica", "animals"))
+        self.assertIsNone(router.allow_migrate("default", "animals"))
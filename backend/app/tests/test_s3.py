@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from app.s3 import get_s3_client, s3_metrics
+from app.storages import PrivateMediaStorage, PublicMediaStorage
+
+User = get_user_model()
+
+
+class SharedS3ClientTest(APITestCase):
+    def test_storages_share_one_client(self):
+        client = get_s3_client()
+        self.assertIs(PublicMediaStorage().connection.meta.client, client)
+        self.assertIs(PrivateMediaStorage().connection.meta.client, client)
+        self.assertEqual(client.meta.config.max_pool_connections, 50)
+
+    def test_calls_are_counted_per_operation(self):
+        client = get_s3_client()
+        s3_metrics.reset()
+        self.addCleanup(s3_metrics.reset)
+        responses = [
+            (MagicMock(status_code=200), {"ContentLength": 3}),
+            (MagicMock(status_code=404), {"Error": {"Code": "404"}}),
+        ]
+        with patch.object(client._endpoint, "make_request", side_effect=responses):
+            client.head_object(Bucket="media", Key="a.jpg")
+            with self.assertRaises(client.exceptions.ClientError):
+                client.head_object(Bucket="media", Key="b.jpg")
+
+        stats = s3_metrics.snapshot()["HeadObject"]
+        self.assertEqual((stats["calls"], stats["errors"]), (2, 1))
+
+        url = reverse("s3-metrics")
+        User.objects.create_user(username="plain", password="pw")
+        self.client.login(username="plain", password="pw")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        User.objects.create_superuser(username="root", password="pw")
+        self.client.login(username="root", password="pw")
+        self.assertEqual(self.client.get(url).data["HeadObject"]["calls"], 2)
@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from app.storages import PrivateMediaStorage, PublicMediaStorage, signed_urls
+
+
+class MediaURLTest(SimpleTestCase):
+    def setUp(self):
+        signed_urls.clear()
+        self.addCleanup(signed_urls.clear)
+
+    def test_public_urls_are_formatted_without_signing(self):
+        with patch.object(S3Boto3Storage, "url") as signed:
+            storage = PublicMediaStorage(custom_domain="cdn.example.org")
+            self.assertEqual(
+                storage.url("animal_images/mi perro.jpg"), "http://cdn.example.org/animal_images/mi%20perro.jpg"
+            )
+
+            storage = PublicMediaStorage(custom_domain="", bucket_name="media")
+            url = storage.url("animal_images/dog.jpg")
+        self.assertTrue(url.endswith("/animal_images/dog.jpg"))
+        self.assertIn("media", url)
+        self.assertNotIn("?", url)
+        signed.assert_not_called()
+
+    def test_signed_urls_are_reused_until_close_to_expiry(self):
+        storage = PrivateMediaStorage(custom_domain="")
+        with (
+            patch.object(S3Boto3Storage, "url", side_effect=lambda name, **kw: f"https://s3/{name}?sig") as signed,
+            patch("app.storages.time.monotonic", return_value=1000.0) as now,
+        ):
+            self.assertEqual(storage.url("profile_images/a.jpg"), "https://s3/profile_images/a.jpg?sig")
+            storage.url("profile_images/a.jpg")
+            self.assertEqual(signed.call_count, 1)
+
+            # A menos de SIGNED_URL_SAFETY_MARGIN de caducar la firma se vuelve a firmar.
+            now.return_value = 1000.0 + storage.querystring_expire - 299
+            storage.url("profile_images/a.jpg")
+            self.assertEqual(signed.call_count, 2)
+
+            storage.url("profile_images/a.jpg", expire=60)
+            storage.url("profile_images/a.jpg", expire=60)
+            self.assertEqual(signed.call_count, 4)
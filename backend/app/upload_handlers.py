@@ -0,0 +1,231 @@
+import hashlib
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from storages.utils import clean_name
+
+from app.storages import content_addressed_name, new_upload_key
+
+logger = logging.getLogger(__name__)
+
+# Firmas de los formatos de imagen aceptados (cabecera del fichero).
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a")
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "El fichero es demasiado grande."
+    default_code = "upload_too_large"
+
+
+def looks_like_image(head):
+    return head.startswith(IMAGE_SIGNATURES) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
+
+class S3StreamedFile(UploadedFile):
+    """
+    Fichero que S3MultipartUploadHandler ya ha guardado en el bucket.
+    No tiene contenido local: `key` es su nombre en el storage y basta
+    con asignarlo al campo del modelo. Si el contenido no era una imagen,
+    la subida se aborta y `key` es None.
+    """
+
+    def __init__(self, key, name, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.key = key
+
+
+class S3MultipartUploadHandler(FileUploadHandler):
+    """
+    Reenvía los trozos del cuerpo multipart a S3 a medida que llegan, sin
+    bufferizar el fichero completo en memoria ni en un temporal, y calcula su
+    sha256 por el camino para guardarlo bajo una clave por contenido
+    (ver ContentAddressedMixin). Si esa clave ya existe no se sube nada más.
+
+    S3 exige partes de al menos 5 MB (salvo la última), así que se acumula hasta
+    ese tamaño. Un fichero que cabe en una parte (la mayoría de fotos) se sube con
+    un único PUT, o con ninguno si ya existía; uno mayor va a un multipart upload
+    bajo una clave temporal que al final se copia a la definitiva o se descarta.
+    Solo gestiona los campos indicados; el resto sigue por los handlers por defecto.
+    """
+
+    part_size = 5 * 1024 * 1024
+
+    def __init__(self, request, storage, upload_to, field_names):
+        super().__init__(request)
+        self.storage = storage
+        self.upload_to = upload_to
+        self.field_names = set(field_names)
+        self.active = False
+        self.upload_id = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.active = field_name in self.field_names
+        if not self.active:
+            return
+
+        self.client = self.storage.connection.meta.client
+        self.params = self.storage._get_write_parameters(file_name)
+        if content_type:
+            self.params["ContentType"] = content_type
+        self.rejected = False
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.size = 0
+        self.digest = hashlib.sha256()
+        raise StopFutureHandlers()
+
+    def _upload_part(self):
+        if self.upload_id is None:
+            self.temp_key = self.storage._normalize_name(clean_name(new_upload_key(self.upload_to, self.file_name)))
+            response = self.client.create_multipart_upload(
+                Bucket=self.storage.bucket_name, Key=self.temp_key, **self.params
+            )
+            self.upload_id = response["UploadId"]
+
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.storage.bucket_name,
+            Key=self.temp_key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.buffer.clear()
+
+    def _abort(self):
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.storage.bucket_name, Key=self.temp_key, UploadId=self.upload_id
+            )
+        except Exception:
+            logger.exception("No se pudo abortar el multipart upload %s", self.temp_key)
+        self.upload_id = None
+
+    def _reject(self):
+        self.rejected = True
+        self.buffer.clear()
+        if self.upload_id is not None:
+            self._abort()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.rejected:
+            # Subida rechazada: se descarta el resto del fichero.
+            return None
+
+        if start == 0 and not looks_like_image(raw_data[:12]):
+            self._reject()
+            return None
+
+        self.size += len(raw_data)
+        if self.size > settings.DIRECT_UPLOAD_MAX_BYTES:
+            self._reject()
+            # Django deja de leer el cuerpo y el fichero no llega a request.FILES:
+            # la marca en la petición es lo único que ve la vista (pop_streamed_files).
+            if self.request is not None:
+                self.request.oversized_upload = self.field_name
+            raise StopUpload(connection_reset=True)
+
+        self.digest.update(raw_data)
+        self.buffer.extend(raw_data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return None
+
+    def _finish_multipart(self, key):
+        if self.buffer:
+            self._upload_part()
+        bucket = self.storage.bucket_name
+        self.client.complete_multipart_upload(
+            Bucket=bucket, Key=self.temp_key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+        self.upload_id = None
+        acl = {"ACL": self.params["ACL"]} if "ACL" in self.params else {}
+        self.client.copy_object(Bucket=bucket, Key=key, CopySource={"Bucket": bucket, "Key": self.temp_key}, **acl)
+        self.client.delete_object(Bucket=bucket, Key=self.temp_key)
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        if self.rejected:
+            return S3StreamedFile(None, self.file_name, self.content_type, 0)
+
+        key = self.storage._normalize_name(
+            clean_name(content_addressed_name(f"{self.upload_to}{self.file_name}", self.digest.hexdigest()))
+        )
+        if self.storage.exists(key):
+            logger.info("Contenido duplicado, se reutiliza %s", key)
+            if self.upload_id is not None:
+                self._abort()
+        elif self.upload_id is None:
+            self.client.put_object(Bucket=self.storage.bucket_name, Key=key, Body=bytes(self.buffer), **self.params)
+        else:
+            self._finish_multipart(key)
+        self.buffer.clear()
+
+        return S3StreamedFile(key, self.file_name, self.content_type, self.size, self.charset, self.content_type_extra)
+
+    def upload_interrupted(self):
+        if self.active and self.upload_id is not None:
+            self._abort()
+
+
+def install_s3_upload_handler(request, storage, upload_to, field_names):
+    """
+    Antepone S3MultipartUploadHandler a los handlers de la petición (Django, no DRF).
+    Debe llamarse antes de que nada lea request.POST/FILES, incluida la comprobación CSRF.
+    """
+    if settings.S3_STREAMING_UPLOADS:
+        request.upload_handlers.insert(0, S3MultipartUploadHandler(request, storage, upload_to, field_names))
+
+
+def stream_uploads_to_s3(storage, upload_to, field_names):
+    """
+    Decorador para vistas de función: debe ir por fuera de @api_view,
+    para que el handler quede instalado antes de que DRF autentique y parsee.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            install_s3_upload_handler(request, storage, upload_to, field_names)
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def pop_streamed_files(request, data):
+    """
+    Separa de `data` (request.data) los ficheros ya subidos por el handler.
+    Devuelve (data sin esos campos, {campo: clave en el storage}).
+    Lanza UploadTooLarge (413) si la subida se cortó por tamaño y ValidationError
+    si alguno de ellos no era una imagen, para que la vista no guarde nada sin el fichero.
+    """
+    oversized = getattr(request, "oversized_upload", None)
+    if oversized:
+        limit = settings.DIRECT_UPLOAD_MAX_BYTES // (1024 * 1024)
+        raise UploadTooLarge({oversized: [f"La imagen supera el máximo de {limit} MB."]})
+    streamed = {name: value.key for name, value in data.items() if isinstance(value, S3StreamedFile)}
+    if not streamed:
+        return data, {}
+    rejected = [name for name, key in streamed.items() if key is None]
+    if rejected:
+        raise ValidationError({name: ["Sube una imagen válida (JPEG, PNG, GIF o WebP)."] for name in rejected})
+    data = data.copy()
+    for name in streamed:
+        data.pop(name)
+    return data, streamed
@@ -16,13 +16,14 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.http import JsonResponse
-from django.middleware.csrf import get_token
 from django.urls import include, path
 
+from app.middleware import csrf_token_response
+from app.views import db_metrics_view, s3_metrics_view, session_metrics_view, task_metrics_view
+
 
 def csrf_token_view(request):
-    return JsonResponse({"csrfToken": get_token(request)})
+    return csrf_token_response(request)
 
 
 urlpatterns = [
@@ -32,4 +33,8 @@ urlpatterns = [
     path("api/", include("donacions.urls")),
     path("csrf-token/", csrf_token_view, name="csrf-token"),
     path("api/", include("contact.urls")),
+    path("api/metrics/s3/", s3_metrics_view, name="s3-metrics"),
+    path("api/metrics/tasks/", task_metrics_view, name="task-metrics"),
+    path("api/metrics/sessions/", session_metrics_view, name="session-metrics"),
+    path("api/metrics/db/", db_metrics_view, name="db-metrics"),
 ]
@@ -0,0 +1,58 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from app.db_pool.pool import pool_metrics
+from app.db_router import health as replica_health
+from app.db_router import use_primary
+from app.s3 import s3_metrics
+from taskqueue.queue import queue_metrics
+from users.sessions import memory as session_memory
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def s3_metrics_view(request):
+    """
+    Llamadas, errores y latencia por operación de S3 en este proceso (solo superusuarios).
+    """
+    if not request.user.is_superuser:
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(s3_metrics.snapshot())
+
+
+@use_primary
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def task_metrics_view(request):
+    """
+    Estado de la cola de tareas: tareas por estado, vencidas, lag y desglose por tarea (solo superusuarios).
+    Se lee del primario: la tabla de tareas cambia sin parar y la réplica iría por detrás.
+    """
+    if not request.user.is_superuser:
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(queue_metrics())
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def session_metrics_view(request):
+    """
+    Aciertos, fallos, descartes y tamaño de la caché de sesiones en memoria de este proceso (solo superusuarios).
+    """
+    if not request.user.is_superuser:
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+    return Response(session_memory.snapshot())
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def db_metrics_view(request):
+    """
+    Pools de conexiones de este proceso (tamaño, en uso, esperas, agotamientos) y
+    retraso medido de las réplicas (solo superusuarios).
+    """
+    if not request.user.is_superuser:
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+    return Response({"pools": pool_metrics(), "replica_lag": replica_health.snapshot()})
@@ -0,0 +1,30 @@
+"""
+Benchmarks del backend. Cada módulo se ejecuta desde backend/ con
+`python -m benchmarks.<nombre> --help`.
+"""
+
+import os
+import time
+
+
+def setup_django(settings_module="app.settings"):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+def human_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
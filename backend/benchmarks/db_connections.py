@@ -0,0 +1,125 @@
+"""
+Coste de abrir conexiones a PostgreSQL con carga concurrente: varios hilos simulan
+peticiones (cerrar conexiones viejas, una consulta, cerrar al terminar, como hace
+Django con request_started/request_finished) con tres configuraciones de DATABASES:
+
+    nuevas        CONN_MAX_AGE=0: una conexión nueva por petición (lo de antes)
+    persistentes  CONN_MAX_AGE=60 + CONN_HEALTH_CHECKS: una conexión por hilo
+    pool          ENGINE app.db_pool: conexiones compartidas entre hilos
+
+    python -m benchmarks.db_connections --threads 16 --requests 200
+    python -m benchmarks.db_connections --threads 32 --pool-size 8   # pool agotado: esperas
+
+Usa la base de datos de `default` de los settings y solo ejecuta la consulta de
+--query (por defecto SELECT 1), así que no modifica nada.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks import setup_django
+
+MODES = ("nuevas", "persistentes", "pool")
+
+
+def settings_for(mode, base, pool_size):
+    settings_dict = {**base, "POOL": {**base.get("POOL", {}), "MAX_SIZE": pool_size, "MIN_SIZE": 0}}
+    if mode == "pool":
+        return {**settings_dict, "ENGINE": "app.db_pool", "CONN_MAX_AGE": 0}
+    settings_dict["ENGINE"] = "django.db.backends.postgresql"
+    if mode == "persistentes":
+        return {**settings_dict, "CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True}
+    return {**settings_dict, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}
+
+
+def run(mode, base, args):
+    from django.db.backends.signals import connection_created
+    from django.db.utils import ConnectionHandler
+
+    from app.db_pool.pool import pool_metrics
+
+    alias = f"benchmark-{mode}"
+    handler = ConnectionHandler({alias: settings_for(mode, base, args.pool_size)})
+    opened = []
+    latencies = []
+    lock = threading.Lock()
+
+    def count(sender, connection, **kwargs):
+        if connection.alias == alias:
+            opened.append(1)
+
+    def worker():
+        own = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            connection = handler[alias]
+            connection.close_if_unusable_or_obsolete()  # request_started
+            with connection.cursor() as cursor:
+                cursor.execute(args.query)
+                cursor.fetchall()
+            connection.close_if_unusable_or_obsolete()  # request_finished
+            own.append(time.perf_counter() - start)
+        handler[alias].close()
+        with lock:
+            latencies.extend(own)
+
+    connection_created.connect(count, weak=False)
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        connection_created.disconnect(count)
+
+    latencies.sort()
+    result = {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "opened": len(opened),
+        "waits": "-",
+    }
+    if mode == "pool":
+        snapshot = pool_metrics()[alias]
+        result.update(opened=snapshot["connections_opened"], waits=snapshot["waits"])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16, help="Peticiones simultáneas")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por hilo")
+    parser.add_argument("--pool-size", type=int, default=10, help="MAX_SIZE del pool")
+    parser.add_argument("--query", default="SELECT 1")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--settings", default="app.settings")
+    args = parser.parse_args(argv)
+
+    setup_django(args.settings)
+    from django.db import connections
+
+    base = connections["default"].settings_dict
+    print(f"{args.threads} hilos x {args.requests} peticiones, pool de {args.pool_size}\n")
+    print(f"{'modo':>13} {'req/s':>9} {'p50':>9} {'p95':>9} {'conexiones':>11} {'esperas':>8}")
+    results = {}
+    for mode in args.modes:
+        r = results[mode] = run(mode, base, args)
+        print(
+            f"{mode:>13} {r['rps']:>9.0f} {r['p50_ms']:>7.3f}ms {r['p95_ms']:>7.3f}ms {r['opened']:>11} {r['waits']:>8}"
+        )
+    if "nuevas" in results:
+        for mode in ("persistentes", "pool"):
+            if mode in results:
+                saved = results["nuevas"]["p50_ms"] - results[mode]["p50_ms"]
+                print(f"\n{mode}: {saved:.3f}ms menos de p50 por petición que abriendo una conexión cada vez", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Mide cuántos bytes ahorran las derivadas de imagen frente a los originales.
+
+    python -m benchmarks.image_derivatives fotos/ otra_foto.jpg
+
+Para cada anchura y formato muestra el total de bytes y el ahorro respecto
+a servir siempre el original, además del tiempo de generación.
+"""
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.images import render_derivatives
+from benchmarks import Timer, human_bytes
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tiff"}
+
+
+def collect_samples(paths):
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        elif path.is_file():
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Imágenes o directorios de muestra")
+    parser.add_argument("--widths", default="320,640,1280", help="Anchuras separadas por comas")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    widths = tuple(int(w) for w in args.widths.split(","))
+    samples = list(collect_samples(args.paths))
+    if not samples:
+        parser.error("No se han encontrado imágenes de muestra.")
+
+    originals = [path.read_bytes() for path in samples]
+    original_total = sum(len(data) for data in originals)
+
+    with Timer() as timer, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(render_derivatives, originals, [widths] * len(originals)))
+
+    # Las derivadas se agrupan por la anchura solicitada más cercana por arriba,
+    # ya que las imágenes pequeñas nunca se amplían.
+    totals = defaultdict(int)
+    for rendered in results:
+        for requested in widths:
+            width = max(w for w in rendered if w <= requested)
+            for fmt, payload in rendered[width].items():
+                totals[(requested, fmt)] += len(payload)
+
+    print(f"Muestras: {len(samples)}  originales: {human_bytes(original_total)}")
+    print(f"Generación: {timer.elapsed:.2f}s ({len(samples) / timer.elapsed:.1f} imágenes/s)\n")
+    print(f"{'anchura':>8} {'formato':>8} {'total':>12} {'ahorro':>12} {'%':>7}")
+    for (width, fmt), size in sorted(totals.items()):
+        saved = original_total - size
+        print(
+            f"{width:>8} {fmt:>8} {human_bytes(size):>12} {human_bytes(saved):>12} {100 * saved / original_total:>6.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Prueba de carga HTTP: N clientes concurrentes (hilos con conexión keep-alive)
+recorren las rutas de --path durante --duration segundos. Da peticiones por segundo,
+latencias p50/p95/p99 y códigos de respuesta.
+
+Contra un servidor ya levantado:
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --concurrency 64
+
+O arrancándolo aquí mismo (desde backend/), para comparar el perfil de producción
+(gunicorn con gunicorn.conf.py) con runserver; al terminar se le manda SIGTERM y
+se mide cuánto tarda en pararse de forma ordenada:
+
+    python -m benchmarks.loadtest --serve gunicorn
+    python -m benchmarks.loadtest --serve runserver --settings mi_proyecto.settings_sqlite
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_PATHS = ["/csrf-token/", "/users/check_session/"]
+
+
+def client(host, port, paths, deadline, results):
+    latencies, statuses = [], Counter()
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            statuses[response.status] += 1
+        except (OSError, http.client.HTTPException) as e:
+            statuses[type(e).__name__] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    results.append((latencies, statuses))
+
+
+def load(url, paths, concurrency, duration):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + duration
+    results = []
+    threads = [
+        threading.Thread(target=client, args=(parts.hostname, parts.port or 80, paths, deadline, results))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for own, _ in results for latency in own)
+    statuses = sum((statuses for _, statuses in results), Counter())
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        "statuses": dict(statuses),
+    }
+
+
+def wait_for_port(host, port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"El servidor terminó al arrancar (código {process.returncode}).")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"El servidor no escucha en {host}:{port} tras {timeout}s.")
+
+
+def start_server(kind, bind, settings_module):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    if kind == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "--bind", bind]
+    else:
+        command = [sys.executable, "manage.py", "runserver", "--noreload", bind]
+    # Los logs van a un fichero: runserver escribe una línea por petición y llenaría un pipe.
+    log = tempfile.TemporaryFile()
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log), log
+
+
+def stop_server(process, timeout):
+    """SIGTERM y espera: devuelve (segundos hasta salir, código de salida)."""
+    start = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    try:
+        code = process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        code = process.wait()
+    return time.perf_counter() - start, code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", dest="paths", help=f"Ruta a pedir (por defecto {DEFAULT_PATHS})")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clientes simultáneos")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos de carga")
+    parser.add_argument("--warmup", type=float, default=1, help="Segundos de carga previa que no se cuentan")
+    parser.add_argument("--serve", choices=("gunicorn", "runserver"), help="Arrancar el servidor en --url")
+    parser.add_argument("--settings", default="app.settings", help="DJANGO_SETTINGS_MODULE del servidor (--serve)")
+    args = parser.parse_args(argv)
+    paths = args.paths or DEFAULT_PATHS
+
+    process = None
+    if args.serve:
+        parts = urlsplit(args.url)
+        started = time.perf_counter()
+        process, log = start_server(args.serve, f"{parts.hostname}:{parts.port or 80}", args.settings)
+        wait_for_port(parts.hostname, parts.port or 80, process, timeout=60)
+        print(f"{args.serve} listo en {time.perf_counter() - started:.2f}s")
+
+    try:
+        if args.warmup:
+            load(args.url, paths, args.concurrency, args.warmup)
+        r = load(args.url, paths, args.concurrency, args.duration)
+    finally:
+        if process is not None:
+            stopped, code = stop_server(process, timeout=60)
+            log.seek(0)
+            server_log = log.read().decode(errors="replace")
+
+    print(f"{args.concurrency} clientes durante {args.duration:.0f}s contra {args.url} {paths}\n")
+    print(f"{'peticiones':>12} {r['requests']:>10}")
+    print(f"{'req/s':>12} {r['rps']:>10.0f}")
+    for name in ("p50_ms", "p95_ms", "p99_ms"):
+        if r[name] is not None:
+            print(f"{name[:3]:>12} {r[name]:>8.2f}ms")
+    print(f"{'respuestas':>12} {r['statuses']}")
+    if process is not None:
+        print(f"{'parada':>12} {stopped:>8.2f}s (código {code})")
+        if code not in (0, -signal.SIGTERM):
+            print(server_log[-2000:], file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compara el coste de resolver URLs de media con y sin la capa de caché de app.storages.
+
+    python -m benchmarks.media_urls --rows 1000 --repeat 5
+
+Simula serializar `rows` animales (imagen pública) y `rows` avatares (URL firmada)
+varias veces seguidas, como harían sucesivas peticiones al listado.
+La firma es local (no hay llamadas de red), así que basta con credenciales ficticias.
+Se ignora AWS_S3_CUSTOM_DOMAIN para medir las URLs que construye (y firma) boto3.
+"""
+
+import argparse
+import os
+
+from benchmarks import Timer, setup_django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="Número de serializaciones del listado")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_KEY", "benchmark")
+    setup_django()
+
+    from storages.backends.s3boto3 import S3Boto3Storage
+
+    from app.storages import PrivateMediaStorage, PublicMediaStorage, signed_urls
+
+    cases = [
+        ("imagen pública", PublicMediaStorage(custom_domain=""), "animal_images/dog_{}.jpg"),
+        ("avatar firmado", PrivateMediaStorage(custom_domain=""), "profile_images/user_{}.jpg"),
+    ]
+
+    print(f"{args.rows} filas x {args.repeat} peticiones\n")
+    print(f"{'caso':>16} {'sin caché':>12} {'con caché':>12} {'mejora':>8}")
+    for label, storage, pattern in cases:
+        names = [pattern.format(i) for i in range(args.rows)]
+        signed_urls.clear()
+
+        with Timer() as uncached:
+            for _ in range(args.repeat):
+                for name in names:
+                    S3Boto3Storage.url(storage, name)
+        with Timer() as cached:
+            for _ in range(args.repeat):
+                for name in names:
+                    storage.url(name)
+
+        print(
+            f"{label:>16} {uncached.elapsed * 1000:>10.1f}ms {cached.elapsed * 1000:>10.1f}ms"
+            f" {uncached.elapsed / cached.elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
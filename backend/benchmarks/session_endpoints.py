@@ -0,0 +1,83 @@
+"""
+Latencia y peticiones por segundo de /users/check_session/ y /csrf-token/ con y
+sin app.middleware.FastPathMiddleware, en proceso (Client de Django, sin red).
+
+    python -m benchmarks.session_endpoints --requests 2000
+    python -m benchmarks.session_endpoints --settings mi_proyecto.settings_sqlite
+
+Crea una base de datos de pruebas (como `manage.py test`) con un usuario, así que
+con PostgreSQL el usuario de la base de datos necesita permiso para crearla.
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def measure(client, url, requests, **headers):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(url, **headers)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "rps": requests / sum(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por caso")
+    parser.add_argument("--settings", default="app.settings")
+    args = parser.parse_args(argv)
+
+    setup_django(args.settings)
+    logging.getLogger("django.request").setLevel(logging.ERROR)  # sin un aviso por cada 401
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = get_user_model().objects.create_user("benchmark", password="benchmark")
+
+        from users.tokens import issue_tokens
+
+        bearer = {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user)['access']}"}
+        cases = [
+            ("check_session anónimo", "/users/check_session/", False, {}),
+            ("check_session sesión", "/users/check_session/", True, {}),
+            ("check_session token", "/users/check_session/", False, bearer),
+            ("csrf-token", "/csrf-token/", False, {}),
+        ]
+
+        print(f"{args.requests} peticiones por caso\n")
+        print(f"{'caso':>22} {'':>9} {'req/s':>9} {'media':>9} {'p95':>9}")
+        for label, url, logged_in, headers in cases:
+            results = {}
+            for mode, enabled in (("completo", False), ("rápido", True)):
+                with override_settings(FAST_PATH_ENABLED=enabled):
+                    client = Client()
+                    if logged_in:
+                        client.force_login(user)
+                    client.get(url, **headers)  # calentamiento: carga los middlewares
+                    results[mode] = measure(client, url, args.requests, **headers)
+                r = results[mode]
+                print(f"{label:>22} {mode:>9} {r['rps']:>9.0f} {r['mean_ms']:>7.3f}ms {r['p95_ms']:>7.3f}ms")
+            print(f"{'':>22} {'mejora':>9} {results['rápido']['rps'] / results['completo']['rps']:>8.1f}x\n")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
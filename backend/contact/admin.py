@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ContactMessage
+from .models import ArchivedContactMessage, ContactMessage
 
 
 @admin.register(ContactMessage)
@@ -8,3 +8,10 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ("name", "email", "created_at")
     search_fields = ("name", "email", "message")
     ordering = ("-created_at",)
+
+
+@admin.register(ArchivedContactMessage)
+class ArchivedContactMessageAdmin(admin.ModelAdmin):
+    list_display = ("name", "email", "created_at", "archived_at")
+    search_fields = ("name", "email", "message")
+    ordering = ("-created_at",)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedContactMessage, ContactMessage
+
+
+def archive_old_messages(days=None, batch_size=1000):
+    """
+    Mueve a ArchivedContactMessage los mensajes con más de `days` días
+    (CONTACT_ARCHIVE_AFTER_DAYS por defecto), por lotes y cada lote en su
+    transacción, para no bloquear la bandeja mientras dura. Devuelve cuántos ha movido.
+    """
+    cutoff = timezone.now() - timedelta(days=days or settings.CONTACT_ARCHIVE_AFTER_DAYS)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                ContactMessage.objects.select_for_update(skip_locked=True)
+                .filter(created_at__lt=cutoff)
+                .order_by("created_at", "id")[:batch_size]
+            )
+            if not batch:
+                return moved
+            ArchivedContactMessage.objects.bulk_create(
+                [
+                    ArchivedContactMessage(
+                        id=msg.id, name=msg.name, email=msg.email, message=msg.message, created_at=msg.created_at
+                    )
+                    for msg in batch
+                ],
+                ignore_conflicts=True,
+            )
+            ContactMessage.objects.filter(pk__in=[msg.pk for msg in batch]).delete()
+        moved += len(batch)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from contact.archive import archive_old_messages
+
+
+class Command(BaseCommand):
+    help = "Mueve los mensajes de contacto antiguos a la tabla de archivo para que la bandeja siga siendo pequeña."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Antigüedad mínima (CONTACT_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        moved = archive_old_messages(options["days"], options["batch_size"])
+        self.stdout.write(f"Mensajes archivados: {moved}")
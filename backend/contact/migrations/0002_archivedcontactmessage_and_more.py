@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contact", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedContactMessage",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=255)),
+                ("email", models.EmailField(max_length=254)),
+                ("message", models.TextField()),
+                ("created_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="contactmessage",
+            index=models.Index(fields=["-created_at", "-id"], name="contact_inbox_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contactmessage",
+            index=models.Index(fields=["email", "created_at"], name="contact_email_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="archivedcontactmessage",
+            index=models.Index(fields=["email", "created_at"], name="contact_archive_email_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:04
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Índices solo para PostgreSQL (búsqueda de texto completo e índice parcial);
+# en otros motores la bandeja usa la búsqueda de respaldo y no se crean.
+
+SEARCH_INDEX = GinIndex(SearchVector("name", "message", config="spanish"), name="contact_search_idx")
+
+INACTIVE_EMAIL_INDEX = "auth_user_inactive_email_idx"
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.add_index(apps.get_model("contact", "ContactMessage"), SEARCH_INDEX)
+    # Anti-join de remitentes bloqueados: solo se indexan los usuarios inactivos.
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INACTIVE_EMAIL_INDEX} ON auth_user (email) WHERE NOT is_active"
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.remove_index(apps.get_model("contact", "ContactMessage"), SEARCH_INDEX)
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INACTIVE_EMAIL_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contact", "0002_archivedcontactmessage_and_more"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [migrations.RunPython(create_indexes, drop_indexes)]
@@ -7,5 +7,32 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Bandeja de moderación: paginación por cursor sobre (created_at, id).
+            models.Index(fields=["-created_at", "-id"], name="contact_inbox_idx"),
+            models.Index(fields=["email", "created_at"], name="contact_email_created_idx"),
+        ]
+
     def __str__(self):
         return f"Mensaje de {self.name} ({self.email})"
+
+
+class ArchivedContactMessage(models.Model):
+    """
+    Mensajes de contacto antiguos, fuera de la tabla que consulta la bandeja.
+    Conservan el id original. Los mueve `archive_contact_messages`.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    email = models.EmailField()
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["email", "created_at"], name="contact_archive_email_idx")]
+
+    def __str__(self):
+        return f"Mensaje archivado de {self.name} ({self.email})"
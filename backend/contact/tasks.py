@@ -0,0 +1,10 @@
+from datetime import timedelta
+
+from taskqueue.queue import periodic_task
+
+from .archive import archive_old_messages
+
+
+@periodic_task(every=timedelta(days=1), max_attempts=1)
+def archive_contact_messages():
+    archive_old_messages()
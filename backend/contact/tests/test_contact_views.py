@@ -1,14 +1,23 @@
+import io
 import logging
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.core.mail import EmailMessage
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from contact.models import ContactMessage
+from app.ratelimit import hit
+from contact.models import ArchivedContactMessage, ContactMessage
+from outbox.mail import send_pending
+from outbox.models import OutboxEmail
 
 User = get_user_model()
 
@@ -16,6 +25,7 @@ User = get_user_model()
 class ContactViewTest(APITestCase):
     def setUp(self):
         logging.getLogger("contact.views").setLevel(logging.CRITICAL)
+        cache.clear()
 
         self.url = reverse("contact")
 
@@ -30,15 +40,14 @@ class ContactViewTest(APITestCase):
         self.assertEqual(resp.data.get("error"), "Faltan campos requeridos.")
         self.assertEqual(ContactMessage.objects.count(), 0)
 
-    def test_success_creates_record_and_sends_email(self):
-        """POST válido → 200 + registro en BD + EmailMessage.send llamado"""
+    def test_success_creates_record_and_queues_email(self):
+        """POST válido → 200 + registro en BD + correo en la outbox (no se envía en la petición)"""
         data = {
             "name": "Juan Pérez",
             "email": "juan@example.com",
             "message": "¡Hola, esto es un test!",
         }
-        with patch.object(EmailMessage, "send", return_value=1) as mock_send:
-            resp = self.client.post(self.url, data, format="json")
+        resp = self.client.post(self.url, data, format="json")
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(resp.data.get("message"), "Mensaje enviado correctamente.")
@@ -47,7 +56,12 @@ class ContactViewTest(APITestCase):
         self.assertEqual(cm.name, data["name"])
         self.assertEqual(cm.email, data["email"])
         self.assertEqual(cm.message, data["message"])
-        mock_send.assert_called_once()
+        self.assertEqual(len(mail.outbox), 0)
+
+        send_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].reply_to, [data["email"]])
+        self.assertIn(data["message"], mail.outbox[0].body)
 
     def test_database_error_returns_500(self):
         """Si falla al guardar en BD → 500 + mensaje de error"""
@@ -58,13 +72,114 @@ class ContactViewTest(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertEqual(resp.data.get("error"), "Error al guardar el mensaje.")
         self.assertEqual(ContactMessage.objects.count(), 0)
+        self.assertEqual(OutboxEmail.objects.count(), 0)
 
     def test_email_send_error_returns_success(self):
-        """Si falla al enviar email → 200 + mensaje de éxito y registro en BD"""
+        """Si falla el SMTP → 200 + mensaje de éxito y registro en BD; el correo queda para reintentar"""
         data = {"name": "Y", "email": "y@y.com", "message": "M2"}
-        with patch.object(EmailMessage, "send", side_effect=Exception("SMTP")):
-            resp = self.client.post(self.url, data, format="json")
+        resp = self.client.post(self.url, data, format="json")
+        with patch("outbox.mail.get_connection", side_effect=Exception("SMTP")):
+            self.assertEqual(send_pending(), {"sent": 0, "failed": 1})
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(resp.data.get("message"), "Mensaje enviado correctamente.")
         self.assertEqual(ContactMessage.objects.count(), 1)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), (OutboxEmail.PENDING, 1, "SMTP"))
+
+    def test_daily_limit_per_email_without_counting_rows(self):
+        """4º mensaje del mismo email en 24 h → 429 + Retry-After; el límite no consulta la BD"""
+        data = {"name": "Juan", "email": "juan@example.com", "message": "Hola"}
+        for _ in range(3):
+            self.assertEqual(self.client.post(self.url, data, format="json").status_code, status.HTTP_200_OK)
+
+        # Solo la comprobación de que el usuario existe.
+        with self.assertNumQueries(1):
+            resp = self.client.post(self.url, data, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(resp.data.get("error"), "Has alcanzado el límite de 3 mensajes diarios.")
+        self.assertGreater(int(resp["Retry-After"]), 0)
+        self.assertEqual(ContactMessage.objects.count(), 3)
+
+        other = {"name": "X", "email": "x@x.com", "message": "M"}
+        self.assertEqual(self.client.post(self.url, other, format="json").status_code, status.HTTP_200_OK)
+
+    def test_invalid_submissions_do_not_consume_the_quota(self):
+        """Los envíos incompletos no cuentan; los de un email desconocido solo gastan el cupo por IP"""
+        data = {"name": "Juan", "email": "juan@example.com", "message": "Hola"}
+        unknown = dict(data, email="nadie@example.com")
+        with self.settings(RATE_LIMITS={"contact": "1/d", "contact_ip": "2/h"}):
+            for _ in range(5):
+                resp = self.client.post(self.url, {"email": "juan@example.com"}, format="json")
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+            self.assertEqual(self.client.post(self.url, unknown, format="json").status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(self.client.post(self.url, data, format="json").status_code, status.HTTP_200_OK)
+
+            resp = self.client.post(self.url, unknown, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+class ContactInboxTest(APITestCase):
+    def setUp(self):
+        self.url = reverse("contact_list_messages")
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="pw")
+        User.objects.create_user(username="blocked", email="blocked@example.com", password="pw", is_active=False)
+        now = timezone.now()
+        for i in range(5):
+            msg = ContactMessage.objects.create(name=f"N{i}", email="a@example.com", message=f"Perro número {i}")
+            ContactMessage.objects.filter(pk=msg.pk).update(created_at=now - timedelta(hours=i))
+        ContactMessage.objects.create(name="Spam", email="blocked@example.com", message="Perro bloqueado")
+
+    def test_only_superusers(self):
+        self.client.force_authenticate(User.objects.get(username="blocked"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cursor_pagination_excludes_blocked_senders(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url, {"limit": 3})
+        self.assertEqual([m["name"] for m in first.data["results"]], ["N0", "N1", "N2"])
+        self.assertIsNotNone(first.data["next"])
+
+        # Un mensaje nuevo no desplaza la página siguiente.
+        ContactMessage.objects.create(name="Nuevo", email="a@example.com", message="Hola")
+        second = self.client.get(first.data["next"])
+        self.assertEqual([m["name"] for m in second.data["results"]], ["N3", "N4"])
+        self.assertIsNone(second.data["next"])
+
+    def test_search_by_text_and_email(self):
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get(self.url, {"q": "número 3"})
+        self.assertEqual([m["name"] for m in resp.data["results"]], ["N3"])
+        resp = self.client.get(self.url, {"q": "blocked@example.com"})
+        self.assertEqual(resp.data["results"], [])
+
+    def test_archive_moves_old_messages_out_of_the_inbox(self):
+        old = ContactMessage.objects.get(name="N4")
+        ContactMessage.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        out = io.StringIO()
+        call_command("archive_contact_messages", "--days", "180", "--batch-size", "1", stdout=out)
+        self.assertIn("Mensajes archivados: 1", out.getvalue())
+        self.assertFalse(ContactMessage.objects.filter(pk=old.pk).exists())
+        archived = ArchivedContactMessage.objects.get(pk=old.pk)
+        self.assertEqual((archived.name, archived.message), ("N4", "Perro número 4"))
+
+
+class SlidingWindowTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_previous_window_is_weighted_and_retry_after_is_exact(self):
+        start = 1_000_000 * 60  # inicio de una ventana de un minuto
+        for second in (50, 55):
+            self.assertEqual(hit("test", "ip", "2/m", now=start + second), (True, 0))
+        # La siguiente ventana arranca con las dos a peso completo: hay que esperar a su mitad.
+        self.assertEqual(hit("test", "ip", "2/m", now=start + 58), (False, 32))
+
+        # A mitad de la ventana siguiente las dos peticiones anteriores cuentan como una.
+        self.assertEqual(hit("test", "ip", "2/m", now=start + 60), (False, 30))
+        self.assertEqual(hit("test", "ip", "2/m", now=start + 90), (True, 0))
+        self.assertEqual(hit("test", "ip", "2/m", now=start + 95), (False, 25))
+        self.assertEqual(hit("test", "other-ip", "2/m", now=start + 95), (True, 0))
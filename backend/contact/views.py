@@ -1,16 +1,20 @@
 import logging
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import EmailMessage
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from app.pagination import CreatedAtCursorPagination
+from app.ratelimit import client_ip, hit, too_many_requests
+from outbox.mail import enqueue_email
+
 from .models import ContactMessage
 from .serializers import ContactMessageSerializer
 
@@ -33,22 +37,33 @@ def contact_view(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    # Los límites se cuentan después de validar: un envío incompleto no gasta cupo. El de IP va
+    # antes de buscar el usuario para que no sirva para sondear qué emails están registrados.
+    allowed, retry_after = hit("contact_ip", client_ip(request))
+    if not allowed:
+        return too_many_requests(retry_after)
+
     if not User.objects.filter(email=email).exists():
         return Response(
             {"error": "El usuario no existe."},
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    hoy = timezone.localdate()
-    enviados_hoy = ContactMessage.objects.filter(email=email, created_at__date=hoy).count()
-    if enviados_hoy >= 3:
-        return Response(
-            {"error": "Has alcanzado el límite de 3 mensajes diarios."},
-            status=status.HTTP_429_TOO_MANY_REQUESTS,
-        )
+    # Límite por email en la caché (ventana deslizante de 24 h), sin contar filas en la BD.
+    allowed, retry_after = hit("contact", email.lower())
+    if not allowed:
+        return too_many_requests(retry_after, "Has alcanzado el límite de 3 mensajes diarios.")
 
     try:
-        ContactMessage.objects.create(name=name, email=email, message=message)
+        # El mensaje y su aviso por correo se guardan juntos; el correo lo envía la outbox.
+        with transaction.atomic():
+            ContactMessage.objects.create(name=name, email=email, message=message)
+            enqueue_email(
+                subject="Nuevo mensaje de contacto",
+                body=f"De: {name}\nEmail: {email}\n\n{message}",
+                to=["marclosquino2@gmail.com"],
+                reply_to=[email],
+            )
     except Exception:
         logger.exception("Error al guardar el mensaje en la base de datos")
         return Response(
@@ -56,30 +71,34 @@ def contact_view(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
-    try:
-        email_message = EmailMessage(
-            subject="Nuevo mensaje de contacto",
-            body=f"De: {name}\nEmail: {email}\n\n{message}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=["marclosquino2@gmail.com"],
-            headers={"Reply-To": email},
-        )
-        email_message.send(fail_silently=False)
-    except Exception:
-        logger.exception("Error al enviar el correo de contacto")
-
     return Response(
         {"message": "Mensaje enviado correctamente."},
         status=status.HTTP_200_OK,
     )
 
 
+def search_messages(queryset, query):
+    """
+    Búsqueda en la bandeja. Un email se busca tal cual (índice por email); el resto,
+    con búsqueda de texto completo sobre nombre y mensaje en PostgreSQL (índice GIN
+    contact_search_idx) o con icontains en otros motores.
+    """
+    if "@" in query:
+        return queryset.filter(email=query)
+    if connection.vendor == "postgresql":
+        return queryset.annotate(search=SearchVector("name", "message", config="spanish")).filter(
+            search=SearchQuery(query, config="spanish", search_type="websearch")
+        )
+    return queryset.filter(Q(name__icontains=query) | Q(message__icontains=query))
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_contact_messages(request):
     """
-    GET /api/contact/admin/messages/
-    Devuelve todos los mensajes de contacto que NO pertenezcan a usuarios bloqueados.
+    GET /api/contact/admin/messages/?q=...&limit=50&cursor=...
+    Mensajes de contacto que NO pertenezcan a usuarios bloqueados, del más reciente
+    al más antiguo y paginados por cursor ({"next", "previous", "results"}).
     Solo accesible para superusuarios (is_superuser=True).
     """
     if not request.user.is_superuser:
@@ -88,10 +107,17 @@ def list_contact_messages(request):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    blocked_emails = User.objects.filter(is_active=False).values_list("email", flat=True)
-    qs = ContactMessage.objects.exclude(email__in=blocked_emails).order_by("-created_at")
-    serializer = ContactMessageSerializer(qs, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Anti-join (NOT EXISTS) contra los usuarios inactivos, en lugar de NOT IN sobre todos sus emails.
+    blocked = User.objects.filter(email=OuterRef("email"), is_active=False)
+    qs = ContactMessage.objects.filter(~Exists(blocked))
+    query = request.query_params.get("q", "").strip()
+    if query:
+        qs = search_messages(qs, query)
+
+    paginator = CreatedAtCursorPagination()
+    page = paginator.paginate_queryset(qs, request)
+    serializer = ContactMessageSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(["GET", "DELETE"])
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DonacionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "donacions"
+
+    def ready(self):
+        import donacions.signals  # noqa: F401
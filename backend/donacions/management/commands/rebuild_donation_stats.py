@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from donacions.models import DonacionMensual, DonanteTotal
+from donacions.stats import reconstruir_estadisticas
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los totales mensuales y por donante a partir de las donaciones."
+
+    def handle(self, *args, **options):
+        reconstruir_estadisticas()
+        self.stdout.write(f"Meses: {DonacionMensual.objects.count()}, donantes: {DonanteTotal.objects.count()}")
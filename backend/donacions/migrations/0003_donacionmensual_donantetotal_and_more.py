@@ -0,0 +1,79 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def calcular_agregados(apps, schema_editor):
+    Donacion = apps.get_model("donacions", "Donacion")
+    DonacionMensual = apps.get_model("donacions", "DonacionMensual")
+    DonanteTotal = apps.get_model("donacions", "DonanteTotal")
+    por_mes = (
+        Donacion.objects.annotate(mes=TruncMonth("fecha", output_field=DateField()))
+        .values("mes")
+        .annotate(total=Sum("cantidad"), num=Count("id"))
+        .order_by()
+    )
+    DonacionMensual.objects.bulk_create(
+        [DonacionMensual(mes=row["mes"], total=row["total"], num_donaciones=row["num"]) for row in por_mes]
+    )
+    por_donante = (
+        Donacion.objects.filter(anonimo=False)
+        .values("usuario_id")
+        .annotate(total=Sum("cantidad"), num=Count("id"))
+        .order_by()
+    )
+    DonanteTotal.objects.bulk_create(
+        [DonanteTotal(usuario_id=row["usuario_id"], total=row["total"], num_donaciones=row["num"]) for row in por_donante],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("donacions", "0002_donacion_anonimo"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DonacionMensual",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("mes", models.DateField(unique=True)),
+                ("total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("num_donaciones", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DonanteTotal",
+            fields=[
+                (
+                    "usuario",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="total_donado",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("num_donaciones", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="donacion",
+            index=models.Index(fields=["-fecha", "-id"], name="donacion_feed_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="donantetotal",
+            index=models.Index(fields=["-total"], name="donante_total_idx"),
+        ),
+        migrations.RunPython(calcular_agregados, migrations.RunPython.noop),
+    ]
@@ -10,8 +10,42 @@ class Donacion(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)
     anonimo = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["-fecha", "-id"], name="donacion_feed_idx")]
+
     def __str__(self):
         return (
             f"{self.usuario.username if not self.anonimo else 'Anonimo'} - "
             f"{self.cantidad}€ - {self.fecha.strftime('%Y-%m-%d %H:%M:%S')}"
         )
+
+
+class DonacionMensual(models.Model):
+    """
+    Suma y número de donaciones de un mes. Se actualiza de forma incremental al
+    crear o borrar una Donacion (ver donacions.stats) para no agregar la tabla entera.
+    """
+
+    mes = models.DateField(unique=True)  # primer día del mes
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    num_donaciones = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m}: {self.total}€ ({self.num_donaciones})"
+
+
+class DonanteTotal(models.Model):
+    """
+    Total donado por cada usuario (solo donaciones no anónimas), para el ranking.
+    Se mantiene igual que DonacionMensual.
+    """
+
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="total_donado")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    num_donaciones = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-total"], name="donante_total_idx")]
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.total}€"
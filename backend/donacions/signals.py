@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Donacion
+from .stats import registrar_donacion
+
+
+@receiver(post_save, sender=Donacion)
+def sumar_donacion(sender, instance, created, **kwargs):
+    """Cada donación nueva se suma a los totales mensuales y al del donante."""
+    if created:
+        registrar_donacion(instance)
+
+
+@receiver(post_delete, sender=Donacion)
+def restar_donacion(sender, instance, **kwargs):
+    registrar_donacion(instance, signo=-1)
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from app.db_router import primary_reads
+
+from .models import Donacion, DonacionMensual, DonanteTotal
+
+TOTALES_CACHE_KEY = "donacions:totales"
+
+
+def mes_de(fecha):
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def _sumar(model, lookup, cantidad, signo):
+    updated = model.objects.filter(**lookup).update(
+        total=F("total") + signo * cantidad, num_donaciones=F("num_donaciones") + signo
+    )
+    if updated or signo < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, total=cantidad, num_donaciones=1)
+    except IntegrityError:
+        # Otra petición ha creado la fila a la vez: basta con sumar.
+        _sumar(model, lookup, cantidad, signo)
+
+
+def registrar_donacion(donacion, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) una donación de los agregados, con
+    UPDATE ... SET total = total + x, sin leer ni bloquear más que las filas afectadas.
+    Los cambios posteriores de cantidad o anonimato los corrige reconstruir_estadisticas.
+    """
+    cantidad = Decimal(donacion.cantidad)  # puede llegar como str si se asignó a mano
+    with transaction.atomic():
+        _sumar(DonacionMensual, {"mes": mes_de(donacion.fecha)}, cantidad, signo)
+        if not donacion.anonimo:
+            _sumar(DonanteTotal, {"usuario_id": donacion.usuario_id}, cantidad, signo)
+        transaction.on_commit(lambda: cache.delete(TOTALES_CACHE_KEY))
+
+
+def reconstruir_estadisticas():
+    """Recalcula los agregados desde la tabla de donaciones (reconciliación periódica)."""
+    por_mes = (
+        Donacion.objects.annotate(mes=TruncMonth("fecha", output_field=DateField()))
+        .values("mes")
+        .annotate(total=Sum("cantidad"), num=Count("id"))
+        .order_by()
+    )
+    por_donante = (
+        Donacion.objects.filter(anonimo=False)
+        .values("usuario_id")
+        .annotate(total=Sum("cantidad"), num=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        DonacionMensual.objects.all().delete()
+        DonacionMensual.objects.bulk_create(
+            [DonacionMensual(mes=row["mes"], total=row["total"], num_donaciones=row["num"]) for row in por_mes]
+        )
+        DonanteTotal.objects.all().delete()
+        DonanteTotal.objects.bulk_create(
+            [
+                DonanteTotal(usuario_id=row["usuario_id"], total=row["total"], num_donaciones=row["num"])
+                for row in por_donante
+            ],
+            batch_size=1000,
+        )
+        transaction.on_commit(lambda: cache.delete(TOTALES_CACHE_KEY))
+
+
+def totales():
+    """
+    Total recaudado, número de donaciones, desglose de los últimos meses y ranking
+    de donantes (usuarios activos, sin contar donaciones anónimas). Lee solo las
+    tablas de agregados y se cachea hasta la siguiente donación.
+    """
+    data = cache.get(TOTALES_CACHE_KEY)
+    if data is not None:
+        return data
+
+    with primary_reads():  # se cachea: nada de una réplica retrasada
+        meses = list(DonacionMensual.objects.order_by("mes").values_list("mes", "total", "num_donaciones"))
+        top = list(
+            DonanteTotal.objects.filter(usuario__is_active=True, num_donaciones__gt=0)
+            .order_by("-total")
+            .values_list("usuario__username", "total", "num_donaciones")[: settings.DONATIONS_TOP_DONORS]
+        )
+    data = {
+        "total": str(sum((total for _, total, _ in meses), Decimal("0.00"))),
+        "count": sum(num for _, _, num in meses),
+        "per_month": [
+            {"month": f"{mes:%Y-%m}", "total": str(total), "count": num}
+            for mes, total, num in meses[-settings.DONATIONS_MONTHS :]
+        ],
+        "top_donors": [{"usuario": username, "total": str(total), "count": num} for username, total, num in top],
+    }
+    cache.set(TOTALES_CACHE_KEY, data, settings.DONATIONS_TOTALS_CACHE_SECONDS)
+    return data
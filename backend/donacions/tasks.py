@@ -0,0 +1,10 @@
+from datetime import timedelta
+
+from taskqueue.queue import periodic_task
+
+from .stats import reconstruir_estadisticas
+
+
+@periodic_task(every=timedelta(days=1), max_attempts=1)
+def reconcile_donation_stats():
+    reconstruir_estadisticas()
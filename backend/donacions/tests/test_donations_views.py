@@ -1,28 +1,36 @@
+import io
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from donacions.models import Donacion
+from donacions.models import Donacion, DonacionMensual, DonanteTotal
 
 User = get_user_model()
 
 
 class DonationsViewsTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass")
         self.lista_url = reverse("lista-donaciones")
         self.crear_url = reverse("crear-donacion")
+        self.export_url = reverse("exportar-donaciones")
         self.d1 = Donacion.objects.create(usuario=self.user, cantidad="5.00", anonimo=False)
         self.d2 = Donacion.objects.create(usuario=self.user, cantidad="10.00", anonimo=True)
 
     def test_list_donations_public(self):
-        """GET público a /donations/ debe devolver todas las donaciones ordenadas y con display_usuario."""
+        """GET público a /donations/ debe devolver las donaciones paginadas, ordenadas y con display_usuario."""
         resp = self.client.get(self.lista_url)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(resp.data), 2)
-        primero, segundo = resp.data[0], resp.data[1]
+        self.assertEqual(len(resp.data["results"]), 2)
+        self.assertIsNone(resp.data["next"])
+        primero, segundo = resp.data["results"]
         self.assertEqual(primero["id"], self.d2.id)
         self.assertEqual(segundo["id"], self.d1.id)
         for obj in (primero, segundo):
@@ -60,3 +68,71 @@ class DonationsViewsTest(APITestCase):
         self.assertEqual(don.usuario, self.user)
         self.assertEqual(str(don.cantidad), "20.00")
         self.assertTrue(don.anonimo)
+
+    def test_export_donations_admin_only(self):
+        """Exportación en streaming: 403 para usuarios normales, NDJSON completo para admins."""
+        assert self.client.login(username="testuser", password="testpass")
+        resp = self.client.get(self.export_url)
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.create_superuser(username="admin", email="admin@example.com", password="adminpw")
+        assert self.client.login(username="admin", password="adminpw")
+        resp = self.client.get(self.export_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([r["id"] for r in rows], [self.d1.id, self.d2.id])
+        self.assertEqual(rows[1]["username"], self.user.username)
+        self.assertEqual(rows[1]["cantidad"], "10.00")
+
+    def test_feed_is_paginated_without_n_plus_one(self):
+        other = User.objects.create_user(username="other", password="pw")
+        for i in range(25):
+            Donacion.objects.create(usuario=other if i % 2 else self.user, cantidad="1.00")
+
+        with self.assertNumQueries(1):
+            first = self.client.get(self.lista_url)
+        self.assertEqual(len(first.data["results"]), 20)
+        second = self.client.get(first.data["next"])
+        self.assertEqual(len(second.data["results"]), 7)
+        self.assertIsNone(second.data["next"])
+
+        assert self.client.login(username="other", password="pw")
+        mine = self.client.get(self.lista_url, {"mine": 1})
+        self.assertEqual({d["usuario"] for d in mine.data["results"]}, {"other"})
+
+    def test_totals_are_maintained_incrementally(self):
+        """Los totales salen de las tablas de agregados, que se actualizan con cada donación."""
+        User.objects.create_user(username="blocked", password="pw", is_active=False).donaciones.create(cantidad="50.00")
+        top = User.objects.create_user(username="top", password="pw")
+        Donacion.objects.create(usuario=top, cantidad="7.50")
+        Donacion.objects.create(usuario=top, cantidad="2.50")
+        url = reverse("totales-donaciones")
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual((resp.data["total"], resp.data["count"]), ("75.00", 5))
+        self.assertEqual(len(resp.data["per_month"]), 1)
+        self.assertEqual(resp.data["per_month"][0]["total"], "75.00")
+        # Sin usuarios bloqueados y sin contar las donaciones anónimas.
+        self.assertEqual(
+            resp.data["top_donors"],
+            [{"usuario": "top", "total": "10.00", "count": 2}, {"usuario": "testuser", "total": "5.00", "count": 1}],
+        )
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.d1.delete()
+        resp = self.client.get(url)
+        self.assertEqual((resp.data["total"], resp.data["count"]), ("70.00", 4))
+        self.assertEqual([d["usuario"] for d in resp.data["top_donors"]], ["top"])
+
+    def test_rebuild_command_reconciles_drift(self):
+        DonacionMensual.objects.update(total=0, num_donaciones=0)
+        DonanteTotal.objects.all().delete()
+        call_command("rebuild_donation_stats", stdout=io.StringIO())
+        mensual = DonacionMensual.objects.get()
+        self.assertEqual((str(mensual.total), mensual.num_donaciones), ("15.00", 2))
+        self.assertEqual(str(DonanteTotal.objects.get(usuario=self.user).total), "5.00")
@@ -5,4 +5,6 @@ from . import views
 urlpatterns = [
     path("donations/", views.ListaDonacionesView.as_view(), name="lista-donaciones"),
     path("donations/add/", views.CrearDonacionView.as_view(), name="crear-donacion"),
+    path("donations/totals/", views.totales_donaciones_view, name="totales-donaciones"),
+    path("donations/export/", views.export_donaciones_view, name="exportar-donaciones"),
 ]
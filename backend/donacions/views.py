@@ -1,24 +1,48 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
 
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from app.exports import EXPORT_CONTENT_TYPES, streaming_export
+from app.pagination import CreatedAtCursorPagination
 
 from .models import Donacion
 from .serializers import DonacionSerializer
+from .stats import totales
 
 User = get_user_model()
 
 
+class DonacionesPagination(CreatedAtCursorPagination):
+    ordering = ("-fecha", "-id")
+    page_size = 20
+
+
 class ListaDonacionesView(generics.ListAPIView):
     """
-    Lista todas las donaciones, ordenadas por fecha descendente.
-    Solo donaiones de usuarios activos.
+    Lista las donaciones de usuarios activos, de la más reciente a la más antigua,
+    paginadas por cursor ({"next", "previous", "results"}).
+    Con ?mine=1 (y sesión iniciada) solo las del usuario actual.
     """
 
     serializer_class = DonacionSerializer
     permission_classes = []
+    pagination_class = DonacionesPagination
 
     def get_queryset(self):
-        return Donacion.objects.filter(usuario__is_active=True).order_by("-fecha")
+        # El serializer solo necesita el username: un JOIN en lugar de una consulta por fila.
+        qs = (
+            Donacion.objects.filter(usuario__is_active=True)
+            .select_related("usuario")
+            .only("id", "cantidad", "fecha", "anonimo", "usuario", "usuario__username")
+        )
+        if self.request.query_params.get("mine") and self.request.user.is_authenticated:
+            qs = qs.filter(usuario=self.request.user)
+        return qs
 
 
 class CrearDonacionView(generics.CreateAPIView):
@@ -32,4 +56,44 @@ class CrearDonacionView(generics.CreateAPIView):
     def perform_create(self, serializer):
         if not self.request.user.is_active:
             raise permissions.PermissionDenied("Usuario bloqueado.")
-        serializer.save(usuario=self.request.user)
+        # La donación y su suma a los totales (señal post_save) van en la misma transacción.
+        with transaction.atomic():
+            serializer.save(usuario=self.request.user)
+
+
+@api_view(["GET"])
+@permission_classes([])
+def totales_donaciones_view(request):
+    """
+    GET /api/donations/totals/
+    Total recaudado, número de donaciones, totales por mes y ranking de donantes.
+    Sale de las tablas de agregados, no de recorrer las donaciones.
+    """
+    return Response(totales())
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_donaciones_view(request):
+    """
+    GET /api/donations/export/?export_format=ndjson|csv
+    Exporta en streaming todas las donaciones (incluidas las anónimas, con su usuario real).
+    Solo accesible para superusuarios.
+    """
+    if not request.user.is_superuser:
+        return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
+
+    export_format = request.query_params.get("export_format", "ndjson").lower()
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return Response(
+            {"error": "Formato no soportado. Usa 'ndjson' o 'csv'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return streaming_export(
+        Donacion.objects.order_by("pk"),
+        ("id", "usuario_id", "cantidad", "fecha", "anonimo"),
+        export_format,
+        "donaciones",
+        username=F("usuario__username"),
+    )
@@ -0,0 +1,133 @@
+"""
+Configuración de gunicorn para producción (gunicorn la lee sola desde backend/):
+
+    gunicorn app.wsgi
+
+Procesos e hilos salen de las CPUs disponibles para el contenedor (límite de cgroup
+o afinidad, no las de la máquina). Cada petición espera sobre todo a PostgreSQL y
+S3, así que cada proceso atiende varias a la vez con hilos (gthread) y el pool de
+conexiones de app.db_pool se dimensiona a esos hilos. Variables de entorno:
+
+    WEB_CONCURRENCY          procesos (por defecto 2 x CPUs + 1, como mucho GUNICORN_MAX_WORKERS)
+    GUNICORN_THREADS         hilos por proceso (por defecto 4)
+    GUNICORN_MAX_REQUESTS    peticiones antes de reciclar un proceso (0: nunca)
+    GUNICORN_ASGI=1          app.asgi con workers de uvicorn (requiere el paquete uvicorn)
+    GUNICORN_RELOAD=1        recarga al cambiar el código (solo desarrollo; desactiva preload)
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+
+
+def _env_flag(name):
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+def available_cpus():
+    """CPUs que puede usar este proceso: cuota de cgroup (v2 o v1) y afinidad."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else multiprocessing.cpu_count()
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+cpus = available_cpus()
+asgi = _env_flag("GUNICORN_ASGI")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+wsgi_app = "app.asgi:application" if asgi else "app.wsgi:application"
+workers = int(os.getenv("WEB_CONCURRENCY", min(2 * cpus + 1, int(os.getenv("GUNICORN_MAX_WORKERS", "8")))))
+worker_class = "uvicorn.workers.UvicornWorker" if asgi else "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Conexiones por proceso: una por hilo y algo de margen.
+# Se fija antes de cargar la aplicación, que lee DB_POOL_MAX_SIZE en app.settings.
+os.environ.setdefault("DB_POOL_MAX_SIZE", str(threads + 2))
+
+# La aplicación se importa una vez en el maestro y los procesos la heredan al hacer
+# fork (arranque más rápido y memoria compartida). Las conexiones no se heredan: el
+# pool, el cliente de S3 y la caché de sesiones son por proceso.
+reload = _env_flag("GUNICORN_RELOAD")
+preload_app = not reload
+
+# Reciclado: cada proceso se reinicia tras unas miles de peticiones (con jitter para
+# que no lo hagan todos a la vez), lo que acota fugas de memoria.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+# Parada ordenada: con SIGTERM los procesos dejan de aceptar conexiones y terminan las
+# peticiones en curso durante graceful_timeout (docker-compose espera stop_grace_period).
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    # Con varios procesos, límites de peticiones, revocaciones e invalidaciones solo
+    # funcionan si la caché es compartida (REDIS_URL): con locmem cada proceso tendría
+    # la suya y fallarían sin dar ningún error.
+    if workers > 1:
+        from app.caches import process_local_caches
+
+        local = process_local_caches()
+        if local:
+            server.log.error(
+                "%s procesos con cachés locales a cada proceso (%s): define REDIS_URL o usa WEB_CONCURRENCY=1.",
+                workers,
+                ", ".join(local),
+            )
+            sys.exit(1)
+
+
+def when_ready(server):
+    server.log.info(
+        "%s procesos %s x %s hilos (%s CPUs), reciclado cada %s peticiones",
+        workers,
+        worker_class,
+        threads,
+        cpus,
+        max_requests or "∞",
+    )
+
+
+def pre_fork(server, worker):
+    # Si la carga de la aplicación abrió alguna conexión en el maestro, no debe pasar
+    # a los procesos: la compartirían.
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    from django.db import connections
+
+    from app.db_pool.pool import close_pools
+
+    connections.close_all()
+    close_pools()
@@ -0,0 +1,98 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from taskqueue.queue import enqueue
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, body, to, from_email=None, reply_to=None):
+    """
+    Deja un correo en la outbox en lugar de enviarlo dentro de la petición.
+    Usa la transacción en curso: si el cambio que lo provoca se deshace, el correo también.
+    Encola además el envío (una sola tarea aunque se encolen varios correos seguidos).
+    """
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+    enqueue("outbox.tasks.drain_outbox", unique=True)
+    return email
+
+
+def retry_delay(attempts):
+    """Espera exponencial entre reintentos: base, 2·base, 4·base... hasta OUTBOX_RETRY_MAX_SECONDS."""
+    return timedelta(
+        seconds=min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+    )
+
+
+def _mark_failed(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmail.FAILED
+        logger.error("Correo %s descartado tras %s intentos: %s", email.pk, email.attempts, error)
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def send_pending(batch_size=None):
+    """
+    Envía un lote de correos pendientes reutilizando una única conexión SMTP.
+    Las filas se reclaman con SELECT ... FOR UPDATE SKIP LOCKED, así que varios
+    workers pueden vaciar la outbox a la vez sin enviar dos veces el mismo correo.
+    Devuelve {"sent": n, "failed": n}; un lote vacío indica que no queda nada por enviar.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    stats = {"sent": 0, "failed": 0}
+
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not batch:
+            return stats
+
+        try:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+        except Exception as e:
+            logger.exception("No se pudo abrir la conexión SMTP")
+            for email in batch:
+                _mark_failed(email, e, now)
+            stats["failed"] = len(batch)
+        else:
+            try:
+                for email in batch:
+                    try:
+                        connection.send_messages([email.to_message(connection)])
+                    except Exception as e:
+                        _mark_failed(email, e, now)
+                        stats["failed"] += 1
+                    else:
+                        email.attempts += 1
+                        email.status = OutboxEmail.SENT
+                        email.sent_at = timezone.now()
+                        email.last_error = ""
+                        stats["sent"] += 1
+            finally:
+                connection.close()
+
+        OutboxEmail.objects.bulk_update(
+            batch, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"], batch_size=500
+        )
+    return stats
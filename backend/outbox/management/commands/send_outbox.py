@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = "Envía los correos pendientes de la outbox, por lotes y con una sola conexión SMTP por lote."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="Sigue ejecutándose y revisa la outbox periódicamente")
+        parser.add_argument("--interval", type=float, default=5, help="Segundos de espera con la outbox vacía")
+
+    def handle(self, *args, **options):
+        total = {"sent": 0, "failed": 0}
+        while True:
+            stats = send_pending(options["batch_size"])
+            for key in total:
+                total[key] += stats[key]
+            if stats["sent"] or stats["failed"]:
+                self.stdout.write(f"Enviados: {stats['sent']}, fallidos: {stats['failed']}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(f"Outbox vacía. Total enviados: {total['sent']}, fallidos: {total['failed']}")
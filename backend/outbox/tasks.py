@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from taskqueue.queue import periodic_task
+
+from .mail import send_pending
+
+
+@periodic_task(every=timedelta(minutes=1), max_attempts=1)
+def drain_outbox():
+    """
+    Envía la outbox por lotes hasta vaciarla. enqueue_email la encola al momento;
+    la ejecución periódica recoge los reintentos pendientes.
+    """
+    while True:
+        stats = send_pending()
+        if not (stats["sent"] or stats["failed"]):
+            return
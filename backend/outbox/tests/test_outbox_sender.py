@@ -0,0 +1,59 @@
+import io
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from smtplib import SMTPException
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from outbox.mail import enqueue_email, send_pending
+from outbox.models import OutboxEmail
+
+
+class OutboxSenderTest(TestCase):
+    def test_batch_reuses_one_connection(self):
+        for i in range(3):
+            enqueue_email(f"Asunto {i}", "Cuerpo", [f"u{i}@example.com"])
+
+        with patch("outbox.mail.get_connection", wraps=get_connection) as connection:
+            self.assertEqual(send_pending(), {"sent": 3, "failed": 0})
+        connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT, sent_at__isnull=False).count(), 3)
+        self.assertEqual(send_pending(), {"sent": 0, "failed": 0})
+
+    @override_settings(OUTBOX_RETRY_BASE_SECONDS=30, OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        email = enqueue_email("Asunto", "Cuerpo", ["a@example.com"])
+        before = timezone.now()
+        with patch.object(EmailBackend, "send_messages", side_effect=SMTPException("buzón lleno")):
+            self.assertEqual(send_pending(), {"sent": 0, "failed": 1})
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.last_error), (OutboxEmail.PENDING, 1, "buzón lleno"))
+            self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=30))
+
+            # Hasta que no vence la espera no se reintenta.
+            self.assertEqual(send_pending(), {"sent": 0, "failed": 0})
+
+            OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            send_pending()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.FAILED, 2))
+
+    def test_file_backend_and_command(self):
+        enqueue_email("Asunto", "Cuerpo", ["a@example.com"], reply_to=["r@example.com"])
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.filebased.EmailBackend", EMAIL_FILE_PATH=directory
+            ):
+                out = io.StringIO()
+                call_command("send_outbox", stdout=out)
+            written = "".join(path.read_text() for path in Path(directory).iterdir())
+        self.assertIn("Reply-To: r@example.com", written)
+        self.assertIn("Total enviados: 1", out.getvalue())
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "max_attempts", "run_at", "locked_by", "created_at", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "last_error")
+    ordering = ("-created_at",)
+    actions = ["retry"]
+
+    @admin.action(description="Volver a encolar")
+    def retry(self, request, queryset):
+        queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, unique_key=None
+        )
@@ -0,0 +1,83 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.caches import process_local_caches
+from taskqueue.worker import Worker, run_pending
+
+
+def _work(batch_size, poll_interval):
+    worker = Worker(batch_size, poll_interval)
+    # SIGTERM/SIGINT: termina la tarea en curso, devuelve el resto del lote y sale.
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas (geocodificación, derivadas de imágenes, correo, limpieza del bucket...). "
+        "Con --processes N arranca N procesos que reclaman tareas en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=None, help="Tareas reclamadas por consulta")
+        parser.add_argument("--poll-interval", type=float, default=None, help="Segundos de espera con la cola vacía")
+        parser.add_argument("--once", action="store_true", help="Ejecuta las tareas vencidas y termina")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            stats = run_pending(options["batch_size"])
+            self.stdout.write(
+                f"Terminadas: {stats['done']}, reintentos: {stats['retried']}, fallidas: {stats['failed']}"
+            )
+            return
+
+        local = process_local_caches()
+        if local:
+            # Las tareas invalidan fichas, perfiles y totales: con una caché por proceso
+            # los workers web no se enteran y sirven datos viejos hasta que caducan.
+            self.stderr.write(
+                self.style.WARNING(f"Cachés locales a este proceso ({', '.join(local)}): define REDIS_URL.")
+            )
+
+        worker_args = (options["batch_size"], options["poll_interval"])
+        if options["processes"] <= 1:
+            _work(*worker_args)
+            return
+
+        # Ninguna conexión abierta debe heredarse a través del fork.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        stopping = False
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        def spawn():
+            process = context.Process(target=_work, args=worker_args, daemon=False)
+            process.start()
+            return process
+
+        processes = [spawn() for _ in range(options["processes"])]
+        self.stdout.write(f"{len(processes)} workers en marcha")
+        while not stopping:
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    self.stderr.write(f"Worker {process.pid} terminado (código {process.exitcode}), se relanza")
+                    processes[index] = spawn()
+            time.sleep(1)
+
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write("Workers detenidos")
@@ -0,0 +1,42 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """
+    Tarea en segundo plano. Se escribe en la misma transacción que el cambio que
+    la provoca y la ejecuta después el comando `run_tasks`, que reclama las filas
+    con SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "En cola"), (RUNNING, "En ejecución"), (DONE, "Terminada"), (FAILED, "Fallida")]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Solo puede haber una tarea en cola con la misma clave (ver enqueue(unique=True)).
+    unique_key = models.CharField(max_length=255, null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"], name="task_queued_idx")]
+        constraints = [
+            models.UniqueConstraint(fields=["unique_key"], condition=Q(status="queued"), name="task_unique_queued_key")
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,119 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Task
+
+
+class TaskSpec:
+    """Función registrada como tarea y sus opciones de reintento y periodicidad."""
+
+    def __init__(self, name, func, max_attempts, retry_delay, every=None):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.every = every
+
+
+_registry = {}
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def periodic_tasks():
+    return [spec for spec in _registry.values() if spec.every]
+
+
+def task(name=None, max_attempts=3, retry_delay=30, every=None):
+    """
+    Registra una función como tarea en segundo plano. Los argumentos tienen que
+    ser serializables a JSON (ids, no instancias). Añade a la función:
+
+        func.delay(*args, **kwargs)   -> la encola para ejecutarse cuanto antes
+        func.enqueue(args, kwargs, run_at=..., unique=...)
+
+    Con `every` la tarea es periódica: el worker la vuelve a programar al terminar.
+    """
+
+    def decorator(func):
+        spec = TaskSpec(name or f"{func.__module__}.{func.__name__}", func, max_attempts, retry_delay, every)
+        _registry[spec.name] = spec
+        func.task_name = spec.name
+        func.enqueue = lambda args=(), kwargs=None, **options: enqueue(spec.name, args, kwargs, **options)
+        func.delay = lambda *args, **kwargs: enqueue(spec.name, args, kwargs)
+        return func
+
+    return decorator
+
+
+def periodic_task(every, **options):
+    return task(every=every, **options)
+
+
+def unique_key_for(name, args, kwargs):
+    payload = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None, unique=False):
+    """
+    Escribe la tarea en la transacción en curso: si el cambio que la provoca se
+    deshace, la tarea también, y ningún worker la ve antes del commit.
+    Con unique=True no se duplica una tarea idéntica que siga en cola; se devuelve esa.
+    """
+    spec = _registry.get(name)
+    if spec is None:
+        raise KeyError(f"Tarea no registrada: {name}")
+    args, kwargs = list(args), dict(kwargs or {})
+    fields = {
+        "name": name,
+        "args": args,
+        "kwargs": kwargs,
+        "run_at": run_at or timezone.now(),
+        "max_attempts": spec.max_attempts,
+    }
+    if not unique:
+        return Task.objects.create(**fields)
+
+    key = unique_key_for(name, args, kwargs)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(unique_key=key, **fields)
+    except IntegrityError:
+        return Task.objects.filter(unique_key=key, status=Task.QUEUED).first()
+
+
+def retry_delay(spec, attempts):
+    """Espera exponencial entre reintentos: base, 2·base, 4·base... hasta TASKS_RETRY_MAX_SECONDS."""
+    return timedelta(seconds=min(spec.retry_delay * 2 ** (attempts - 1), settings.TASKS_RETRY_MAX_SECONDS))
+
+
+def queue_metrics():
+    """
+    Estado de la cola: tareas por estado, cuántas están vencidas y cuánto lleva
+    esperando la más antigua (lag), y el desglose por tarea de las no terminadas.
+    """
+    now = timezone.now()
+    by_status = {status: 0 for status, _ in Task.STATUS_CHOICES}
+    by_status.update(Task.objects.values_list("status").annotate(count=Count("id")).order_by())
+
+    due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).aggregate(count=Count("id"), oldest=Min("run_at"))
+    by_name = {}
+    pending = Task.objects.exclude(status=Task.DONE).values_list("name", "status").annotate(count=Count("id"))
+    for name, status, count in pending.order_by():
+        by_name.setdefault(name, {})[status] = count
+
+    return {
+        "status": by_status,
+        "due": due["count"],
+        "lag_seconds": round((now - due["oldest"]).total_seconds(), 1) if due["oldest"] else 0.0,
+        "tasks": by_name,
+    }
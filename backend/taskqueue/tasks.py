@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import periodic_task
+
+
+@periodic_task(every=timedelta(days=1))
+def purge_finished_tasks():
+    """Borra las tareas terminadas hace más de TASKS_RETENTION_DAYS; las fallidas se conservan."""
+    cutoff = timezone.now() - timedelta(days=settings.TASKS_RETENTION_DAYS)
+    Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()
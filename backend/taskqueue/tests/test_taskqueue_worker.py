@@ -0,0 +1,149 @@
+import io
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from animals.models import Animal
+from taskqueue.models import Task
+from taskqueue.queue import enqueue, periodic_task, task
+from taskqueue.worker import claim, recover_stale, run_pending, schedule_periodic
+
+User = get_user_model()
+
+calls = []
+
+
+@task(name="tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task(name="tests.flaky", max_attempts=2, retry_delay=10)
+def flaky():
+    raise RuntimeError("servicio caído")
+
+
+@periodic_task(name="tests.tick", every=timedelta(hours=1))
+def tick():
+    calls.append("tick")
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_follows_the_transaction_and_unique_deduplicates(self):
+        try:
+            with transaction.atomic():
+                record.delay(1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Task.objects.exists())
+
+        first = record.enqueue((2,), unique=True)
+        self.assertEqual(record.enqueue((2,), unique=True).pk, first.pk)
+        record.enqueue((3,), unique=True)
+        self.assertEqual(run_pending(), {"done": 2, "retried": 0, "failed": 0})
+        self.assertEqual(sorted(calls), [2, 3])
+        self.assertEqual(Task.objects.filter(status=Task.DONE, finished_at__isnull=False).count(), 2)
+
+    def test_claimed_tasks_are_not_claimed_twice_and_future_ones_wait(self):
+        record.delay(1)
+        record.enqueue((2,), run_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(len(claim("w1", 10)), 1)
+        self.assertEqual(claim("w2", 10), [])
+        self.assertEqual(Task.objects.get(status=Task.RUNNING).attempts, 1)
+
+    @override_settings(TASKS_RETRY_MAX_SECONDS=3600)
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        job = flaky.delay()
+        before = timezone.now()
+        self.assertEqual(run_pending(), {"done": 0, "retried": 1, "failed": 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (Task.QUEUED, 1, "RuntimeError: servicio caído"))
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+
+        # Hasta que no vence la espera no se reintenta.
+        self.assertEqual(run_pending(), {"done": 0, "retried": 0, "failed": 0})
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), {"done": 0, "retried": 0, "failed": 1})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.FAILED, 2))
+
+    def test_periodic_tasks_are_scheduled_once_and_rescheduled_after_running(self):
+        with patch("taskqueue.worker.periodic_tasks", return_value=[SimpleNamespace(name="tests.tick")]):
+            schedule_periodic()
+            schedule_periodic()
+        self.assertEqual(Task.objects.filter(name="tests.tick").count(), 1)
+
+        run_pending()
+        self.assertEqual(calls, ["tick"])
+        following = Task.objects.get(name="tests.tick", status=Task.QUEUED)
+        self.assertGreater(following.run_at, timezone.now() + timedelta(minutes=59))
+
+    @override_settings(TASKS_LOCK_TIMEOUT=60)
+    def test_stale_running_tasks_are_recovered(self):
+        job = record.delay(1)
+        claim("dead-worker", 10)
+        Task.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(recover_stale(), 1)
+        self.assertEqual(run_pending(), {"done": 1, "retried": 0, "failed": 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.DONE, 2))
+
+    def test_unknown_task_fails_and_command_runs_pending(self):
+        Task.objects.create(name="tests.missing")
+        enqueue("tests.record", (5,))
+        out = io.StringIO()
+        call_command("run_tasks", "--once", stdout=out)
+        self.assertIn("Terminadas: 1, reintentos: 0, fallidas: 1", out.getvalue())
+        self.assertEqual(calls, [5])
+
+
+class BackgroundWorkTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="prot", password="pw")
+
+    @patch("animals.tasks.geolocator.geocode", return_value=SimpleNamespace(latitude=41.4, longitude=2.2))
+    def test_geocoding_runs_in_the_queue_only_when_the_city_changes(self, geocode):
+        animal = Animal.objects.create(name="Dog", owner=self.owner, city="Barcelona")
+        geocode.assert_not_called()
+        run_pending()
+        geocode.assert_called_once_with("Barcelona")
+        animal.refresh_from_db()
+        self.assertEqual((animal.latitude, animal.longitude), (41.4, 2.2))
+
+        animal.name = "Rex"
+        animal.save()
+        self.assertFalse(Task.objects.filter(status=Task.QUEUED).exists())
+
+        animal.city = "Girona"
+        animal.save()
+        run_pending()
+        self.assertEqual(geocode.call_count, 2)
+
+    def test_task_metrics_only_for_superusers(self):
+        record.delay(1)
+        flaky.enqueue(run_at=timezone.now() + timedelta(hours=1))
+        url = reverse("task-metrics")
+
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_superuser(username="root", password="pw"))
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["status"]["queued"], 2)
+        self.assertEqual(resp.data["due"], 1)
+        self.assertEqual(resp.data["tasks"]["tests.flaky"], {"queued": 1})
@@ -0,0 +1,177 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .queue import enqueue, get_task, periodic_tasks, retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker, batch_size):
+    """
+    Reclama hasta batch_size tareas vencidas con SELECT ... FOR UPDATE SKIP LOCKED
+    y las marca como en ejecución. Varios workers pueden reclamar a la vez sin
+    repartirse la misma fila; el bloqueo dura solo lo que esta transacción.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by("run_at", "id")[:batch_size]
+        )
+        if not batch:
+            return []
+        Task.objects.filter(pk__in=[task.pk for task in batch]).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1
+        )
+    for task in batch:
+        task.status, task.locked_by, task.locked_at = Task.RUNNING, worker, now
+        task.attempts += 1
+    return batch
+
+
+def release(tasks, worker):
+    """Devuelve a la cola tareas reclamadas que no se han llegado a ejecutar (parada del worker)."""
+    Task.objects.filter(pk__in=[task.pk for task in tasks], status=Task.RUNNING, locked_by=worker).update(
+        status=Task.QUEUED, attempts=F("attempts") - 1, locked_by="", locked_at=None, unique_key=None
+    )
+
+
+def _finish(task, worker, **fields):
+    # Solo si la tarea sigue siendo nuestra: recover_stale puede haberla devuelto a la cola.
+    Task.objects.filter(pk=task.pk, status=Task.RUNNING, locked_by=worker).update(**fields)
+
+
+def execute(task, worker):
+    """
+    Ejecuta una tarea reclamada. Si falla, vuelve a la cola con espera exponencial
+    hasta agotar max_attempts. Las periódicas se reprograman al terminar.
+    Devuelve "done", "retried" o "failed".
+    """
+    spec = get_task(task.name)
+    if spec is None:
+        logger.error("Tarea no registrada: %s", task.name)
+        _finish(task, worker, status=Task.FAILED, last_error="Tarea no registrada", finished_at=timezone.now())
+        return "failed"
+
+    started = time.perf_counter()
+    try:
+        spec.func(*task.args, **task.kwargs)
+    except Exception as e:
+        now = timezone.now()
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if task.attempts >= task.max_attempts:
+            logger.exception("Tarea %s (%s) descartada tras %s intentos", task.pk, task.name, task.attempts)
+            _finish(task, worker, status=Task.FAILED, last_error=error, finished_at=now)
+            outcome = "failed"
+        else:
+            logger.warning("Tarea %s (%s) fallida, se reintentará: %s", task.pk, task.name, error)
+            # Sin unique_key: puede haber ya otra idéntica en cola.
+            _finish(
+                task,
+                worker,
+                status=Task.QUEUED,
+                run_at=now + retry_delay(spec, task.attempts),
+                last_error=error,
+                locked_by="",
+                locked_at=None,
+                unique_key=None,
+            )
+            return "retried"
+    else:
+        now = timezone.now()
+        _finish(task, worker, status=Task.DONE, last_error="", finished_at=now)
+        outcome = "done"
+        logger.debug("Tarea %s (%s) terminada en %.3fs", task.pk, task.name, time.perf_counter() - started)
+
+    if spec.every:
+        enqueue(spec.name, task.args, task.kwargs, run_at=now + spec.every, unique=True)
+    return outcome
+
+
+def recover_stale():
+    """
+    Devuelve a la cola las tareas de workers que murieron a mitad (siguen en
+    ejecución pasado TASKS_LOCK_TIMEOUT), o las da por fallidas si ya no les quedan intentos.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT))
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Task.FAILED, last_error="Worker perdido durante la ejecución", finished_at=now
+    )
+    requeued = stale.update(status=Task.QUEUED, run_at=now, locked_by="", locked_at=None, unique_key=None)
+    if failed or requeued:
+        logger.warning("Tareas abandonadas: %s reencoladas, %s fallidas", requeued, failed)
+    return requeued + failed
+
+
+def schedule_periodic():
+    """Asegura que cada tarea periódica tiene una ejecución en cola (o en curso)."""
+    for spec in periodic_tasks():
+        if not Task.objects.filter(name=spec.name, status__in=[Task.QUEUED, Task.RUNNING]).exists():
+            enqueue(spec.name, unique=True)
+
+
+def run_pending(batch_size=None, worker=None):
+    """
+    Ejecuta en este proceso todas las tareas vencidas, incluidas las que estas
+    encolen, hasta vaciar la cola. Para `run_tasks --once` y los tests.
+    """
+    worker = worker or worker_id()
+    stats = {"done": 0, "retried": 0, "failed": 0}
+    while batch := claim(worker, batch_size or settings.TASKS_BATCH_SIZE):
+        for task in batch:
+            stats[execute(task, worker)] += 1
+    return stats
+
+
+class Worker:
+    """Bucle de un proceso worker: reclama lotes, los ejecuta y espera si no hay nada."""
+
+    maintenance_interval = 60
+
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.id = worker_id()
+        self.batch_size = batch_size or settings.TASKS_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        logger.info("Worker %s en marcha", self.id)
+        next_maintenance = 0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() >= next_maintenance:
+                recover_stale()
+                schedule_periodic()
+                next_maintenance = time.monotonic() + self.maintenance_interval
+
+            batch = claim(self.id, self.batch_size)
+            for index, task in enumerate(batch):
+                if self.stopping:
+                    release(batch[index:], self.id)
+                    break
+                execute(task, self.id)
+
+            if not batch:
+                deadline = time.monotonic() + self.poll_interval
+                while not self.stopping and time.monotonic() < deadline:
+                    time.sleep(min(0.2, self.poll_interval))
+        close_old_connections()
+        logger.info("Worker %s detenido", self.id)
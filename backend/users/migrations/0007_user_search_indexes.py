@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:40
+
+from django.db import migrations
+
+# Índices de búsqueda de usuarios (users.search), solo en PostgreSQL. Django
+# traduce icontains/istartswith a UPPER(campo::text) LIKE UPPER(...), así que se
+# indexa esa misma expresión: trigramas (GIN) para "contiene" y prefijos de 3+
+# letras, y un btree con text_pattern_ops para los prefijos cortos del username.
+
+TRIGRAM_INDEXES = {
+    "auth_user_username_trgm_idx": "username",
+    "auth_user_first_name_trgm_idx": "first_name",
+    "auth_user_last_name_trgm_idx": "last_name",
+}
+
+PREFIX_INDEX = "auth_user_username_prefix_idx"
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON auth_user USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON auth_user (UPPER(username::text) text_pattern_ops)"
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in [*TRIGRAM_INDEXES, PREFIX_INDEX]:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_adopterprofile_avatar_variants"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [migrations.RunPython(create_indexes, drop_indexes)]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_usersession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                ("jti", models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TokenCutoff",
+            fields=[
+                ("user_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("revoked_before", models.FloatField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-19 20:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_token_revocations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adopterprofile",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -14,6 +14,9 @@ class AdopterProfile(models.Model):
         blank=True,
         null=True,
     )
+    avatar_variants = models.JSONField(
+        blank=True, default=dict, help_text="Derivadas redimensionadas (WebP/JPEG) del avatar"
+    )
 
     location = models.CharField(max_length=100, blank=True, null=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
@@ -21,6 +24,7 @@ class AdopterProfile(models.Model):
     favorites = models.ManyToManyField("animals.Animal", blank=True, related_name="favorited_by")
     adopted = models.ManyToManyField("animals.Animal", blank=True, related_name="adopted_by")
     adoption_form = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"Perfil de {self.user.username}"
@@ -43,3 +47,44 @@ class ProtectoraApproval(models.Model):
 
     def __str__(self):
         return f"Protectora {self.user.username}: {'Aprobada' if self.approved else 'Pendiente'}"
+
+
+class UserSession(models.Model):
+    """
+    Índice de sesiones abiertas por usuario (las mantiene users.sessions al hacer
+    login/logout). Permite cerrar de golpe todas las sesiones de un usuario.
+    """
+
+    session_key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="sessions")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Sesión de {self.user_id}"
+
+
+class RevokedToken(models.Model):
+    """
+    Token firmado revocado antes de caducar (logout, refresco usado). Es la fuente de
+    verdad de users.tokens: la caché solo guarda el resultado de la última consulta.
+    """
+
+    jti = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Token revocado {self.jti}"
+
+
+class TokenCutoff(models.Model):
+    """
+    Tokens de un usuario emitidos antes de revoked_before (timestamp, como su "iat")
+    no valen: bloqueo, borrado, cambio de contraseña o pérdida de permisos. Sin
+    clave foránea porque también se corta al borrar el usuario.
+    """
+
+    user_id = models.IntegerField(primary_key=True)
+    revoked_before = models.FloatField()
+
+    def __str__(self):
+        return f"Tokens de {self.user_id} anteriores a {self.revoked_before}"
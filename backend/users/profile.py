@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from animals.models import AdoptionRequest, Animal
+from animals.serializers import AdoptionRequestSerializer, AnimalSerializer
+from app.db_router import primary_reads
+
+from .models import AdopterProfile
+from .serializers import AdopterProfileSerializer, UserSerializer
+
+User = get_user_model()
+
+
+def profile_cache_key(user_id):
+    return f"users:profile:{user_id}"
+
+
+def invalidate_profiles(user_ids):
+    """
+    Descarta el documento cacheado de estos usuarios (ids; se ignoran los None).
+    Se borra ya y otra vez al confirmar la transacción, por si una lectura
+    concurrente lo ha vuelto a cachear con los datos anteriores.
+    """
+    keys = [profile_cache_key(user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def users_of_animal(animal_id):
+    """Ids de los usuarios cuyo perfil muestra este animal."""
+    animal = Animal.objects.filter(pk=animal_id).values("owner_id", "adopter_id").first() or {}
+    return {
+        animal.get("owner_id"),
+        animal.get("adopter_id"),
+        *AdopterProfile.objects.filter(favorites__pk=animal_id).values_list("user_id", flat=True),
+        *AdopterProfile.objects.filter(adopted__pk=animal_id).values_list("user_id", flat=True),
+        *AdoptionRequest.objects.filter(animal_id=animal_id).values_list("user_id", flat=True),
+    }
+
+
+def invalidate_animal(animal_id):
+    """Invalida los perfiles afectados por un cambio en el animal (también tras un .update())."""
+    invalidate_profiles(users_of_animal(animal_id))
+
+
+def _animals():
+    # AnimalSerializer lee adopter.username: se trae en el mismo JOIN.
+    return Animal.objects.select_related("adopter").order_by("pk")
+
+
+def _load_user(user_id, is_staff):
+    """
+    Usuario con todo lo que necesita su perfil en un número fijo de consultas,
+    independiente de cuántos favoritos, adopciones o solicitudes tenga.
+    """
+    prefetches = [
+        Prefetch("profile__favorites", queryset=_animals()),
+        Prefetch("profile__adopted", queryset=_animals()),
+    ]
+    if is_staff:
+        prefetches.append(Prefetch("animals", queryset=_animals(), to_attr="owned_animals"))
+    else:
+        prefetches += [
+            Prefetch("adopted_animals", queryset=_animals(), to_attr="adopted_list"),
+            Prefetch(
+                "adoption_requests",
+                queryset=AdoptionRequest.objects.select_related("animal__adopter", "user"),
+                to_attr="request_list",
+            ),
+        ]
+    return User.objects.select_related("profile").prefetch_related(*prefetches).get(pk=user_id)
+
+
+def build_profile(user):
+    """
+    Documento de perfil de `user` (adoptante o protectora): datos del usuario y del
+    perfil más favoritos, adoptados y solicitudes, o los animales en adopción y
+    adoptados de la protectora. Devuelve None si un adoptante no tiene perfil.
+    """
+    user = _load_user(user.pk, user.is_staff)
+    user_data = UserSerializer(user).data
+    role = "protectora" if user.is_staff else "adoptante"
+    user_data["role"] = role
+
+    try:
+        profile = user.profile
+    except AdopterProfile.DoesNotExist:
+        profile = None
+
+    if role == "adoptante":
+        if profile is None:
+            return None
+        profile_data = AdopterProfileSerializer(profile).data
+        profile_data["favorites"] = AnimalSerializer(profile.favorites.all(), many=True).data
+        profile_data["adopted"] = AnimalSerializer(user.adopted_list, many=True).data
+        profile_data["requests"] = AdoptionRequestSerializer(user.request_list, many=True).data
+        return {**user_data, **profile_data}
+
+    profile_data = AdopterProfileSerializer(profile).data if profile is not None else {}
+    return {
+        **user_data,
+        **profile_data,
+        "en_adopcion": AnimalSerializer([a for a in user.owned_animals if a.adopter_id is None], many=True).data,
+        "adopted": AnimalSerializer([a for a in user.owned_animals if a.adopter_id is not None], many=True).data,
+    }
+
+
+def get_profile_document(user):
+    """
+    build_profile cacheado por usuario. Lo invalidan las señales de users.signals
+    (favoritos, solicitudes, animales, perfil); PROFILE_CACHE_SECONDS acota además
+    la vida de las URLs firmadas del avatar que lleva dentro. Se construye leyendo
+    del primario para no cachear datos de una réplica retrasada.
+    """
+    key = profile_cache_key(user.pk)
+    document = cache.get(key)
+    if document is None:
+        with primary_reads():
+            document = build_profile(user)
+        if document is not None:
+            cache.set(key, document, settings.PROFILE_CACHE_SECONDS)
+    return document
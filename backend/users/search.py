@@ -0,0 +1,67 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+User = get_user_model()
+
+SEARCH_FIELDS = ("username", "first_name", "last_name")
+
+# Con menos letras los trigramas no filtran nada: solo se busca por prefijo.
+MIN_CONTAINS_LENGTH = 3
+
+
+def matching_users(queryset, query):
+    """
+    Filtra `queryset` por `query` en username, nombre y apellidos y anota `rank`
+    (0 username exacto, 1 prefijo del username, 2 prefijo del nombre o apellido,
+    3 contenido en cualquiera). En PostgreSQL las búsquedas usan los índices de
+    trigramas de la migración users 0007 (UPPER(campo) LIKE ...).
+    """
+    lookup = "istartswith" if len(query) < MIN_CONTAINS_LENGTH else "icontains"
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__{lookup}": query})
+    return queryset.filter(condition).annotate(
+        rank=Case(
+            When(username__iexact=query, then=Value(0)),
+            When(username__istartswith=query, then=Value(1)),
+            When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query), then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def rank_users(queryset, query):
+    """Ordena por calidad de coincidencia; a igualdad, por parecido (trigramas) y longitud."""
+    ordering = ["rank"]
+    if connection.vendor == "postgresql":
+        queryset = queryset.annotate(similarity=TrigramSimilarity("username", query))
+        ordering.append("-similarity")
+    return queryset.order_by(*ordering, Length("username"), "username")
+
+
+def autocomplete(query, limit=None):
+    """
+    Hasta USER_AUTOCOMPLETE_LIMIT usuarios activos [{"id", "username"}] para `query`,
+    los mejores primero. El resultado se cachea unos segundos por consulta: mientras
+    se escribe se repiten mucho los mismos prefijos.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    limit = min(limit or settings.USER_AUTOCOMPLETE_LIMIT, settings.USER_AUTOCOMPLETE_LIMIT)
+    digest = hashlib.sha1(query.lower().encode()).hexdigest()[:20]
+    key = f"users:autocomplete:{limit}:{digest}"
+    results = cache.get(key)
+    if results is None:
+        queryset = matching_users(User.objects.filter(is_active=True), query)
+        results = list(rank_users(queryset, query).values("id", "username")[:limit])
+        cache.set(key, results, settings.USER_AUTOCOMPLETE_CACHE_SECONDS)
+    return results
@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from animals.models import Animal
+from app.images import placeholder, srcset
 
 from .models import AdopterProfile
 
@@ -82,9 +83,18 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class AnimalSerializer(serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+    image_placeholder = serializers.SerializerMethodField()
+
     class Meta:
         model = Animal
-        fields = ["id", "name", "image"]
+        fields = ["id", "name", "image", "image_srcset", "image_placeholder"]
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, obj.image_variants)
+
+    def get_image_placeholder(self, obj):
+        return placeholder(obj.image, obj.image_variants)
 
 
 class AdopterProfileSerializer(serializers.ModelSerializer):
@@ -94,6 +104,7 @@ class AdopterProfileSerializer(serializers.ModelSerializer):
     favorites = AnimalSerializer(many=True, read_only=True)
     adopted = AnimalSerializer(many=True, read_only=True)
     adoption_form = serializers.JSONField()
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = AdopterProfile
@@ -102,6 +113,7 @@ class AdopterProfileSerializer(serializers.ModelSerializer):
             "username",
             "email",
             "avatar",
+            "avatar_srcset",
             "location",
             "phone_number",
             "bio",
@@ -109,3 +121,6 @@ class AdopterProfileSerializer(serializers.ModelSerializer):
             "adopted",
             "adoption_form",
         ]
+
+    def get_avatar_srcset(self, obj):
+        return srcset(obj.avatar, obj.avatar_variants)
@@ -0,0 +1,170 @@
+"""
+Motor de sesiones en dos niveles (SESSION_ENGINE = "users.sessions"): una LRU en
+memoria del proceso delante de la tabla django_session.
+
+Una sesión leída o escrita en este proceso se sirve después desde memoria sin
+consultar la base de datos. Para que un cambio hecho en otro proceso (logout,
+bloqueo...) se note al instante, cada escritura o borrado apunta la hora en la
+caché compartida (SESSION_INVALIDATION_CACHE) y una entrada en memoria anterior a
+esa marca se descarta y se vuelve a leer de la base de datos. Con más de un proceso
+esa caché tiene que ser compartida (Redis): gunicorn no arranca varios workers si no.
+
+Cada entrada en memoria vale como mucho SESSION_MEMORY_TTL segundos, así que si se
+pierde una marca (reinicio de Redis...) una sesión cerrada en otro proceso sigue
+sirviéndose como mucho ese tiempo. Por lo mismo, la marca no necesita durar más.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.utils import timezone
+
+from app.caches import is_process_local
+
+from .models import UserSession
+
+logger = logging.getLogger(__name__)
+
+if is_process_local(settings.SESSION_INVALIDATION_CACHE):
+    logger.warning(
+        "SESSION_INVALIDATION_CACHE (%s) es local a cada proceso: un logout o bloqueo no se nota en "
+        "la memoria de los demás hasta SESSION_MEMORY_TTL. Define REDIS_URL si hay más de uno.",
+        settings.SESSION_INVALIDATION_CACHE,
+    )
+
+
+def _shared():
+    return caches[settings.SESSION_INVALIDATION_CACHE]
+
+
+def _changed_key(session_key):
+    return f"sessions:changed:{session_key}"
+
+
+def mark_changed(session_keys):
+    """Invalida estas sesiones en la memoria de todos los procesos."""
+    if session_keys:
+        now = time.time()
+        _shared().set_many({_changed_key(key): now for key in session_keys}, settings.SESSION_MEMORY_TTL)
+
+
+class SessionMemoryTier:
+    """LRU de sesiones (datos, hora de carga, caducidad) con contadores de aciertos."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, session_key):
+        """Datos de la sesión si están en memoria, siguen vigentes y nadie los ha cambiado desde fuera."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is not None:
+                self._entries.move_to_end(session_key)
+        if entry is None:
+            self._count("misses")
+            return None
+        data, loaded_at, expires_at = entry
+        if now >= expires_at or _shared().get(_changed_key(session_key), 0) > loaded_at:
+            self.delete([session_key], count=False)
+            self._count("stale")
+            return None
+        self._count("hits")
+        return dict(data)
+
+    def set(self, session_key, data, expire_date):
+        now = time.time()
+        with self._lock:
+            self._entries[session_key] = (dict(data), now, min(now + self.ttl, expire_date.timestamp()))
+            self._entries.move_to_end(session_key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self._counters["evictions"] += evicted
+
+    def delete(self, session_keys, count=True):
+        with self._lock:
+            removed = sum(self._entries.pop(key, None) is not None for key in session_keys)
+            if count:
+                self._counters["invalidations"] += removed
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["misses"] + counters["stale"]
+        return {**counters, "size": size, "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+
+memory = SessionMemoryTier(settings.SESSION_MEMORY_MAX_ENTRIES, settings.SESSION_MEMORY_TTL)
+
+
+class SessionStore(DBStore):
+    def load(self):
+        if self.session_key is not None:
+            data = memory.get(self.session_key)
+            if data is not None:
+                return data
+        s = self._get_session_from_db()
+        if s is None:
+            return {}
+        data = self.decode(s.session_data)
+        memory.set(s.session_key, data, s.expire_date)
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create=must_create)
+        if self.session_key is not None:
+            mark_changed([self.session_key])
+            memory.set(self.session_key, self._get_session(no_load=must_create), self.get_expiry_date())
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            memory.delete([session_key])
+            mark_changed([session_key])
+
+
+def end_user_sessions(user_id):
+    """
+    Cierra todas las sesiones del usuario (bloqueo, borrado, cambio de contraseña):
+    las borra de la base de datos y de la memoria de todos los procesos.
+    """
+    keys = list(UserSession.objects.filter(user_id=user_id).values_list("session_key", flat=True))
+    Session.objects.filter(session_key__in=keys).delete()
+    UserSession.objects.filter(session_key__in=keys).delete()
+    memory.delete(keys)
+    mark_changed(keys)
+    return len(keys)
+
+
+def prune_sessions():
+    """
+    Borra las sesiones caducadas y las filas de UserSession cuya sesión ya no existe
+    (caducada o borrada sin pasar por logout). Devuelve cuántas de UserSession.
+    """
+    SessionStore.clear_expired()
+    live = Session.objects.filter(expire_date__gt=timezone.now()).values("session_key")
+    deleted, _ = UserSession.objects.exclude(session_key__in=live).delete()
+    return deleted
@@ -1,10 +1,16 @@
 import logging
 
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import AdopterProfile
+from animals.models import AdoptionRequest, Animal
+
+from .models import AdopterProfile, UserSession
+from .profile import invalidate_animal, invalidate_profiles, users_of_animal
+from .tasks import build_avatar_variants
+from .tokens import revoke_user
 
 logger = logging.getLogger(__name__)
 
@@ -18,3 +24,103 @@ def create_adopter_profile(sender, instance, created, **kwargs):
     if created:
         logger.info(f"[signal] Creando AdopterProfile para usuario {instance.pk} / {instance.email}")
         AdopterProfile.objects.create(user=instance)
+
+
+@receiver(pre_save, sender=AdopterProfile)
+def capture_uploaded_avatar(sender, instance, **kwargs):
+    instance._uploaded_avatar = bool(instance.avatar) and not getattr(instance.avatar, "_committed", True)
+
+
+@receiver(post_save, sender=AdopterProfile)
+def generate_avatar_variants(sender, instance, **kwargs):
+    """
+    Encola la generación de las derivadas del avatar recién subido (en el mismo storage privado).
+    """
+    if not getattr(instance, "_uploaded_avatar", False):
+        return
+    instance._uploaded_avatar = False
+    build_avatar_variants.enqueue((instance.pk, instance.avatar.name), unique=True)
+
+
+@receiver(post_init, sender=User)
+def remember_permissions(sender, instance, **kwargs):
+    # Sin acceder a campos diferidos (only()/defer()), que harían una consulta.
+    instance._loaded_permissions = (instance.__dict__.get("is_staff"), instance.__dict__.get("is_superuser"))
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_demotion(sender, instance, created, **kwargs):
+    """
+    Los tokens de acceso llevan is_staff e is_superuser y se verifican sin consultar
+    el usuario: si pierde alguno de los dos, los emitidos hasta ahora dejan de valer.
+    """
+    was_staff, was_superuser = instance._loaded_permissions
+    if not created and ((was_staff and not instance.is_staff) or (was_superuser and not instance.is_superuser)):
+        revoke_user(instance.pk)
+    instance._loaded_permissions = (instance.is_staff, instance.is_superuser)
+
+
+# Invalidación del documento de perfil cacheado (users.profile)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=AdopterProfile)
+def invalidate_own_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.pk if sender is User else instance.user_id])
+
+
+@receiver(m2m_changed, sender=AdopterProfile.favorites.through)
+@receiver(m2m_changed, sender=AdopterProfile.adopted.through)
+def invalidate_profile_animals(sender, instance, action, reverse, pk_set, **kwargs):
+    """Favoritos y adoptados: desde el perfil (profile.favorites) o desde el animal (animal.favorited_by)."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_profiles([instance.user_id])
+    elif action == "pre_clear":
+        related = instance.favorited_by if sender is AdopterProfile.favorites.through else instance.adopted_by
+        invalidate_profiles(related.values_list("user_id", flat=True))
+    else:
+        invalidate_profiles(AdopterProfile.objects.filter(pk__in=pk_set).values_list("user_id", flat=True))
+
+
+@receiver(post_save, sender=AdoptionRequest)
+@receiver(post_delete, sender=AdoptionRequest)
+def invalidate_requester_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.user_id])
+
+
+@receiver(post_init, sender=Animal)
+def capture_previous_adopter(sender, instance, **kwargs):
+    # El adoptante con el que se cargó, sin otra consulta al guardar (ni acceder a campos diferidos).
+    instance._previous_adopter_id = instance.__dict__.get("adopter_id")
+
+
+@receiver(post_save, sender=Animal)
+def invalidate_animal_profiles(sender, instance, **kwargs):
+    invalidate_animal(instance.pk)
+    invalidate_profiles([instance._previous_adopter_id])
+    instance._previous_adopter_id = instance.adopter_id
+
+
+@receiver(pre_delete, sender=Animal)
+def invalidate_deleted_animal_profiles(sender, instance, **kwargs):
+    # Antes de que el borrado en cascada se lleve favoritos y solicitudes.
+    invalidate_profiles(users_of_animal(instance.pk))
+
+
+# Índice de sesiones por usuario (users.sessions.end_user_sessions)
+
+
+@receiver(user_logged_in)
+def index_session(sender, request, user, **kwargs):
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        UserSession.objects.update_or_create(session_key=session.session_key, defaults={"user_id": user.pk})
+
+
+@receiver(user_logged_out)
+def unindex_session(sender, request, user, **kwargs):
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        UserSession.objects.filter(session_key=session.session_key).delete()
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from app.images import build_variants_from_storage
+from taskqueue.queue import periodic_task, task
+
+from .models import AdopterProfile
+from .profile import invalidate_profiles
+from .sessions import prune_sessions
+from .tokens import prune_revocations
+
+
+@task()
+def build_avatar_variants(profile_id, name):
+    """
+    Genera las derivadas de un avatar ya guardado en el storage privado.
+    Si el perfil ya tiene otro avatar no hace nada.
+    """
+    if not AdopterProfile.objects.filter(pk=profile_id, avatar=name).exists():
+        return
+    variants = build_variants_from_storage(name, AdopterProfile._meta.get_field("avatar").storage)
+    AdopterProfile.objects.filter(pk=profile_id, avatar=name).update(
+        avatar_variants=variants, updated_at=timezone.now()
+    )
+    invalidate_profiles(AdopterProfile.objects.filter(pk=profile_id).values_list("user_id", flat=True))
+
+
+@periodic_task(every=timedelta(days=1), max_attempts=1)
+def prune_token_revocations():
+    prune_revocations()
+
+
+@periodic_task(every=timedelta(days=1), max_attempts=1)
+def prune_user_sessions():
+    prune_sessions()
@@ -1,16 +1,35 @@
+import time
+from datetime import timedelta
+from unittest.mock import PropertyMock, patch
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.contrib.sessions.models import Session
 from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.db.models.signals import pre_save
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
 from animals.models import AdoptionRequest, Animal
 from animals.signals import geocode_city
-from users.models import AdopterProfile, ProtectoraApproval
+from outbox.mail import send_pending
+from taskqueue.worker import run_pending
+from users.models import AdopterProfile, ProtectoraApproval, RevokedToken, TokenCutoff, UserSession
+from users.profile import build_profile, get_profile_document
+from users.sessions import end_user_sessions
+from users.sessions import memory as session_memory
+from users.sessions import prune_sessions
+from users.tokens import prune_revocations
 
 User = get_user_model()
 
@@ -18,6 +37,7 @@ User = get_user_model()
 class UserViewsTest(APITestCase):
     def setUp(self):
         pre_save.disconnect(geocode_city, sender=Animal)
+        cache.clear()
 
         self.register_url = "/users/register/"
         self.login_url = "/users/login/"
@@ -83,6 +103,8 @@ class UserViewsTest(APITestCase):
         self.assertTrue(prot.is_staff)
         pa = ProtectoraApproval.objects.get(user=prot)
         self.assertFalse(pa.approved)
+        self.assertEqual(len(mail.outbox), 0)
+        send_pending()
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn("Solicitud de registro de protectora", mail.outbox[0].subject)
 
@@ -131,6 +153,22 @@ class UserViewsTest(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIn("error", resp.data)
 
+    def test_login_is_throttled_per_username(self):
+        for _ in range(5):
+            resp = self.client.post(self.login_url, {"username": "johndoe", "password": "wrong"}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        resp = self.client.post(self.login_url, {"username": "johndoe", "password": "password123"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(resp["Retry-After"]), 0)
+
+    def test_password_reset_is_limited_per_email(self):
+        for _ in range(3):
+            resp = self.client.post(self.pwd_reset_request_url, {"email": self.user.email}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resp = self.client.post(self.pwd_reset_request_url, {"email": self.user.email.upper()}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", resp)
+
     def test_login_protectora_pending(self):
         prot = User.objects.create_user("prot1", email="prot1@example.com", password="pw")
         prot.is_staff = True
@@ -153,6 +191,153 @@ class UserViewsTest(APITestCase):
         resp = self.client.get(self.check_url)
         self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_fast_path_answers_like_the_full_stack(self):
+        def responses(client):
+            anonymous = client.get(self.check_url)
+            csrf = client.get("/csrf-token/")
+            client.login(username="johndoe", password="password123")
+            with self.assertNumQueries(1):  # el usuario; la sesión sale de memoria
+                logged_in = client.get(self.check_url)
+            self.assertIn("csrftoken", csrf.cookies)
+            self.assertTrue(csrf.json()["csrfToken"])
+            return [(anonymous.status_code, anonymous.json()), (logged_in.status_code, logged_in.json())]
+
+        fast = responses(self.client)
+        with self.settings(FAST_PATH_ENABLED=False):
+            full = responses(APIClient())
+        self.assertEqual(fast, full)
+        self.assertEqual([code for code, _ in fast], [401, 200])
+
+    def test_sessions_are_served_from_memory_and_ended_on_block(self):
+        session_memory.clear()
+        other = APIClient()
+        other.login(username="alice", password="pw")
+        self.client.login(username="alice", password="pw")
+        keys = list(UserSession.objects.filter(user=self.alice).values_list("session_key", flat=True))
+        self.assertEqual(len(keys), 2)
+
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_200_OK)
+        # Otro proceso: la memoria no tiene la sesión y se lee de la base de datos.
+        session_memory.clear()
+        self.assertEqual(other.get(self.check_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(other.get(self.check_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(session_memory.snapshot()["misses"], 1)
+        self.assertEqual(session_memory.snapshot()["hits"], 1)
+
+        admin = APIClient()
+        admin.login(username="admin", password="adminpw")
+        self.assertEqual(admin.put(self.block_user_url.format(self.alice.id)).status_code, status.HTTP_200_OK)
+        self.assertFalse(UserSession.objects.filter(user=self.alice).exists())
+        self.assertFalse(Session.objects.filter(session_key__in=keys).exists())
+        for client in (self.client, other):
+            self.assertEqual(client.get(self.check_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.logout()
+        resp = admin.get("/api/metrics/sessions/")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn("hit_rate", resp.data)
+
+    def test_lost_invalidation_marker_only_delays_logout_by_the_memory_ttl(self):
+        session_memory.clear()
+        self.client.login(username="alice", password="pw")
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_200_OK)
+        # Se cierra desde otro proceso (la memoria de este no se toca) y la marca se
+        # pierde, p. ej. porque Redis se reinició.
+        with patch.object(session_memory, "delete"):
+            end_user_sessions(self.alice.pk)
+        cache.clear()
+
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_200_OK)
+        later = time.time() + settings.SESSION_MEMORY_TTL + 1
+        with patch("users.sessions.time.time", return_value=later):
+            self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_sessions_drops_expired_and_orphaned_rows(self):
+        self.client.login(username="alice", password="pw")
+        APIClient().login(username="alice", password="pw")
+        expired, live = UserSession.objects.filter(user=self.alice).values_list("session_key", flat=True)
+        Session.objects.filter(session_key=expired).update(expire_date=timezone.now() - timedelta(seconds=1))
+        UserSession.objects.create(session_key="sin-sesion", user=self.alice)
+
+        self.assertEqual(prune_sessions(), 2)
+        self.assertEqual(list(UserSession.objects.values_list("session_key", flat=True)), [live])
+        self.assertFalse(Session.objects.filter(session_key=expired).exists())
+
+    def test_signed_tokens_authenticate_without_db_queries(self):
+        resp = self.client.post("/users/token/", {"username": "johndoe", "password": "password123"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["role"], "adoptante")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+        with self.assertNumQueries(2):  # revocaciones del token y del usuario, que quedan en caché
+            self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.profile_url).data["username"], "johndoe")
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer manipulado")
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+        with self.settings(ACCESS_TOKEN_SECONDS=-1):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+            self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_refresh_rotates_and_logout_revokes(self):
+        tokens = self.client.post("/users/token/", {"username": "johndoe", "password": "password123"}).data
+        refreshed = self.client.post("/users/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(refreshed.status_code, status.HTTP_200_OK)
+        # El token de refresco ya usado no vale una segunda vez.
+        again = self.client.post("/users/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(again.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refreshed.data['access']}")
+        self.client.post(self.logout_url, {"refresh": refreshed.data["refresh"]}, format="json")
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+        resp = self.client.post("/users/token/refresh/", {"refresh": refreshed.data["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_blocking_a_user_revokes_their_tokens(self):
+        tokens = self.client.post("/users/token/", {"username": "alice", "password": "pw"}).data
+        admin_tokens = self.client.post("/users/token/", {"username": "admin", "password": "adminpw"}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {admin_tokens['access']}")
+        self.assertEqual(self.client.put(self.block_user_url.format(self.alice.id)).status_code, status.HTTP_200_OK)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+        resp = self.client.post("/users/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_revocations_survive_cache_eviction(self):
+        tokens = self.client.post("/users/token/", {"username": "johndoe", "password": "password123"}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.client.post(self.logout_url, {"refresh": tokens["refresh"]}, format="json")
+        cache.clear()
+        self.assertEqual(self.client.get(self.check_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+        resp = self.client.post("/users/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(RevokedToken.objects.count(), 2)
+        RevokedToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(prune_revocations(), 2)
+
+    def test_removing_staff_revokes_tokens(self):
+        tokens = self.client.post("/users/token/", {"username": "admin", "password": "adminpw"}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(self.pending_protectoras_url).status_code, status.HTTP_200_OK)
+
+        admin = User.objects.get(pk=self.admin.pk)
+        admin.is_superuser = admin.is_staff = False
+        admin.save()
+        cache.clear()
+        self.assertEqual(self.client.get(self.pending_protectoras_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(TokenCutoff.objects.filter(user_id=self.admin.pk).exists())
+
+        self.user.first_name = "John"
+        self.user.save()
+        self.assertFalse(TokenCutoff.objects.filter(user_id=self.user.pk).exists())
+
     def test_user_search_filters_usernames(self):
         self.client.login(username="johndoe", password="password123")
         resp = self.client.get(self.search_url, {"search": "ali"})
@@ -169,12 +354,39 @@ class UserViewsTest(APITestCase):
     def test_adopter_list(self):
         resp = self.client.get(self.adopters_url)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        usernames = [u["username"] for u in resp.data]
-        self.assertIn("johndoe", usernames)
-        self.assertIn("alice", usernames)
-        self.assertIn("bob", usernames)
+        usernames = [u["username"] for u in resp.data["results"]]
+        self.assertEqual(usernames, ["alice", "bob", "johndoe"])
         self.assertNotIn("admin", usernames)
 
+        resp = self.client.get(self.adopters_url, {"limit": 2})
+        self.assertEqual([u["username"] for u in resp.data["results"]], ["alice", "bob"])
+        resp = self.client.get(resp.data["next"])
+        self.assertEqual([u["username"] for u in resp.data["results"]], ["johndoe"])
+
+        resp = self.client.get(self.adopters_url, {"search": "bo"})
+        self.assertEqual([u["username"] for u in resp.data["results"]], ["bob"])
+
+    def test_user_autocomplete_ranks_and_limits(self):
+        User.objects.create_user(username="xalix", email="x@example.com", password="pw")
+        User.objects.create_user(username="zed", first_name="Alicia", email="z@example.com", password="pw")
+        User.objects.create_user(username="alicealice", email="aa@example.com", password="pw")
+        self.client.login(username="johndoe", password="password123")
+        url = "/users/autocomplete/"
+
+        resp = self.client.get(url, {"q": "Alice"})
+        self.assertEqual([u["username"] for u in resp.data], ["alice", "alicealice"])
+        resp = self.client.get(url, {"q": "ali"})
+        self.assertEqual([u["username"] for u in resp.data], ["alice", "alicealice", "zed", "xalix"])
+        # Con menos de tres letras solo cuentan los prefijos.
+        self.assertEqual(
+            [u["username"] for u in self.client.get(url, {"q": "al"}).data], ["alice", "alicealice", "zed"]
+        )
+        self.assertEqual(len(self.client.get(url, {"q": "ali", "limit": 2}).data), 2)
+
+        # El resultado se sirve de la caché unos segundos.
+        with self.assertNumQueries(1):  # el usuario; la sesión sale de memoria
+            self.client.get(url, {"q": "ALI"})
+
     def test_get_own_profile_adoptante(self):
         self.client.login(username="johndoe", password="password123")
         resp = self.client.get(self.profile_url)
@@ -196,6 +408,20 @@ class UserViewsTest(APITestCase):
         self.assertEqual(resp.data["location"], "Barcelona")
         self.assertEqual(resp.data["bio"], "Hola mundo")
 
+    @override_settings(DIRECT_UPLOAD_MAX_BYTES=1024)
+    def test_update_profile_with_oversized_avatar_changes_nothing(self):
+        self.client.login(username="johndoe", password="password123")
+        storage = AdopterProfile._meta.get_field("avatar").storage
+        big = SimpleUploadedFile("yo.png", b"\x89PNG\r\n\x1a\n" + b"x" * 4096, content_type="image/png")
+        with patch.object(type(storage), "connection", new_callable=PropertyMock) as connection:
+            resp = self.client.put(self.profile_update_url, {"location": "Girona", "avatar": big}, format="multipart")
+        self.assertEqual(resp.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("avatar", resp.data)
+        profile = AdopterProfile.objects.get(user=self.user)
+        self.assertIsNone(profile.location)
+        self.assertFalse(profile.avatar)
+        connection.return_value.meta.client.put_object.assert_not_called()
+
     def test_get_own_profile_protectora(self):
         prot, _ = AdopterProfile.objects.get_or_create(
             user=User.objects.create_user("prot2", email="p2@example.com", password="pw", is_active=True, is_staff=True)
@@ -223,6 +449,87 @@ class UserViewsTest(APITestCase):
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_profile_is_built_with_a_fixed_number_of_queries(self):
+        def build_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                build_profile(self.user)
+            return len(ctx.captured_queries)
+
+        animal = Animal.objects.create(name="Uno", owner=self.bob, adopter=self.user)
+        self.user.profile.favorites.add(animal)
+        self.user.profile.adopted.add(animal)
+        AdoptionRequest.objects.create(user=self.user, animal=animal)
+        baseline = build_queries()
+
+        for i in range(5):
+            animal = Animal.objects.create(name=f"Animal {i}", owner=self.bob, adopter=self.user)
+            self.user.profile.favorites.add(animal)
+            self.user.profile.adopted.add(animal)
+            AdoptionRequest.objects.create(user=self.user, animal=animal)
+        self.assertEqual(build_queries(), baseline)
+
+    def test_cached_profile_is_invalidated_on_changes(self):
+        self.client.login(username="johndoe", password="password123")
+        self.assertEqual(self.client.get(self.profile_url).data["favorites"], [])
+        with self.assertNumQueries(0):
+            get_profile_document(self.user)
+
+        self.client.post(f"/users/favorites/{self.animal.id}/")
+        self.assertEqual([a["id"] for a in self.client.get(self.profile_url).data["favorites"]], [self.animal.id])
+
+        self.client.post(self.adoption_request_url.format(animal_id=self.animal.id))
+        self.assertEqual(len(self.client.get(self.profile_url).data["requests"]), 1)
+
+        self.animal.adopter = self.user
+        self.animal.save()
+        self.assertEqual([a["id"] for a in self.client.get(self.profile_url).data["adopted"]], [self.animal.id])
+        self.animal.adopter = None
+        with CaptureQueriesContext(connection) as queries:
+            self.animal.save()
+        # El adoptante anterior sale de post_init, no de otra consulta al guardar.
+        self.assertFalse([q for q in queries.captured_queries if 'SELECT "animals_animal"."adopter_id"' in q["sql"]])
+        self.assertEqual(self.client.get(self.profile_url).data["adopted"], [])
+
+        # Cargado de nuevo desde la base de datos: se invalida el adoptante con el que se leyó.
+        self.animal.adopter = self.user
+        self.animal.save()
+        self.assertEqual(len(self.client.get(self.profile_url).data["adopted"]), 1)
+        reloaded = Animal.objects.get(pk=self.animal.pk)
+        reloaded.adopter = None
+        reloaded.save()
+        self.assertEqual(self.client.get(self.profile_url).data["adopted"], [])
+
+        self.animal.delete()
+        resp = self.client.get(self.profile_url)
+        self.assertEqual((resp.data["favorites"], resp.data["requests"]), ([], []))
+
+    def test_avatar_direct_upload_flow(self):
+        self.client.login(username="johndoe", password="password123")
+        storage = AdopterProfile._meta.get_field("avatar").storage
+        with patch.object(storage, "presigned_post", return_value={"url": "http://minio/public", "fields": {}}):
+            resp = self.client.post("/users/profile/avatar/upload/", {"filename": "yo.png"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.data["key"].startswith("profile_images/uploads/"))
+
+        with patch.object(storage, "exists", return_value=False):
+            pending = self.client.post(
+                "/users/profile/avatar/confirm/", {"upload_token": resp.data["upload_token"]}, format="json"
+            )
+        self.assertEqual(pending.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch.object(storage, "exists", return_value=True):
+            confirmed = self.client.post(
+                "/users/profile/avatar/confirm/", {"upload_token": resp.data["upload_token"]}, format="json"
+            )
+        self.assertEqual(confirmed.status_code, status.HTTP_200_OK)
+        variants = {"source": resp.data["key"], "sizes": {}}
+        with patch("users.tasks.build_variants_from_storage", return_value=variants):
+            run_pending()
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.avatar.name, resp.data["key"])
+        self.assertEqual(self.user.profile.avatar_variants, variants)
+
     def test_favorite_animal_add_and_remove(self):
         self.client.login(username="johndoe", password="password123")
         resp = self.client.post(f"/users/favorites/{self.animal.id}/")
@@ -233,6 +540,27 @@ class UserViewsTest(APITestCase):
         self.assertEqual(resp2.status_code, status.HTTP_204_NO_CONTENT)
         self.assertNotIn(self.animal, self.user.profile.favorites.all())
 
+    def test_favorites_bulk_sync(self):
+        other = Animal.objects.create(name="Luna", owner=self.alice)
+        self.client.login(username="johndoe", password="password123")
+        url = "/users/favorites/"
+
+        resp = self.client.post(url, {"add": [self.animal.id, other.id, 9999]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["favorites"], [self.animal.id, other.id])
+
+        resp = self.client.post(url, {"remove": [self.animal.id]}, format="json")
+        self.assertEqual(resp.data["favorites"], [other.id])
+
+        resp = self.client.put(url, {"favorites": [self.animal.id]}, format="json")
+        self.assertEqual(resp.data["favorites"], [self.animal.id])
+        self.assertEqual(self.client.get(url).data["favorites"], [self.animal.id])
+        other.refresh_from_db()
+        self.assertEqual(other.favorite_count, 0)
+
+        resp = self.client.put(url, {"favorites": "1,2"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_adoption_request_view_get_post_delete(self):
         self.client.login(username="johndoe", password="password123")
         url = self.adoption_request_url.format(animal_id=self.animal.id)
@@ -285,6 +613,8 @@ class UserViewsTest(APITestCase):
         resp = self.client.post(self.pwd_reset_request_url, {"email": self.user.email}, format="json")
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertIn("Si ese correo existe en nuestro sistema", resp.data.get("message", ""))
+        self.assertEqual(send_pending()["sent"], 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
 
     def test_password_reset_confirm_missing_params(self):
         resp = self.client.put(self.pwd_reset_confirm_url, {}, format="json")
@@ -0,0 +1,148 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils import timezone
+
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from app.db_router import primary_reads
+
+from .models import RevokedToken, TokenCutoff
+
+User = get_user_model()
+
+ACCESS_SALT = "users.tokens.access"
+REFRESH_SALT = "users.tokens.refresh"
+
+
+def _cache():
+    return caches[settings.AUTH_TOKEN_CACHE]
+
+
+def _revoked_key(jti):
+    return f"auth:revoked:{jti}"
+
+
+def _cutoff_key(user_id):
+    return f"auth:cutoff:{user_id}"
+
+
+def issue_tokens(user):
+    """
+    Par de tokens firmados (django.core.signing con SECRET_KEY) para `user`:
+    {"access", "refresh", "expires_in"}. El de acceso lleva identidad y rol y se
+    verifica sin tocar la base de datos; el de refresco solo sirve en /users/token/refresh/.
+    """
+    now = time.time()
+    claims = {"uid": user.pk, "usr": user.username, "stf": user.is_staff, "su": user.is_superuser, "iat": now}
+    return {
+        "access": signing.dumps({**claims, "jti": uuid.uuid4().hex}, salt=ACCESS_SALT),
+        "refresh": signing.dumps({"uid": user.pk, "iat": now, "jti": uuid.uuid4().hex}, salt=REFRESH_SALT),
+        "expires_in": settings.ACCESS_TOKEN_SECONDS,
+    }
+
+
+def _is_revoked(claims):
+    """
+    Una lectura de caché con el resultado de la última consulta a RevokedToken y
+    TokenCutoff. Lo que falte (caducado o expulsado por la caché) se vuelve a leer
+    de la base de datos, así que perder una entrada nunca da por válido un token revocado.
+    """
+    keys = [_revoked_key(claims["jti"]), _cutoff_key(claims["uid"])]
+    found = _cache().get_many(keys)
+    missing = {}
+    with primary_reads():
+        if keys[0] not in found:
+            missing[keys[0]] = int(RevokedToken.objects.filter(jti=claims["jti"]).exists())
+        if keys[1] not in found:
+            cutoff = TokenCutoff.objects.filter(user_id=claims["uid"]).values_list("revoked_before", flat=True).first()
+            missing[keys[1]] = cutoff or 0
+    if missing:
+        _cache().set_many(missing, settings.AUTH_REVOCATION_CACHE_SECONDS)
+        found.update(missing)
+    return bool(found[keys[0]]) or claims["iat"] < found[keys[1]]
+
+
+def _load(token, salt, max_age):
+    try:
+        claims = signing.loads(token, salt=salt, max_age=max_age)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed("Token caducado.")
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed("Token no válido.")
+    if _is_revoked(claims):
+        raise exceptions.AuthenticationFailed("Token revocado.")
+    return claims
+
+
+def verify_access(token):
+    return _load(token, ACCESS_SALT, settings.ACCESS_TOKEN_SECONDS)
+
+
+def verify_refresh(token):
+    return _load(token, REFRESH_SALT, settings.REFRESH_TOKEN_SECONDS)
+
+
+def revoke_token(claims):
+    """Revoca un token concreto hasta que caducaría de todos modos."""
+    expires_at = timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_SECONDS)
+    RevokedToken.objects.get_or_create(jti=claims["jti"], defaults={"expires_at": expires_at})
+    _cache().set(_revoked_key(claims["jti"]), 1, settings.AUTH_REVOCATION_CACHE_SECONDS)
+
+
+def revoke_user(user_id):
+    """Invalida todos los tokens emitidos hasta ahora para el usuario."""
+    now = time.time()
+    TokenCutoff.objects.update_or_create(user_id=user_id, defaults={"revoked_before": now})
+    _cache().set(_cutoff_key(user_id), now, settings.AUTH_REVOCATION_CACHE_SECONDS)
+
+
+def prune_revocations():
+    """Borra revocaciones de tokens que ya habrían caducado. Devuelve cuántas filas."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+    cutoffs, _ = TokenCutoff.objects.filter(revoked_before__lt=time.time() - settings.REFRESH_TOKEN_SECONDS).delete()
+    return deleted + cutoffs
+
+
+def user_from_claims(claims):
+    """
+    Usuario construido solo con los datos del token (sin consulta). Sirve para
+    permisos, filtros por FK y relaciones perezosas (user.profile), pero el resto
+    de campos está vacío: no debe guardarse.
+    """
+    user = User(
+        id=claims["uid"], username=claims["usr"], is_staff=claims["stf"], is_superuser=claims["su"], is_active=True
+    )
+    user._state.adding = False
+    user._state.db = "default"
+    return user
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Autenticación opcional con "Authorization: Bearer <access>". Sin esa cabecera
+    devuelve None y DRF pasa a la autenticación por sesión. No necesita CSRF (el
+    token no va en una cookie) y casi nunca consulta la base de datos: la firma se
+    comprueba en memoria y la revocación con una lectura de la caché AUTH_TOKEN_CACHE,
+    que solo va a la base de datos cada AUTH_REVOCATION_CACHE_SECONDS por token.
+    """
+
+    keyword = b"bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Cabecera Authorization no válida.")
+        claims = verify_access(auth[1].decode(errors="replace"))
+        return user_from_claims(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
@@ -6,15 +6,21 @@ urlpatterns = [
     path("register/", views.register_view, name="register"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
+    path("token/", views.token_obtain_view, name="token-obtain"),
+    path("token/refresh/", views.token_refresh_view, name="token-refresh"),
     path("check_session/", views.check_session, name="check_session"),
     path("<int:user_id>/profile/", views.user_profile_view),
     path("", views.user_search),
+    path("autocomplete/", views.user_autocomplete, name="user-autocomplete"),
     path("password-reset-confirm/", views.password_reset_confirm),
     path("password-reset/", views.password_reset_request),
     path("profile/", views.get_profile, name="get_own_profile"),
     path("profile/update/", views.update_profile, name="update_profile"),
+    path("profile/avatar/upload/", views.avatar_upload_view, name="avatar-upload"),
+    path("profile/avatar/confirm/", views.avatar_confirm_view, name="avatar-confirm"),
     path("profile/adoption-form/", views.adoption_form_view, name="adoption-form"),
     path("adopters/", views.AdopterListView.as_view(), name="adopter-list"),
+    path("favorites/", views.favorites_sync_view, name="favorites-sync"),
     path("favorites/<int:animal_id>/", views.favorite_animal, name="favorite-animal"),
     path(
         "animals/request/<int:req_id>/delete/",
@@ -3,31 +3,45 @@ import logging
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.tokens import PasswordResetTokenGenerator, default_token_generator
-from django.core.mail import send_mail
-from django.db.models import Q
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from animals.models import AdoptionRequest, Animal
-from animals.serializers import AdoptionRequestSerializer, AnimalSerializer
+from animals.serializers import AdoptionRequestSerializer
+from app.db_router import use_primary
+from app.pagination import UsernameCursorPagination
+from app.ratelimit import LoginIPThrottle, LoginUsernameThrottle, ratelimit
+from app.storages import confirm_direct_upload, issue_direct_upload
+from app.upload_handlers import pop_streamed_files, stream_uploads_to_s3
+from outbox.mail import enqueue_email
 
 from .models import AdopterProfile, ProtectoraApproval
+from .profile import get_profile_document
+from .search import autocomplete, matching_users
 from .serializers import AdopterListSerializer, AdopterProfileSerializer, RegisterSerializer, UserSerializer
+from .sessions import end_user_sessions
+from .tasks import build_avatar_variants
+from .tokens import issue_tokens, revoke_token, revoke_user, verify_refresh
 
 User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+AVATAR_FIELD = AdopterProfile._meta.get_field("avatar")
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@ratelimit("register", key="ip")
 def register_view(request):
     role = request.data.get("role", "adoptante")
     localidad = request.data.get("localidad", "")
@@ -44,38 +58,40 @@ def register_view(request):
         logger.debug("Errores de validación: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    user = serializer.save()
-
-    if role == "protectora":
-        user.is_staff = True
-        user.is_active = False
+    with transaction.atomic():
+        user = serializer.save()
+
+        if role == "protectora":
+            user.is_staff = True
+            user.is_active = False
+            user.save()
+
+            ProtectoraApproval.objects.create(user=user, approved=False)
+
+            # El aviso sale de la outbox: solo existe si el registro se confirma.
+            enqueue_email(
+                subject="Solicitud de registro de protectora",
+                body=(
+                    f"La protectora {user.username} (email: {user.email}) "
+                    f"solicita registrarse. Localidad: {localidad}"
+                ),
+                from_email="no-reply@miapp.com",
+                to=["marclosquino2@gmail.com"],
+            )
+
+            return Response(
+                {"message": "Solicitud de protectora enviada. Espera aprobación."},
+                status=status.HTTP_201_CREATED,
+            )
+
+        user.is_staff = False
+        user.is_active = True
         user.save()
-
-        ProtectoraApproval.objects.create(user=user, approved=False)
-
-        send_mail(
-            subject="Solicitud de registro de protectora",
-            message=(
-                f"La protectora {user.username} (email: {user.email}) " f"solicita registrarse. Localidad: {localidad}"
-            ),
-            from_email="no-reply@miapp.com",
-            recipient_list=["marclosquino2@gmail.com"],
-        )
-
-        return Response(
-            {"message": "Solicitud de protectora enviada. Espera aprobación."},
-            status=status.HTTP_201_CREATED,
-        )
-
-    user.is_staff = False
-    user.is_active = True
-    user.save()
     return Response({"message": "Usuario creado correctamente!"}, status=status.HTTP_201_CREATED)
 
 
-@api_view(["POST"])
-@permission_classes([AllowAny])
-def login_view(request):
+def _authenticate_credentials(request):
+    """(usuario, None) si username/password son válidos; si no, (None, respuesta de error)."""
     username = request.data.get("username")
     password = request.data.get("password")
 
@@ -85,14 +101,24 @@ def login_view(request):
         user_obj = None
 
     if user_obj and not user_obj.is_active:
-        return Response(
+        return None, Response(
             {"error": "Tu cuenta está pendiente de aprobación."},
             status=status.HTTP_403_FORBIDDEN,
         )
 
     user = authenticate(request, username=username, password=password)
     if user is None:
-        return Response({"error": "Credenciales inválidas"}, status=status.HTTP_401_UNAUTHORIZED)
+        return None, Response({"error": "Credenciales inválidas"}, status=status.HTTP_401_UNAUTHORIZED)
+    return user, None
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
+def login_view(request):
+    user, error = _authenticate_credentials(request)
+    if error:
+        return error
 
     login(request, user)
     user_data = UserSerializer(user).data
@@ -104,9 +130,57 @@ def login_view(request):
     )
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
+def token_obtain_view(request):
+    """
+    POST /users/token/  { "username", "password" }
+    Como login, pero en lugar de abrir sesión devuelve tokens firmados:
+    {"access", "refresh", "expires_in", "user", "role"}. El de acceso se envía en
+    "Authorization: Bearer <access>" y el de refresco en /users/token/refresh/.
+    """
+    user, error = _authenticate_credentials(request)
+    if error:
+        return error
+    role = "protectora" if user.is_staff else "adoptante"
+    return Response(
+        {**issue_tokens(user), "user": UserSerializer(user).data, "role": role},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def token_refresh_view(request):
+    """
+    POST /users/token/refresh/  { "refresh": "..." }
+    Devuelve un par nuevo y revoca el token de refresco usado. Aquí sí se lee el
+    usuario: un rol que ha cambiado se refleja en el siguiente token de acceso.
+    """
+    try:
+        claims = verify_refresh(str(request.data.get("refresh", "")))
+    except AuthenticationFailed as e:
+        return Response({"error": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    user = User.objects.filter(pk=claims["uid"], is_active=True).first()
+    if user is None:
+        return Response({"error": "Usuario no encontrado."}, status=status.HTTP_401_UNAUTHORIZED)
+    revoke_token(claims)
+    return Response(issue_tokens(user), status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def logout_view(request):
+    """Cierra la sesión y, con tokens, revoca el de acceso usado y el de refresco enviado."""
+    if isinstance(request.auth, dict):
+        revoke_token(request.auth)
+    if request.data.get("refresh"):
+        try:
+            revoke_token(verify_refresh(str(request.data["refresh"])))
+        except AuthenticationFailed:
+            pass
     logout(request)
     response = Response({"message": "Logout successful!"}, status=status.HTTP_200_OK)
     response.delete_cookie("sessionid", path="/")
@@ -137,6 +211,44 @@ def favorite_animal(request, animal_id):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def _animal_ids(value):
+    if not isinstance(value, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+        raise ValueError
+    return set(value)
+
+
+@api_view(["GET", "POST", "PUT"])
+@permission_classes([IsAuthenticated])
+def favorites_sync_view(request):
+    """
+    GET  /users/favorites/                                   -> {"favorites": [ids]}
+    POST /users/favorites/  {"add": [ids], "remove": [ids]}  añade y quita en bloque
+    PUT  /users/favorites/  {"favorites": [ids]}             sustituye la lista completa
+    Los ids de animales que no existen se ignoran. Devuelve la lista resultante.
+    """
+    profile = request.user.profile
+    try:
+        if request.method == "PUT":
+            to_add, to_remove = _animal_ids(request.data.get("favorites")), None
+        elif request.method == "POST":
+            to_add, to_remove = _animal_ids(request.data.get("add", [])), _animal_ids(request.data.get("remove", []))
+    except ValueError:
+        return Response({"error": "Se esperaba una lista de ids de animales."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method != "GET":
+        to_add = set(Animal.objects.filter(pk__in=to_add).values_list("pk", flat=True))
+        with transaction.atomic():
+            if to_remove is None:
+                profile.favorites.set(to_add)
+            else:
+                # add() y remove() hacen un único INSERT y un único DELETE en la tabla intermedia.
+                profile.favorites.add(*to_add)
+                profile.favorites.remove(*to_remove.difference(to_add))
+
+    favorites = list(profile.favorites.order_by("pk").values_list("pk", flat=True))
+    return Response({"favorites": favorites}, status=status.HTTP_200_OK)
+
+
 @api_view(["GET", "POST", "DELETE"])
 @permission_classes([IsAuthenticated])
 def adoption_request_view(request, animal_id):
@@ -164,46 +276,13 @@ def adoption_request_view(request, animal_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_profile(request):
-    user = request.user
-    user_data = UserSerializer(user).data
-    role = "protectora" if user.is_staff else "adoptante"
-    user_data["role"] = role
-
-    if not user.is_staff:
-        try:
-            profile = user.profile
-        except AdopterProfile.DoesNotExist:
-            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        profile_data = AdopterProfileSerializer(profile).data
-        fav_qs = profile.favorites.all()
-        profile_data["favorites"] = AnimalSerializer(fav_qs, many=True).data
-        adopted_qs = Animal.objects.filter(adopter=user)
-        profile_data["adopted"] = AnimalSerializer(adopted_qs, many=True).data
-        req_qs = AdoptionRequest.objects.filter(user=user)
-        profile_data["requests"] = AdoptionRequestSerializer(req_qs, many=True).data
-
-        return Response({**user_data, **profile_data}, status=status.HTTP_200_OK)
-
-    try:
-        profile = user.profile
-        profile_data = AdopterProfileSerializer(profile).data
-    except AdopterProfile.DoesNotExist:
-        profile_data = {}
-
-    en_adopcion_qs = Animal.objects.filter(owner=user, adopter__isnull=True)
-    adopted_owner_qs = Animal.objects.filter(owner=user, adopter__isnull=False)
-    return Response(
-        {
-            **user_data,
-            **profile_data,
-            "en_adopcion": AnimalSerializer(en_adopcion_qs, many=True).data,
-            "adopted": AnimalSerializer(adopted_owner_qs, many=True).data,
-        },
-        status=status.HTTP_200_OK,
-    )
+    document = get_profile_document(request.user)
+    if document is None:
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(document, status=status.HTTP_200_OK)
 
 
+@stream_uploads_to_s3(AVATAR_FIELD.storage, AVATAR_FIELD.upload_to, ("avatar",))
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
@@ -211,7 +290,7 @@ def update_profile(request):
     """
     Actualiza avatar, location, phone_number y bio para cualquier usuario
     (adoptante o protectora). Luego reconstruye y devuelve el payload completo,
-    igual que get_profile.
+    igual que get_profile. El avatar se sube a S3 en streaming mientras llega.
     """
     user = request.user
     try:
@@ -219,44 +298,89 @@ def update_profile(request):
     except AdopterProfile.DoesNotExist:
         return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = AdopterProfileSerializer(profile, data=request.data, partial=True)
+    data, streamed_files = pop_streamed_files(request, request.data)
+    serializer = AdopterProfileSerializer(profile, data=data, partial=True)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    serializer.save()
+    serializer.save(**streamed_files)
+    if "avatar" in streamed_files:
+        build_avatar_variants.enqueue((profile.pk, profile.avatar.name), unique=True)
 
-    user_data = UserSerializer(user).data
-    role = "protectora" if user.is_staff else "adoptante"
-    user_data["role"] = role
-
-    profile_data = serializer.data
+    # Guardar el perfil ya ha invalidado el documento cacheado (users.signals).
+    return Response(get_profile_document(user), status=status.HTTP_200_OK)
 
-    if role == "adoptante":
-        fav_qs = profile.favorites.all()
-        profile_data["favorites"] = AnimalSerializer(fav_qs, many=True).data
-        adopted_qs = Animal.objects.filter(adopter=user)
-        profile_data["adopted"] = AnimalSerializer(adopted_qs, many=True).data
-        req_qs = AdoptionRequest.objects.filter(user=user)
-        profile_data["requests"] = AdoptionRequestSerializer(req_qs, many=True).data
 
-        return Response({**user_data, **profile_data}, status=status.HTTP_200_OK)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def avatar_upload_view(request):
+    """
+    POST /users/profile/avatar/upload/  { "filename": "yo.jpg" }
+    Devuelve un destino prefirmado para subir el avatar directamente al bucket.
+    Después hay que llamar a /users/profile/avatar/confirm/ con el upload_token.
+    """
+    if not AdopterProfile.objects.filter(user=request.user).exists():
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    en_adopcion_qs = Animal.objects.filter(owner=user, adopter__isnull=True)
-    adopted_owner_qs = Animal.objects.filter(owner=user, adopter__isnull=False)
-    return Response(
-        {
-            **user_data,
-            **profile_data,
-            "en_adopcion": AnimalSerializer(en_adopcion_qs, many=True).data,
-            "adopted": AnimalSerializer(adopted_owner_qs, many=True).data,
-        },
-        status=status.HTTP_200_OK,
+    target = issue_direct_upload(
+        AVATAR_FIELD.storage, AVATAR_FIELD.upload_to, request.data.get("filename", ""), f"avatar:{request.user.pk}"
     )
+    return Response(target, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def avatar_confirm_view(request):
+    """
+    POST /users/profile/avatar/confirm/  { "upload_token": "..." }
+    Asocia al perfil el avatar subido directamente al bucket y encola la generación de sus derivadas.
+    """
+    try:
+        profile = request.user.profile
+    except AdopterProfile.DoesNotExist:
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        key = confirm_direct_upload(AVATAR_FIELD.storage, request.data.get("upload_token"), f"avatar:{request.user.pk}")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    profile.avatar = key
+    profile.save(update_fields=["avatar"])
+    build_avatar_variants.enqueue((profile.pk, key), unique=True)
+    return Response(AdopterProfileSerializer(profile).data, status=status.HTTP_200_OK)
 
 
 class AdopterListView(generics.ListAPIView):
-    queryset = User.objects.filter(is_staff=False, is_active=True)
+    """
+    GET /users/adopters/?search=<q>&limit=<n>&cursor=<c>
+    Adoptantes activos en orden alfabético, paginados por cursor: {"next", "previous", "results"}.
+    """
+
     serializer_class = AdopterListSerializer
     permission_classes = [AllowAny]
+    pagination_class = UsernameCursorPagination
+
+    def get_queryset(self):
+        queryset = User.objects.filter(is_staff=False, is_active=True)
+        search = self.request.query_params.get("search", "").strip()
+        if search:
+            queryset = matching_users(queryset, search)
+        return queryset.only("id", "username")
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def user_autocomplete(request):
+    """
+    GET /users/autocomplete/?q=<texto>&limit=<n>
+    Como mucho USER_AUTOCOMPLETE_LIMIT usuarios activos [{"id", "username"}], de mejor a
+    peor coincidencia: username exacto, prefijo del username, prefijo del nombre, contenido.
+    """
+    try:
+        limit = int(request.query_params.get("limit", settings.USER_AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = settings.USER_AUTOCOMPLETE_LIMIT
+    return Response(autocomplete(request.query_params.get("q", ""), max(limit, 1)), status=status.HTTP_200_OK)
 
 
 @api_view(["DELETE"])
@@ -293,41 +417,10 @@ def user_profile_view(request, user_id):
     if not user.is_active:
         return Response({"detail": "Usuario no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-    user_data = UserSerializer(user).data
-    role = "protectora" if user.is_staff else "adoptante"
-    user_data["role"] = role
-
-    if not user.is_staff:
-        try:
-            profile = user.profile
-        except AdopterProfile.DoesNotExist:
-            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
-        profile_data = AdopterProfileSerializer(profile).data
-        fav_qs = profile.favorites.all()
-        profile_data["favorites"] = AnimalSerializer(fav_qs, many=True).data
-        adopted_qs = Animal.objects.filter(adopter=user)
-        profile_data["adopted"] = AnimalSerializer(adopted_qs, many=True).data
-        req_qs = AdoptionRequest.objects.filter(user=user)
-        profile_data["requests"] = AdoptionRequestSerializer(req_qs, many=True).data
-        return Response({**user_data, **profile_data}, status=status.HTTP_200_OK)
-
-    try:
-        profile = user.profile
-        profile_data = AdopterProfileSerializer(profile).data
-    except AdopterProfile.DoesNotExist:
-        profile_data = {}
-
-    en_adopcion_qs = Animal.objects.filter(owner=user, adopter__isnull=True)
-    adopted_owner_qs = Animal.objects.filter(owner=user, adopter__isnull=False)
-    return Response(
-        {
-            **user_data,
-            **profile_data,
-            "en_adopcion": AnimalSerializer(en_adopcion_qs, many=True).data,
-            "adopted": AnimalSerializer(adopted_owner_qs, many=True).data,
-        },
-        status=status.HTTP_200_OK,
-    )
+    document = get_profile_document(user)
+    if document is None:
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(document, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
@@ -336,27 +429,20 @@ def user_search(request):
     """
     GET /api/users/?search=<q>
     Devuelve lista de usuarios activos cuyo username, first_name o last_name
-    contienen la cadena 'q' (case-insensitive).
+    contienen la cadena 'q' (case-insensitive), como /users/autocomplete/.
     """
-    q = request.query_params.get("search", "").strip()
-    if not q:
-        return Response([], status=status.HTTP_200_OK)
-
-    qs = User.objects.filter(
-        Q(username__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q),
-        is_active=True,
-    )
-    serializer = AdopterListSerializer(qs, many=True)
-    return Response(serializer.data)
+    return Response(autocomplete(request.query_params.get("search", "")), status=status.HTTP_200_OK)
 
 
+@use_primary
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_pending_protectoras(request):
     """
     GET /api/admin/pending-protectoras/
     Devuelve una lista de usuarios con is_staff=True e is_active=False (protectora pendientes de validación).
-    Solo accesible por administrador (is_superuser=True).
+    Solo accesible por administrador (is_superuser=True). Se lee del primario para no
+    mostrar como pendiente una protectora que otro administrador acaba de validar.
     """
     if not request.user.is_superuser:
         return Response({"detail": "No tienes permiso."}, status=status.HTTP_403_FORBIDDEN)
@@ -410,6 +496,8 @@ def block_user(request, user_id):
 
     target.is_active = False
     target.save()
+    revoke_user(target.pk)
+    end_user_sessions(target.pk)
 
     if target.is_staff:
         pa = getattr(target, "protectora_approval", None)
@@ -457,7 +545,9 @@ def delete_user(request, user_id):
         )
 
     target = get_object_or_404(User, pk=user_id)
+    end_user_sessions(target.pk)
     target.delete()
+    revoke_user(user_id)
     return Response(
         {"message": "Usuario eliminado correctamente."},
         status=status.HTTP_204_NO_CONTENT,
@@ -486,6 +576,8 @@ def list_blocked_users(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@ratelimit("password_reset", key="ip")
+@ratelimit("password_reset_email", key="data:email")
 def password_reset_request(request):
     """
     Solicita envío de correo para recuperación de contraseña.
@@ -517,13 +609,7 @@ def password_reset_request(request):
             f"Saludos,\n"
             f"Equipo AdoptAble"
         )
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        enqueue_email(subject, message, [user.email])
 
     return Response(
         {"message": "Si ese correo existe en nuestro sistema, se ha enviado un enlace de recuperación."},
@@ -560,4 +646,6 @@ def password_reset_confirm(request):
 
     user.set_password(new_password)
     user.save()
+    revoke_user(user.pk)
+    end_user_sessions(user.pk)
     return Response({"message": "Contraseña actualizada correctamente."}, status=status.HTTP_200_OK)